@@ -222,112 +222,61 @@ UPDATE `vehicle` SET `status` = 'ON_ROUTE' WHERE `vehicle_id` IN (11, 10, 7, 1,
 UPDATE `vehicle` SET `status` = 'PENDING' WHERE `vehicle_id` IN (2, 3, 8, 11);
 
 
-INSERT INTO `user_notification` (`incident_id`, `title`, `created_at`)
+INSERT INTO `user_notification` (`incident_id`, `title`, `audience`, `created_at`)
 VALUES
-  (1, "New Incident", "2025-10-26 14:36:10"),
-  (2, "New Incident", "2025-10-28 13:05:55"),
-  (3, "New Incident", "2025-10-28 17:06:12"),
-  (4, "New Incident", "2025-11-02 05:32:00"),
-  (5, "New Incident", "2025-10-31 12:45:30"),
-  (6, "New Incident", "2025-11-01 13:44:00"),
-  (7, "New Incident", "2025-10-27 11:47:40"),
-  (8, "New Incident", "2025-10-28 04:33:10"),
-  (8, "New Incident", "2025-10-28 04:34:25"),
-  (8, "New Incident", "2025-10-28 04:36:05"),
-  (9, "New Incident", "2025-11-01 20:02:30"),   
-  (10, "New Incident", "2025-11-02 04:43:10"),  
-  (11, "New Incident", "2025-11-02 12:17:00"),
-  (12, "New Incident", "2025-11-02 13:02:10"),
-  (13, "New Incident", "2025-11-02 08:16:40"),
-  (14, "New Incident", "2025-11-02 10:07:30"),
-  (15, "New Incident", "2025-11-02 09:12:00"),
-  (16, "New Incident", "2025-11-02 11:02:20"),
-  (17, "New Incident", "2025-11-02 11:32:15"),
-  (18, "New Incident", "2025-11-02 14:22:40"),
-  (19, "New Incident", "2025-11-02 15:46:55"),
-  (20, "New Incident", "2025-11-02 16:32:00"),
-  (1, "New Assigned Incident", "2025-10-26 14:38:10"),
-  (2, "New Assigned Incident", "2025-10-28 13:07:55"),
-  (3, "New Assigned Incident", "2025-10-28 17:08:12"),
-  (4, "New Assigned Incident", "2025-11-02 05:35:00"),
-  (5, "New Assigned Incident", "2025-10-31 12:46:30"),
-  (6, "New Assigned Incident", "2025-11-01 13:45:00"),
-  (7, "New Assigned Incident", "2025-10-27 11:49:40"),
-  (8, "New Assigned Incident", "2025-10-28 04:38:10"),
-  (8, "New Assigned Incident", "2025-10-28 04:36:25"),
-  (8, "New Assigned Incident", "2025-10-28 04:39:05"),
-  (9, "New Assigned Incident", "2025-11-01 20:08:30"),   
-  (10, "New Assigned Incident", "2025-11-02 04:49:10"),  
-  (11, "New Assigned Incident", "2025-11-02 12:18:00"),
-  (12, "New Assigned Incident", "2025-11-02 13:09:10"),
-  (13, "New Assigned Incident", "2025-11-02 08:17:40"),
-  (14, "New Assigned Incident", "2025-11-02 10:09:30"),
-  (15, "New Assigned Incident", "2025-11-02 09:15:00"),
-  (16, "New Assigned Incident", "2025-11-02 11:03:20");
+  (1, "New Incident", "DISPATCHER", "2025-10-26 14:36:10"),
+  (2, "New Incident", "DISPATCHER", "2025-10-28 13:05:55"),
+  (3, "New Incident", "DISPATCHER", "2025-10-28 17:06:12"),
+  (4, "New Incident", "DISPATCHER", "2025-11-02 05:32:00"),
+  (5, "New Incident", "DISPATCHER", "2025-10-31 12:45:30"),
+  (6, "New Incident", "DISPATCHER", "2025-11-01 13:44:00"),
+  (7, "New Incident", "DISPATCHER", "2025-10-27 11:47:40"),
+  (8, "New Incident", "DISPATCHER", "2025-10-28 04:33:10"),
+  (8, "New Incident", "DISPATCHER", "2025-10-28 04:34:25"),
+  (8, "New Incident", "DISPATCHER", "2025-10-28 04:36:05"),
+  (9, "New Incident", "DISPATCHER", "2025-11-01 20:02:30"),   
+  (10, "New Incident", "DISPATCHER", "2025-11-02 04:43:10"),  
+  (11, "New Incident", "DISPATCHER", "2025-11-02 12:17:00"),
+  (12, "New Incident", "DISPATCHER", "2025-11-02 13:02:10"),
+  (13, "New Incident", "DISPATCHER", "2025-11-02 08:16:40"),
+  (14, "New Incident", "DISPATCHER", "2025-11-02 10:07:30"),
+  (15, "New Incident", "DISPATCHER", "2025-11-02 09:12:00"),
+  (16, "New Incident", "DISPATCHER", "2025-11-02 11:02:20"),
+  (17, "New Incident", "DISPATCHER", "2025-11-02 11:32:15"),
+  (18, "New Incident", "DISPATCHER", "2025-11-02 14:22:40"),
+  (19, "New Incident", "DISPATCHER", "2025-11-02 15:46:55"),
+  (20, "New Incident", "DISPATCHER", "2025-11-02 16:32:00"),
+  (1, "New Assigned Incident", "RESPONDER", "2025-10-26 14:38:10"),
+  (2, "New Assigned Incident", "RESPONDER", "2025-10-28 13:07:55"),
+  (3, "New Assigned Incident", "RESPONDER", "2025-10-28 17:08:12"),
+  (4, "New Assigned Incident", "RESPONDER", "2025-11-02 05:35:00"),
+  (5, "New Assigned Incident", "RESPONDER", "2025-10-31 12:46:30"),
+  (6, "New Assigned Incident", "RESPONDER", "2025-11-01 13:45:00"),
+  (7, "New Assigned Incident", "RESPONDER", "2025-10-27 11:49:40"),
+  (8, "New Assigned Incident", "RESPONDER", "2025-10-28 04:38:10"),
+  (8, "New Assigned Incident", "RESPONDER", "2025-10-28 04:36:25"),
+  (8, "New Assigned Incident", "RESPONDER", "2025-10-28 04:39:05"),
+  (9, "New Assigned Incident", "RESPONDER", "2025-11-01 20:08:30"),   
+  (10, "New Assigned Incident", "RESPONDER", "2025-11-02 04:49:10"),  
+  (11, "New Assigned Incident", "RESPONDER", "2025-11-02 12:18:00"),
+  (12, "New Assigned Incident", "RESPONDER", "2025-11-02 13:09:10"),
+  (13, "New Assigned Incident", "RESPONDER", "2025-11-02 08:17:40"),
+  (14, "New Assigned Incident", "RESPONDER", "2025-11-02 10:09:30"),
+  (15, "New Assigned Incident", "RESPONDER", "2025-11-02 09:15:00"),
+  (16, "New Assigned Incident", "RESPONDER", "2025-11-02 11:03:20");
+
+
+-- the dispatchers have seen the first 16 dispatcher notifications
+INSERT INTO `notification_watermark` (`user_id`, `feed`, `last_seen_id`)
+VALUES
+  (4, 'DISPATCHER', 16),
+  (5, 'DISPATCHER', 16),
+  (6, 'DISPATCHER', 16)
+ON DUPLICATE KEY UPDATE `last_seen_id` = VALUES(`last_seen_id`);
 
 
 INSERT INTO `user_notification_status` (`user_notification_id`, `user_id`, `status`)
 VALUES
-  (1,1,'SEEN'),
-  (2,1,'SEEN'),
-  (3,1,'SEEN'),
-  (4,1,'SEEN'),
-  (5,1,'SEEN'),
-  (6,1,'SEEN'),
-  (7,1,'SEEN'),
-  (8,1,'SEEN'),
-  (9,1,'SEEN'),   
-  (10,1,'SEEN'),  
-  (11,1,'SEEN'),
-  (12,1,'SEEN'),
-  (13,1,'SEEN'),
-  (14,1,'SEEN'),
-  (15,1,'SEEN'),
-  (16,1,'SEEN'),
-  (17,1,'DELIVERED'),
-  (18,1,'DELIVERED'),
-  (19,1,'DELIVERED'),
-  (20,1,'DELIVERED'),
-  (1,2,'SEEN'),
-  (2,2,'SEEN'),
-  (3,2,'SEEN'),
-  (4,2,'SEEN'),
-  (5,2,'SEEN'),
-  (6,2,'SEEN'),
-  (7,2,'SEEN'),
-  (8,2,'SEEN'),
-  (9,2,'SEEN'),   
-  (10,2,'SEEN'),  
-  (11,2,'SEEN'),
-  (12,2,'SEEN'),
-  (13,2,'SEEN'),
-  (14,2,'SEEN'),
-  (15,2,'SEEN'),
-  (16,2,'SEEN'),
-  (17,2,'DELIVERED'),
-  (18,2,'DELIVERED'),
-  (19,2,'DELIVERED'),
-  (20,2,'DELIVERED'),
-  (1,3,'SEEN'),
-  (2,3,'SEEN'),
-  (3,3,'SEEN'),
-  (4,3,'SEEN'),
-  (5,3,'SEEN'),
-  (6,3,'SEEN'),
-  (7,3,'SEEN'),
-  (8,3,'SEEN'),
-  (9,3,'SEEN'),   
-  (10,3,'SEEN'),  
-  (11,3,'SEEN'),
-  (12,3,'SEEN'),
-  (13,3,'SEEN'),
-  (14,3,'SEEN'),
-  (15,3,'SEEN'),
-  (16,3,'SEEN'),
-  (17,3,'DELIVERED'),
-  (18,3,'DELIVERED'),
-  (19,3,'DELIVERED'),
-  (20,3,'DELIVERED'),
   (21,9,'SEEN'),
   (21,29,'SEEN'),
   (22,17,'SEEN'),
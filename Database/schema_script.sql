@@ -26,6 +26,7 @@ CREATE TABLE IF NOT EXISTS vehicle (
   location POINT NOT NULL SRID 4326,
   capacity INT NOT NULL,
   station_id INT NOT NULL,
+  updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
   CONSTRAINT fk_vehicle_station
     FOREIGN KEY (station_id) REFERENCES station(station_id)
     ON DELETE CASCADE ON UPDATE CASCADE
@@ -39,7 +40,8 @@ CREATE TABLE IF NOT EXISTS incident (
   location POINT NOT NULL SRID 4326,
   `type` ENUM('FIRE', 'POLICE', 'MEDICAL') NOT NULL,
   `status` ENUM('REPORTED', 'ASSIGNED', 'RESOLVED') NOT NULL DEFAULT 'REPORTED',
-  severity_level ENUM('LOW', 'MEDIUM', 'HIGH', 'CRITICAL') NOT NULL
+  severity_level ENUM('LOW', 'MEDIUM', 'HIGH', 'CRITICAL') NOT NULL,
+  updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)
 ) ENGINE=InnoDB;
 
 -- Table: responder_vehicle
@@ -60,6 +62,7 @@ CREATE TABLE IF NOT EXISTS dispatch (
   vehicle_id INT NOT NULL,
   incident_id INT NOT NULL,
   dispatcher_id INT,
+  updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
   UNIQUE (vehicle_id, incident_id),
   CONSTRAINT fk_dispatch_vehicle
     FOREIGN KEY (vehicle_id) REFERENCES vehicle(vehicle_id)
@@ -72,6 +75,91 @@ CREATE TABLE IF NOT EXISTS dispatch (
     ON DELETE CASCADE ON UPDATE CASCADE
 ) ENGINE=InnoDB;
 
+-- Table: incident_backlog
+-- incidents waiting for a free vehicle, most severe and oldest first
+CREATE TABLE IF NOT EXISTS incident_backlog (
+  incident_id INT NOT NULL PRIMARY KEY,
+  `type` ENUM('FIRE', 'POLICE', 'MEDICAL') NOT NULL,
+  severity_level ENUM('LOW', 'MEDIUM', 'HIGH', 'CRITICAL') NOT NULL,
+  time_reported DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  CONSTRAINT fk_backlog_incident
+    FOREIGN KEY (incident_id) REFERENCES incident(incident_id)
+    ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB;
+
+-- Table: vehicle_tombstone
+-- deleted vehicles, so delta-sync clients can drop them
+CREATE TABLE IF NOT EXISTS vehicle_tombstone (
+  vehicle_id INT NOT NULL PRIMARY KEY,
+  deleted_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6)
+) ENGINE=InnoDB;
+
+-- Table: incident_hourly
+-- hourly rollups, kept current by triggers and rebuilt from raw rows by the
+-- backfill_rollups command. hour is the start of a clock hour; reports count
+-- in the hour reported, resolutions and response times in the hour resolved.
+-- The triggers spread each (hour, type) over 16 slots by incident_id, so
+-- concurrent intakes don't queue on one row lock; readers sum the slots
+CREATE TABLE IF NOT EXISTS incident_hourly (
+  `hour` DATETIME NOT NULL,
+  `type` ENUM('FIRE', 'POLICE', 'MEDICAL') NOT NULL,
+  slot TINYINT UNSIGNED NOT NULL DEFAULT 0,
+  reported_count INT NOT NULL DEFAULT 0,
+  resolved_count INT NOT NULL DEFAULT 0,
+  response_seconds_sum BIGINT NOT NULL DEFAULT 0,
+  response_seconds_min INT,
+  response_seconds_max INT,
+  PRIMARY KEY (`hour`, `type`, slot)
+) ENGINE=InnoDB;
+
+-- Table: zone_hourly
+-- resolutions per zone of the stations that responded, each incident once
+CREATE TABLE IF NOT EXISTS zone_hourly (
+  `hour` DATETIME NOT NULL,
+  zone VARCHAR(45) NOT NULL,
+  `type` ENUM('FIRE', 'POLICE', 'MEDICAL') NOT NULL,
+  resolved_count INT NOT NULL DEFAULT 0,
+  response_seconds_sum BIGINT NOT NULL DEFAULT 0,
+  response_seconds_min INT,
+  response_seconds_max INT,
+  PRIMARY KEY (`hour`, zone, `type`)
+) ENGINE=InnoDB;
+
+-- Table: station_hourly
+-- resolutions per responding station; no foreign key, so history outlives
+-- a deleted station
+CREATE TABLE IF NOT EXISTS station_hourly (
+  `hour` DATETIME NOT NULL,
+  station_id INT NOT NULL,
+  `type` ENUM('FIRE', 'POLICE', 'MEDICAL') NOT NULL,
+  resolved_count INT NOT NULL DEFAULT 0,
+  response_seconds_sum BIGINT NOT NULL DEFAULT 0,
+  response_seconds_min INT,
+  response_seconds_max INT,
+  PRIMARY KEY (`hour`, station_id, `type`)
+) ENGINE=InnoDB;
+
+-- Table: response_time_sketch
+-- serialized DDSketch (app/sketch.py) of response seconds per hour resolved
+-- and incident type, zone, station or responder. Written by the backend on
+-- resolution, merged over a range for percentiles
+CREATE TABLE IF NOT EXISTS response_time_sketch (
+  dimension ENUM('type', 'zone', 'station', 'responder') NOT NULL,
+  `hour` DATETIME NOT NULL,
+  dimension_key VARCHAR(100) NOT NULL,
+  sketch BLOB NOT NULL,
+  PRIMARY KEY (dimension, `hour`, dimension_key)
+) ENGINE=InnoDB;
+
+-- Table: response_time_recorded
+-- incidents whose response time is in response_time_sketch, so recording
+-- one is idempotent; rebuilt together with the sketches of its hour
+CREATE TABLE IF NOT EXISTS response_time_recorded (
+  incident_id INT PRIMARY KEY,
+  recorded_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  FOREIGN KEY (incident_id) REFERENCES incident(incident_id) ON DELETE CASCADE
+) ENGINE=InnoDB;
+
 -- Table: admin_notification
 CREATE TABLE IF NOT EXISTS admin_notification (
   admin_notification_id INT AUTO_INCREMENT PRIMARY KEY,
@@ -80,25 +168,15 @@ CREATE TABLE IF NOT EXISTS admin_notification (
   created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
 ) ENGINE=InnoDB;
 
--- Table: admin_notification_status
-CREATE TABLE IF NOT EXISTS admin_notification_status (
-  admin_id INT NOT NULL,
-  admin_notification_id INT NOT NULL,
-  `status` ENUM('SEEN', 'DELIVERED') NOT NULL DEFAULT 'DELIVERED',
-  PRIMARY KEY (admin_id, admin_notification_id),
-  CONSTRAINT fk_admin_id
-    FOREIGN KEY (admin_id) REFERENCES user(user_id)
-    ON DELETE CASCADE ON UPDATE CASCADE,
-  CONSTRAINT fk_admin_notification_id
-    FOREIGN KEY (admin_notification_id) REFERENCES admin_notification(admin_notification_id)
-    ON DELETE CASCADE ON UPDATE CASCADE
-) ENGINE=InnoDB;
-
 -- Table: user_notification
+-- DISPATCHER notifications go to every dispatcher and are read through
+-- notification_watermark; RESPONDER ones go to one vehicle's crew, listed
+-- in user_notification_status
 CREATE TABLE IF NOT EXISTS user_notification (
   user_notification_id INT AUTO_INCREMENT PRIMARY KEY,
   incident_id INT NOT NULL,
   title VARCHAR(100),
+  audience ENUM('DISPATCHER', 'RESPONDER') NOT NULL DEFAULT 'DISPATCHER',
   created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
   CONSTRAINT fk_user_notif_incident
     FOREIGN KEY (incident_id) REFERENCES incident(incident_id)
@@ -119,11 +197,48 @@ CREATE TABLE IF NOT EXISTS user_notification_status (
     ON DELETE CASCADE ON UPDATE CASCADE
 ) ENGINE=InnoDB;
 
+-- Table: notification_watermark
+-- notifications for a whole role are written once, not once per user: each
+-- user keeps the id of the newest one of their feed they have seen, and
+-- everything after it is unread. DISPATCHER reads user_notification,
+-- ADMIN reads admin_notification
+CREATE TABLE IF NOT EXISTS notification_watermark (
+  user_id INT NOT NULL,
+  feed ENUM('DISPATCHER', 'ADMIN') NOT NULL,
+  last_seen_id INT NOT NULL DEFAULT 0,
+  PRIMARY KEY (user_id, feed),
+  CONSTRAINT fk_watermark_user_id
+    FOREIGN KEY (user_id) REFERENCES user(user_id)
+    ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB;
+
 -- Indexes
 create index user_role_idx on user(role);
+-- a feed's unread count is a range read past the watermark
+create index user_notification_audience_idx on user_notification(audience, user_notification_id);
+create index user_notification_status_user_idx on user_notification_status(user_id, `status`);
 create unique index user_email_idx on user(email);
 
 create index vehicle_status_idx on vehicle(`status`);  
+create spatial index vehicle_location_idx on vehicle(location);
+create index vehicle_updated_at_idx on vehicle(updated_at);
+
+create index incident_updated_at_idx on incident(updated_at);
+-- incident search, one index per keyset order and leading filter, so a page
+-- is an index range read however many resolved incidents pile up
+create index incident_status_severity_time_idx on incident(`status`, severity_level, time_reported);
+create index incident_severity_time_idx on incident(severity_level, time_reported);
+create index incident_status_time_idx on incident(`status`, time_reported);
+create index incident_type_status_time_idx on incident(`type`, `status`, time_reported);
+create index incident_time_idx on incident(time_reported);
+-- rollup backfill scans resolutions by the hour they happened
+create index incident_resolved_time_idx on incident(time_resolved);
+create spatial index incident_location_idx on incident(location);
+create index dispatch_updated_at_idx on dispatch(updated_at);
+create index vehicle_tombstone_deleted_at_idx on vehicle_tombstone(deleted_at);
 
 create spatial index station_location_idx on station(location);
 create index station_type_indx on station(`type`);
+
+-- enum order makes severity_level DESC the most urgent first
+create index incident_backlog_priority_idx on incident_backlog(`type`, severity_level DESC, time_reported);
@@ -1,11 +1,124 @@
 DELIMITER $$
 
+-- expanding-radius nearest vehicle search, must be called inside a transaction
+-- grows a box around the incident (served by vehicle_location_idx) until it
+-- holds min_candidates available units, then ranks and locks only those
+DROP PROCEDURE IF EXISTS select_nearest_vehicle$$
+CREATE PROCEDURE select_nearest_vehicle(
+    IN inc_location POINT,
+    IN inc_type ENUM('FIRE', 'POLICE', 'MEDICAL'),
+    OUT nearest_vehicle_id INT
+)
+BEGIN
+    DECLARE min_candidates INT DEFAULT 5;
+    DECLARE search_radius DOUBLE DEFAULT 1000;
+    DECLARE max_radius DOUBLE DEFAULT 64000;
+    DECLARE candidates INT DEFAULT 0;
+    DECLARE inc_lat DOUBLE;
+    DECLARE inc_lng DOUBLE;
+    DECLARE lat_delta DOUBLE;
+    DECLARE lng_delta DOUBLE;
+    DECLARE search_box GEOMETRY;
+
+    SET nearest_vehicle_id = NULL;
+    SET inc_lat = ST_Latitude(inc_location);
+    SET inc_lng = ST_Longitude(inc_location);
+
+    search_loop: LOOP
+        -- radius is in meters, one degree of latitude is ~111.32 km
+        SET lat_delta = search_radius / 111320;
+        SET lng_delta = search_radius / (111320 * GREATEST(COS(RADIANS(inc_lat)), 0.01));
+
+        SET search_box = ST_GeomFromText(
+            CONCAT(
+                'POLYGON((',
+                CAST(GREATEST(inc_lat - lat_delta, -90) AS DECIMAL(11, 7)), ' ', CAST(inc_lng - lng_delta AS DECIMAL(11, 7)), ', ',
+                CAST(LEAST(inc_lat + lat_delta, 90) AS DECIMAL(11, 7)), ' ', CAST(inc_lng - lng_delta AS DECIMAL(11, 7)), ', ',
+                CAST(LEAST(inc_lat + lat_delta, 90) AS DECIMAL(11, 7)), ' ', CAST(inc_lng + lng_delta AS DECIMAL(11, 7)), ', ',
+                CAST(GREATEST(inc_lat - lat_delta, -90) AS DECIMAL(11, 7)), ' ', CAST(inc_lng + lng_delta AS DECIMAL(11, 7)), ', ',
+                CAST(GREATEST(inc_lat - lat_delta, -90) AS DECIMAL(11, 7)), ' ', CAST(inc_lng - lng_delta AS DECIMAL(11, 7)),
+                '))'
+            ),
+            4326
+        );
+
+        SELECT COUNT(*)
+        INTO candidates
+        FROM vehicle v
+        JOIN station s ON s.station_id = v.station_id
+        WHERE MBRContains(search_box, v.location)
+          AND v.status = 'AVAILABLE'
+          AND s.type = inc_type
+          AND ST_Distance_Sphere(v.location, inc_location) <= search_radius;
+
+        IF candidates >= min_candidates OR search_radius >= max_radius THEN
+            LEAVE search_loop;
+        END IF;
+
+        SET search_radius = search_radius * 2;
+    END LOOP;
+
+    -- every unit inside the circle is a candidate, so the nearest one in it
+    -- is the nearest overall
+    IF candidates > 0 THEN
+        SELECT v.vehicle_id
+        INTO nearest_vehicle_id
+        FROM vehicle v
+        JOIN station s ON s.station_id = v.station_id
+        WHERE MBRContains(search_box, v.location)
+          AND v.status = 'AVAILABLE'
+          AND s.type = inc_type
+          AND ST_Distance_Sphere(v.location, inc_location) <= search_radius
+        ORDER BY ST_Distance_Sphere(v.location, inc_location)
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED;
+    END IF;
+
+    -- nothing within max_radius, or every candidate was locked by a
+    -- concurrent intake: fall back to the unbounded scan
+    IF nearest_vehicle_id IS NULL THEN
+        SELECT v.vehicle_id
+        INTO nearest_vehicle_id
+        FROM vehicle v
+        JOIN station s ON s.station_id = v.station_id
+        WHERE v.status = 'AVAILABLE'
+          AND s.type = inc_type
+        ORDER BY ST_Distance_Sphere(v.location, inc_location)
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED;
+    END IF;
+END$$
+
+-- the incident row returned by procedures that change an incident,
+-- same shape as get_incident_by_id in app/repo.py
+DROP PROCEDURE IF EXISTS select_incident_summary$$
+CREATE PROCEDURE select_incident_summary(
+    IN p_incident_id INT
+)
+BEGIN
+    SELECT i.incident_id, i.time_reported, i.time_resolved,
+           ST_X(i.location) as lng, ST_Y(i.location) as lat,
+           i.type, i.status, i.severity_level,
+           GROUP_CONCAT(DISTINCT v.vehicle_id) as vehicle_ids,
+           GROUP_CONCAT(DISTINCT s.zone) as station_zones,
+           TIMESTAMPDIFF(MINUTE, i.time_reported,
+                        COALESCE(i.time_resolved, NOW())) as response_time
+    FROM incident i
+    LEFT JOIN dispatch d ON i.incident_id = d.incident_id
+    LEFT JOIN vehicle v ON d.vehicle_id = v.vehicle_id
+    LEFT JOIN station s ON v.station_id = s.station_id
+    WHERE i.incident_id = p_incident_id
+    GROUP BY i.incident_id;
+END$$
+
 DROP PROCEDURE IF EXISTS handle_new_incident$$
 CREATE PROCEDURE handle_new_incident(
     IN inc_location POINT, 
     IN inc_severity_level ENUM('LOW', 'MEDIUM', 'HIGH', 'CRITICAL'),
     IN inc_type ENUM('FIRE', 'POLICE', 'MEDICAL'),
-    OUT available_vehicle_id INT
+    IN preferred_vehicle_ids VARCHAR(1000),
+    OUT available_vehicle_id INT,
+    OUT created_incident_id INT
 )
 BEGIN
     DECLARE new_incident_id INT;
@@ -16,20 +129,33 @@ BEGIN
     VALUES (inc_location, inc_severity_level, inc_type);
 
     SET new_incident_id = LAST_INSERT_ID();
+    SET created_incident_id = new_incident_id;
+
+    -- comma separated ids ranked by road travel time, first free one wins
+    IF preferred_vehicle_ids IS NOT NULL THEN
+        SELECT v.vehicle_id
+        INTO available_vehicle_id
+        FROM vehicle v
+        WHERE FIND_IN_SET(v.vehicle_id, preferred_vehicle_ids)
+          AND v.status = 'AVAILABLE'
+        ORDER BY FIND_IN_SET(v.vehicle_id, preferred_vehicle_ids)
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED;
+    END IF;
 
-    SELECT v.vehicle_id
-    INTO available_vehicle_id 
-    FROM vehicle v
-    JOIN station s ON s.station_id = v.station_id
-    WHERE v.status = 'AVAILABLE'
-      AND s.type = inc_type
-    ORDER BY ST_Distance_Sphere(v.location, inc_location)
-    LIMIT 1
-    FOR UPDATE SKIP LOCKED;
+    IF available_vehicle_id IS NULL THEN
+        CALL select_nearest_vehicle(inc_location, inc_type, available_vehicle_id);
+    END IF;
 
     IF available_vehicle_id IS NULL THEN
         -- ROLLBACK;
 
+        -- queue it, assign_backlog_to_vehicle picks it up when a unit frees up
+        INSERT INTO incident_backlog (incident_id, type, severity_level, time_reported)
+        SELECT incident_id, type, severity_level, time_reported
+        FROM incident
+        WHERE incident_id = new_incident_id;
+
         INSERT INTO admin_notification (title, body) 
         VALUES (
             'No available vehicles',
@@ -53,6 +179,18 @@ BEGIN
     VALUES (available_vehicle_id, new_incident_id);
 
     COMMIT;
+
+    -- return the created incident so the caller needs no second query
+    SELECT i.incident_id, i.time_reported,
+           ST_X(i.location) as lng, ST_Y(i.location) as lat,
+           i.type, i.status, i.severity_level,
+           d.vehicle_id, v.status as vehicle_status,
+           s.zone as station_zone
+    FROM incident i
+    LEFT JOIN dispatch d ON i.incident_id = d.incident_id
+    LEFT JOIN vehicle v ON d.vehicle_id = v.vehicle_id
+    LEFT JOIN station s ON v.station_id = s.station_id
+    WHERE i.incident_id = new_incident_id;
 END$$
 
 
@@ -66,11 +204,12 @@ CREATE PROCEDURE modify_dispatch(
 BEGIN
     DECLARE new_vehicle_status VARCHAR(10);
     DECLARE old_dispatcher_id INT;
+    DECLARE v_incident_id INT;
 
     START TRANSACTION;
 
-    SELECT dispatcher_id
-    INTO old_dispatcher_id 
+    SELECT dispatcher_id, incident_id
+    INTO old_dispatcher_id, v_incident_id
     FROM dispatch 
     WHERE dispatch_id = p_dispatch_id
     FOR UPDATE;
@@ -103,6 +242,50 @@ BEGIN
     SET is_modified = TRUE;
 
     COMMIT;
+
+    CALL select_incident_summary(v_incident_id);
+END$$
+
+
+-- hand a vehicle that just became AVAILABLE to the most urgent queued
+-- incident of its type, must be called inside a transaction
+DROP PROCEDURE IF EXISTS assign_backlog_to_vehicle$$
+CREATE PROCEDURE assign_backlog_to_vehicle(
+    IN p_vehicle_id INT
+)
+BEGIN
+    DECLARE v_type VARCHAR(10) DEFAULT NULL;
+    DECLARE v_incident_id INT DEFAULT NULL;
+    -- keep NOT FOUND from reaching a caller's cursor loop handler
+    DECLARE CONTINUE HANDLER FOR NOT FOUND SET v_incident_id = NULL;
+
+    SELECT s.type
+    INTO v_type
+    FROM vehicle v
+    JOIN station s ON s.station_id = v.station_id
+    WHERE v.vehicle_id = p_vehicle_id
+      AND v.status = 'AVAILABLE'
+    FOR UPDATE;
+
+    SELECT incident_id
+    INTO v_incident_id
+    FROM incident_backlog
+    WHERE type = v_type
+    ORDER BY severity_level DESC, time_reported
+    LIMIT 1
+    FOR UPDATE SKIP LOCKED;
+
+    IF v_incident_id IS NOT NULL THEN
+        DELETE FROM incident_backlog
+        WHERE incident_id = v_incident_id;
+
+        UPDATE vehicle
+        SET status = 'PENDING'
+        WHERE vehicle_id = p_vehicle_id;
+
+        INSERT INTO dispatch (vehicle_id, incident_id)
+        VALUES (p_vehicle_id, v_incident_id);
+    END IF;
 END$$
 
 
@@ -111,11 +294,24 @@ CREATE PROCEDURE resolve_incident(
     IN p_incident_id INT 
 )
 BEGIN   
+    DECLARE done BOOLEAN DEFAULT FALSE;
+    DECLARE v_vehicle_id INT;
+    DECLARE freed_vehicles CURSOR FOR
+        SELECT d.vehicle_id
+        FROM dispatch d
+        WHERE d.incident_id = p_incident_id;
+    DECLARE CONTINUE HANDLER FOR NOT FOUND SET done = TRUE;
+
+    START TRANSACTION;
+
     UPDATE incident 
     SET status = 'RESOLVED', 
         time_resolved = CURRENT_TIMESTAMP
     WHERE incident_id = p_incident_id;
 
+    DELETE FROM incident_backlog
+    WHERE incident_id = p_incident_id;
+
     UPDATE vehicle
     SET status = 'AVAILABLE'
     WHERE vehicle_id IN (
@@ -123,6 +319,21 @@ BEGIN
         FROM dispatch d
         WHERE d.incident_id = p_incident_id
     );
+
+    -- freed vehicles go straight to queued incidents
+    OPEN freed_vehicles;
+    freed_loop: LOOP
+        FETCH freed_vehicles INTO v_vehicle_id;
+        IF done THEN
+            LEAVE freed_loop;
+        END IF;
+        CALL assign_backlog_to_vehicle(v_vehicle_id);
+    END LOOP;
+    CLOSE freed_vehicles;
+
+    COMMIT;
+
+    CALL select_incident_summary(p_incident_id);
 END$$
 
 DROP PROCEDURE IF EXISTS reassign_incident_vehicle$$
@@ -167,6 +378,9 @@ BEGIN
     WHERE incident_id = p_incident_id
     LIMIT 1;
 
+    DELETE FROM incident_backlog
+    WHERE incident_id = p_incident_id;
+
     IF v_old_vehicle_id IS NOT NULL THEN
         UPDATE vehicle
         SET status = 'AVAILABLE'
@@ -179,6 +393,10 @@ BEGIN
     INSERT INTO dispatch (vehicle_id, incident_id, dispatcher_id)
     VALUES (p_new_vehicle_id, p_incident_id, p_dispatcher_id);
 
+    IF v_old_vehicle_id IS NOT NULL THEN
+        CALL assign_backlog_to_vehicle(v_old_vehicle_id);
+    END IF;
+
     UPDATE vehicle
     SET status = 'PENDING'
     WHERE vehicle_id = p_new_vehicle_id;
@@ -188,6 +406,8 @@ BEGIN
     WHERE incident_id = p_incident_id;
 
     COMMIT;
+
+    CALL select_incident_summary(p_incident_id);
 END$$
 
 DROP PROCEDURE IF EXISTS assign_responder_to_vehicle$$
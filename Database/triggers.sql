@@ -1,26 +1,15 @@
 DELIMITER $$
 
--- notify dispatcher after automatic vehicle assignment to new incident
+-- notify dispatchers after automatic vehicle assignment to new incident;
+-- one row however many dispatchers there are, each reads it past their
+-- notification_watermark
 CREATE TRIGGER notify_dispatchers_after_auto_assign
 AFTER INSERT ON dispatch
 FOR EACH ROW
 BEGIN
-    DECLARE new_notification_id INT;
     IF NEW.dispatcher_id IS NULL THEN
-
-        -- Create a new notification for the incident
-        INSERT INTO user_notification (incident_id, title)
-        VALUES (NEW.incident_id, 'New Incident');
-
-        -- Get the generated notification ID
-        SET new_notification_id = LAST_INSERT_ID();
-
-        -- Send this notification to all dispatchers
-        INSERT INTO user_notification_status (user_notification_id, user_id)
-        SELECT new_notification_id, user_id
-        FROM user
-        WHERE role = 'DISPATCHER';
-
+        INSERT INTO user_notification (incident_id, title, audience)
+        VALUES (NEW.incident_id, 'New Incident', 'DISPATCHER');
     END IF;
 END $$
 
@@ -34,8 +23,8 @@ BEGIN
     IF OLD.dispatcher_id IS NULL AND NEW.dispatcher_id IS NOT NULL THEN
 
         -- Create a new notification for the incident
-        INSERT INTO user_notification (incident_id, title)
-        VALUES (NEW.incident_id, 'New Assigned Incident');
+        INSERT INTO user_notification (incident_id, title, audience)
+        VALUES (NEW.incident_id, 'New Assigned Incident', 'RESPONDER');
 
         -- Get the generated notification ID
         SET new_notification_id = LAST_INSERT_ID();
@@ -49,16 +38,155 @@ BEGIN
 END $$
 
 
-CREATE TRIGGER notify_admins
-AFTER INSERT ON admin_notification
+-- a new dispatcher or admin starts with everything already sent as seen,
+-- as they were not around to be notified
+CREATE TRIGGER start_notification_watermark
+AFTER INSERT ON user
 FOR EACH ROW
-BEGIN 
-    INSERT INTO admin_notification_status (admin_id, admin_notification_id)
-    SELECT user_id, NEW.admin_notification_id 
-    FROM user 
-    WHERE role = 'ADMIN';
-END$$
+BEGIN
+    IF NEW.role = 'DISPATCHER' THEN
+        INSERT IGNORE INTO notification_watermark (user_id, feed, last_seen_id)
+        SELECT NEW.user_id, 'DISPATCHER', COALESCE(MAX(user_notification_id), 0)
+        FROM user_notification
+        WHERE audience = 'DISPATCHER';
+    ELSEIF NEW.role = 'ADMIN' THEN
+        INSERT IGNORE INTO notification_watermark (user_id, feed, last_seen_id)
+        SELECT NEW.user_id, 'ADMIN', COALESCE(MAX(admin_notification_id), 0)
+        FROM admin_notification;
+    END IF;
+END $$
 
 
-DELIMITER ;
+-- the same for a user promoted into a role with a feed
+CREATE TRIGGER move_notification_watermark
+AFTER UPDATE ON user
+FOR EACH ROW
+BEGIN
+    IF NEW.role <> OLD.role AND NEW.role = 'DISPATCHER' THEN
+        INSERT IGNORE INTO notification_watermark (user_id, feed, last_seen_id)
+        SELECT NEW.user_id, 'DISPATCHER', COALESCE(MAX(user_notification_id), 0)
+        FROM user_notification
+        WHERE audience = 'DISPATCHER';
+    ELSEIF NEW.role <> OLD.role AND NEW.role = 'ADMIN' THEN
+        INSERT IGNORE INTO notification_watermark (user_id, feed, last_seen_id)
+        SELECT NEW.user_id, 'ADMIN', COALESCE(MAX(admin_notification_id), 0)
+        FROM admin_notification;
+    END IF;
+END $$
+
 
+-- delta sync: changes that alter a listed row without touching its own
+-- updated_at column bump it here
+
+-- an incident loses a vehicle from vehicle_ids
+CREATE TRIGGER touch_incident_after_dispatch_delete
+AFTER DELETE ON dispatch
+FOR EACH ROW
+BEGIN
+    UPDATE incident
+    SET updated_at = CURRENT_TIMESTAMP(6)
+    WHERE incident_id = OLD.incident_id;
+END $$
+
+
+-- responder_count of the vehicle changes
+CREATE TRIGGER touch_vehicle_after_responder_assign
+AFTER INSERT ON responder_vehicle
+FOR EACH ROW
+BEGIN
+    UPDATE vehicle
+    SET updated_at = CURRENT_TIMESTAMP(6)
+    WHERE vehicle_id = NEW.vehicle_id;
+END $$
+
+
+CREATE TRIGGER touch_vehicle_after_responder_unassign
+AFTER DELETE ON responder_vehicle
+FOR EACH ROW
+BEGIN
+    UPDATE vehicle
+    SET updated_at = CURRENT_TIMESTAMP(6)
+    WHERE vehicle_id = OLD.vehicle_id;
+END $$
+
+
+-- rows removed by a foreign key cascade (station deletion) fire no trigger
+CREATE TRIGGER record_vehicle_tombstone
+AFTER DELETE ON vehicle
+FOR EACH ROW
+BEGIN
+    INSERT INTO vehicle_tombstone (vehicle_id)
+    VALUES (OLD.vehicle_id)
+    ON DUPLICATE KEY UPDATE deleted_at = CURRENT_TIMESTAMP(6);
+END $$
+
+
+-- hourly rollups, see incident_hourly in schema_script.sql
+
+CREATE TRIGGER rollup_incident_reported
+AFTER INSERT ON incident
+FOR EACH ROW
+BEGIN
+    -- runs inside handle_new_incident, the slot keeps simultaneous reports
+    -- of one type off each other's row lock
+    INSERT INTO incident_hourly (`hour`, `type`, slot, reported_count)
+    VALUES (DATE_FORMAT(NEW.time_reported, '%Y-%m-%d %H:00:00'), NEW.type,
+            NEW.incident_id % 16, 1)
+    ON DUPLICATE KEY UPDATE reported_count = reported_count + 1;
+END $$
+
+
+-- runs inside resolve_incident while the dispatch rows still name the
+-- responding vehicles
+CREATE TRIGGER rollup_incident_resolved
+AFTER UPDATE ON incident
+FOR EACH ROW
+BEGIN
+    DECLARE v_hour DATETIME;
+    DECLARE v_seconds INT;
+    IF NEW.status = 'RESOLVED' AND OLD.status <> 'RESOLVED'
+       AND NEW.time_resolved IS NOT NULL THEN
+
+        SET v_hour = DATE_FORMAT(NEW.time_resolved, '%Y-%m-%d %H:00:00');
+        SET v_seconds = TIMESTAMPDIFF(SECOND, NEW.time_reported, NEW.time_resolved);
+
+        INSERT INTO incident_hourly (`hour`, `type`, slot, resolved_count,
+            response_seconds_sum, response_seconds_min, response_seconds_max)
+        VALUES (v_hour, NEW.type, NEW.incident_id % 16, 1, v_seconds, v_seconds, v_seconds)
+        ON DUPLICATE KEY UPDATE
+            resolved_count = resolved_count + 1,
+            response_seconds_sum = response_seconds_sum + v_seconds,
+            response_seconds_min = LEAST(COALESCE(response_seconds_min, v_seconds), v_seconds),
+            response_seconds_max = GREATEST(COALESCE(response_seconds_max, v_seconds), v_seconds);
+
+        INSERT INTO station_hourly (`hour`, station_id, `type`, resolved_count,
+            response_seconds_sum, response_seconds_min, response_seconds_max)
+        SELECT DISTINCT v_hour, v.station_id, NEW.type, 1, v_seconds, v_seconds, v_seconds
+        FROM dispatch d
+        INNER JOIN vehicle v ON v.vehicle_id = d.vehicle_id
+        WHERE d.incident_id = NEW.incident_id
+        ON DUPLICATE KEY UPDATE
+            resolved_count = resolved_count + 1,
+            response_seconds_sum = response_seconds_sum + v_seconds,
+            response_seconds_min = LEAST(COALESCE(response_seconds_min, v_seconds), v_seconds),
+            response_seconds_max = GREATEST(COALESCE(response_seconds_max, v_seconds), v_seconds);
+
+        INSERT INTO zone_hourly (`hour`, zone, `type`, resolved_count,
+            response_seconds_sum, response_seconds_min, response_seconds_max)
+        SELECT DISTINCT v_hour, s.zone, NEW.type, 1, v_seconds, v_seconds, v_seconds
+        FROM dispatch d
+        INNER JOIN vehicle v ON v.vehicle_id = d.vehicle_id
+        INNER JOIN station s ON s.station_id = v.station_id
+        WHERE d.incident_id = NEW.incident_id
+        AND s.zone IS NOT NULL
+        ON DUPLICATE KEY UPDATE
+            resolved_count = resolved_count + 1,
+            response_seconds_sum = response_seconds_sum + v_seconds,
+            response_seconds_min = LEAST(COALESCE(response_seconds_min, v_seconds), v_seconds),
+            response_seconds_max = GREATEST(COALESCE(response_seconds_max, v_seconds), v_seconds);
+
+    END IF;
+END $$
+
+
+DELIMITER ;
@@ -0,0 +1,308 @@
+import asyncio
+import math
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .repo import (
+    assign_vehicles_batch,
+    enqueue_incident_backlog,
+    get_dispatched_incidents,
+    get_vehicle_candidates,
+    insert_incident,
+    lock_available_vehicles,
+    notify_no_available_vehicle,
+    publish_incidents,
+    publish_vehicles,
+)
+from .routing import distance_m, get_router
+
+# how much a meter (or road second) of travel costs per severity level
+SEVERITY_WEIGHTS = {"LOW": 1, "MEDIUM": 2, "HIGH": 4, "CRITICAL": 8}
+
+# added to the straight-line meters of units the road network cannot reach,
+# so they rank after every reachable unit, as in handle_new_incident's
+# fallback behind the preferred list
+UNREACHABLE_COST = 1e9
+
+# a report left unmatched while candidates were locked by another
+# transaction goes back to the queue this many times before it is backlogged
+MAX_MATCH_ATTEMPTS = 3
+
+
+def min_cost_assignment(cost):
+    """
+    Solve the rectangular assignment problem (Hungarian algorithm)
+
+    Args:
+        cost: list of rows, each a list of the same length
+
+    Returns:
+        list: (row, col) pairs, one per row or one per column whichever is fewer,
+        with the minimum total cost
+    """
+    if not cost or not cost[0]:
+        return []
+
+    n, m = len(cost), len(cost[0])
+    if n > m:
+        transposed = [[cost[i][j] for i in range(n)] for j in range(m)]
+        return sorted((i, j) for j, i in min_cost_assignment(transposed))
+
+    # 1-indexed potentials, p[j] is the row matched to column j
+    u = [0.0] * (n + 1)
+    v = [0.0] * (m + 1)
+    p = [0] * (m + 1)
+    way = [0] * (m + 1)
+
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        min_v = [math.inf] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            delta = math.inf
+            j1 = 0
+            for j in range(1, m + 1):
+                if used[j]:
+                    continue
+                cur = cost[i0 - 1][j - 1] - u[i0] - v[j]
+                if cur < min_v[j]:
+                    min_v[j] = cur
+                    way[j] = j0
+                if min_v[j] < delta:
+                    delta = min_v[j]
+                    j1 = j
+            for j in range(m + 1):
+                if used[j]:
+                    u[p[j]] += delta
+                    v[j] -= delta
+                else:
+                    min_v[j] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+
+    return sorted((p[j] - 1, j - 1) for j in range(1, m + 1) if p[j])
+
+
+class PendingReport:
+    def __init__(self, incident_type, lat, lng, severity):
+        self.incident_type = incident_type
+        self.lat = float(lat)
+        self.lng = float(lng)
+        self.severity = severity
+        self.incident_id = None
+        # ticks it went through unmatched because candidates were locked
+        self.attempts = 0
+        self.future = Future()
+
+
+class AssignmentEngine:
+    """
+    Collects incident reports for a short window and dispatches the whole
+    batch with one severity-weighted min-cost matching in one transaction.
+    """
+
+    def __init__(self, window_ms, max_batch=64):
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.pending = queue.Queue()
+        self.thread = threading.Thread(
+            target=self.run, name="assignment-engine", daemon=True
+        )
+        self.thread.start()
+
+    def submit(self, incident_type, lat, lng, severity):
+        """Queue a report and block until its batch is committed"""
+        return self.enqueue(incident_type, lat, lng, severity).result()
+
+    async def submit_async(self, incident_type, lat, lng, severity):
+        """submit for async views, awaits the batch without holding a thread"""
+        future = self.enqueue(incident_type, lat, lng, severity)
+        return await asyncio.wrap_future(future)
+
+    def enqueue(self, incident_type, lat, lng, severity):
+        report = PendingReport(incident_type, lat, lng, severity)
+        self.pending.put(report)
+        return report.future
+
+    def run(self):
+        while True:
+            batch = [self.pending.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            close_old_connections()
+            try:
+                self.process(batch)
+            except Exception as e:
+                for report in batch:
+                    if not report.future.done():
+                        report.future.set_exception(e)
+            finally:
+                close_old_connections()
+
+    def process(self, batch):
+        assignments = []
+        deferred = []
+        # deferred reports were inserted and announced on an earlier tick
+        retried_ids = {report.incident_id for report in batch if report.incident_id is not None}
+        with transaction.atomic():
+            # a savepoint per report, a rejected insert fails only its own caller
+            inserted = []
+            for report in batch:
+                if report.incident_id is not None:
+                    inserted.append(report)
+                    continue
+                try:
+                    with transaction.atomic():
+                        report.incident_id = insert_incident(
+                            report.incident_type, report.lat, report.lng, report.severity
+                        )
+                except Exception as e:
+                    report.future.set_exception(e)
+                else:
+                    inserted.append(report)
+            batch = inserted
+            if not batch:
+                return
+
+            by_type = {}
+            for report in batch:
+                by_type.setdefault(report.incident_type, []).append(report)
+            contended = set()
+            for incident_type, reports in by_type.items():
+                matched, skipped = self.match(incident_type, reports)
+                assignments.extend(matched)
+                if skipped:
+                    contended.add(incident_type)
+
+            assign_vehicles_batch(assignments)
+
+            assigned = {incident_id for incident_id, _ in assignments}
+            for report in batch:
+                if report.incident_id in assigned:
+                    continue
+                # units another transaction holds may be free on the next
+                # tick, only a report that found none is backlogged
+                if report.incident_type in contended and report.attempts < MAX_MATCH_ATTEMPTS:
+                    report.attempts += 1
+                    deferred.append(report)
+                    continue
+                enqueue_incident_backlog(report.incident_id)
+                notify_no_available_vehicle(
+                    report.incident_id, report.incident_type, report.severity
+                )
+
+        deferred_ids = {report.incident_id for report in deferred}
+        incident_ids = [report.incident_id for report in batch]
+        incidents = get_dispatched_incidents(incident_ids)
+        publish_incidents(
+            "incident.created", [i for i in incident_ids if i not in retried_ids]
+        )
+        publish_incidents(
+            "incident.updated",
+            [i for i in incident_ids if i in retried_ids and i not in deferred_ids],
+        )
+        publish_vehicles([vehicle_id for _, vehicle_id in assignments])
+
+        for report in batch:
+            if report.incident_id in deferred_ids:
+                continue
+            if report.incident_id in assigned:
+                report.future.set_result(incidents.get(report.incident_id))
+            else:
+                report.future.set_exception(Exception("No available vehicle found"))
+        for report in deferred:
+            self.pending.put(report)
+
+    def match(self, incident_type, reports):
+        """(incident_id, vehicle_id) pairs, and whether any candidate could not be locked"""
+        # an optimal matching of n reports only ever uses each report's n nearest
+        # units, so only those are fetched through the spatial index and locked
+        router = get_router()
+        per_report = len(reports)
+        if router is not None:
+            per_report = max(per_report, settings.ROUTING_CANDIDATES)
+        positions = {}
+        for report in reports:
+            for vehicle in get_vehicle_candidates(
+                incident_type, report.lat, report.lng, per_report
+            ):
+                positions[vehicle["vehicle_id"]] = (vehicle["lng"], vehicle["lat"])
+        if not positions:
+            return [], False
+
+        vehicles = sorted((vehicle_id, lng, lat) for vehicle_id, (lng, lat) in positions.items())
+        distances = [
+            [distance_m(lng, lat, report.lng, report.lat) for _, lng, lat in vehicles]
+            for report in reports
+        ]
+
+        # straight-line meters only pick the candidates, road seconds rank them
+        if router is not None:
+            sources = [(lng, lat) for _, lng, lat in vehicles]
+            for i, report in enumerate(reports):
+                times = router.travel_times_to(report.lng, report.lat, sources)
+                for j, seconds in enumerate(times):
+                    if seconds is not None:
+                        distances[i][j] = seconds
+                    else:
+                        distances[i][j] += UNREACHABLE_COST
+
+        locked = lock_available_vehicles([vehicle_id for vehicle_id, _, _ in vehicles])
+        # skipped by SKIP LOCKED, or taken since the candidate read
+        skipped = len(locked) < len(vehicles)
+        columns = [j for j, vehicle in enumerate(vehicles) if vehicle[0] in locked]
+        if not columns:
+            return [], skipped
+
+        # when units are short the most severe reports are served first, the
+        # matching only decides which unit goes where
+        if len(reports) > len(columns):
+            order = sorted(
+                range(len(reports)),
+                key=lambda i: -SEVERITY_WEIGHTS[reports[i].severity],
+            )
+            keep = sorted(order[: len(columns)])
+            reports = [reports[i] for i in keep]
+            distances = [distances[i] for i in keep]
+
+        cost = [
+            [distances[i][j] * SEVERITY_WEIGHTS[report.severity] for j in columns]
+            for i, report in enumerate(reports)
+        ]
+        return [
+            (reports[i].incident_id, vehicles[columns[j]][0])
+            for i, j in min_cost_assignment(cost)
+        ], skipped
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_assignment_engine():
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = AssignmentEngine(settings.DISPATCH_BATCH_WINDOW_MS)
+        return _engine
@@ -0,0 +1,398 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from .db_pool import AsyncConnectionPool
+from .events import incident_scope, send_event_async, vehicle_scope
+from .replicas import (
+    REPLICA_STATUS_SQL,
+    current_session,
+    get_replicas,
+    pinned_async,
+    replica_lag,
+)
+from .repo import (
+    SYNC_CURSOR,
+    VEHICLE_BY_ID,
+    VEHICLE_EXISTS,
+    VEHICLE_LOCATION,
+    all_incidents_query,
+    all_vehicles_query,
+    candidate_radii,
+    deleted_vehicle_ids_query,
+    dispatched_incidents_query,
+    enough_candidates,
+    incident_summaries_query,
+    new_incident_call,
+    picked_up_incidents_query,
+    rank_preferred_vehicles,
+    record_resolution,
+    removed_incident_ids_query,
+    removed_vehicle_ids_query,
+    split_ids,
+    sync_cursor_value,
+    vehicle_candidates_query,
+    vehicle_location_params,
+    vehicles_by_ids_query,
+)
+from .routing import get_router
+from .rows import map_row, map_rows, record_type
+from .statements import Statement, clear_variables_sql
+
+# The hot endpoints on aiomysql (ASYNC_DB), so a slow query waits on the
+# event loop instead of on the one thread Django runs sync views on. The SQL
+# is shared with repo; rows come back as the same records.
+
+# one pool per event loop and database alias, an ASGI worker runs a single loop
+_pools = {}
+
+
+def get_pool(alias=DEFAULT_DB_ALIAS):
+    """The current loop's connection pool for alias, connections open on first use"""
+    key = (asyncio.get_running_loop(), alias)
+    pool = _pools.get(key)
+    if pool is None:
+        pool = _pools[key] = AsyncConnectionPool(
+            connect=lambda: connect(alias),
+            ping=lambda connection: connection.ping(reconnect=False),
+            reset=reset_connection,
+            close=lambda connection: connection.close(),
+            size=settings.ASYNC_DB_POOL_SIZE,
+            timeout=settings.DB_POOL_TIMEOUT,
+            max_lifetime=settings.DB_POOL_MAX_LIFETIME,
+            check_after=settings.DB_POOL_CHECK_AFTER,
+        )
+    return pool
+
+
+async def connect(alias=DEFAULT_DB_ALIAS):
+    import aiomysql
+    from pymysql.constants import CLIENT
+
+    db = settings.DATABASES[alias]
+    return await aiomysql.connect(
+        host=db["HOST"] or "localhost",
+        port=int(db["PORT"] or 3306),
+        user=db["USER"],
+        password=db["PASSWORD"] or "",
+        db=db["NAME"],
+        charset="utf8mb4",
+        # every statement commits on its own, as Django's default autocommit
+        autocommit=True,
+        # prepared statements send their SET and EXECUTE together; rowcount
+        # counts matched rows, as on Django's MySQL connections, so writing
+        # an unchanged value still finds the row
+        client_flag=CLIENT.MULTI_STATEMENTS | CLIENT.FOUND_ROWS,
+        connect_timeout=db.get("OPTIONS", {}).get("connect_timeout"),
+    )
+
+
+async def reset_connection(connection):
+    if not connection.get_autocommit():
+        await connection.rollback()
+        await connection.autocommit(True)
+    # prepared statement parameters would stay readable in the session
+    clear = clear_variables_sql(connection)
+    if clear:
+        async with connection.cursor() as cursor:
+            await cursor.execute(clear)
+
+
+async def close_pool():
+    """Close the current loop's pools, for scripts that run several loops"""
+    loop = asyncio.get_running_loop()
+    for key in [key for key in list(_pools) if key[0] is loop]:
+        _pools.pop(key).close_all()
+
+
+def pool_metrics():
+    """Metrics of the async pools in this process, one per event loop and alias"""
+    return [{"alias": alias, **pool.metrics()} for (_, alias), pool in list(_pools.items())]
+
+
+async def read_alias(session):
+    """replicas.read_alias for async code, the lag checks run on the async pools"""
+    replicas = get_replicas()
+    if replicas is None:
+        return DEFAULT_DB_ALIAS
+    if await pinned_async(session):
+        return replicas.choose(pinned=True)
+    for alias in replicas.due():
+        replicas.record(alias, await check_lag(alias))
+    return replicas.choose()
+
+
+async def check_lag(alias):
+    try:
+        return replica_lag(await fetch_one(REPLICA_STATUS_SQL, alias=alias))
+    except Exception:
+        return None
+
+
+async def fetch_all(sql, params=None, alias=DEFAULT_DB_ALIAS):
+    pool = get_pool(alias)
+    async with pool.connection() as conn:
+        async with conn.cursor() as cursor:
+            await run(cursor, sql, params)
+            rows = await cursor.fetchall()
+            return map_rows(rows, cursor.description)
+
+
+async def fetch_one(sql, params=None, alias=DEFAULT_DB_ALIAS):
+    """sql may also be a registered Statement, as in execute"""
+    pool = get_pool(alias)
+    async with pool.connection() as conn:
+        async with conn.cursor() as cursor:
+            await run(cursor, sql, params)
+            return map_row(await cursor.fetchone(), cursor.description)
+
+
+async def execute(sql, params=None):
+    """Run a write, returns the affected row count"""
+    pool = get_pool()
+    async with pool.connection() as conn:
+        async with conn.cursor() as cursor:
+            await run(cursor, sql, params)
+            return cursor.rowcount
+
+
+async def run(cursor, sql, params):
+    if isinstance(sql, Statement):
+        await sql.execute_async(cursor, params)
+    else:
+        await cursor.execute(sql, params)
+
+
+async def call_procedure(sql, params=None):
+    """The row a stored procedure returns, its remaining result sets drained"""
+    pool = get_pool()
+    async with pool.connection() as conn:
+        async with conn.cursor() as cursor:
+            await cursor.execute(sql, params)
+            row = await cursor.fetchone()
+            description = cursor.description
+            while await cursor.nextset():
+                pass
+            return map_row(row, description)
+
+
+async def stream_query(sql, params, chunk_size=500, session=None):
+    """
+    repo.stream_query for async code. Holds a pooled connection until the
+    generator is exhausted or closed. With a session, reads from the
+    database read_alias picks for it.
+    """
+    import aiomysql
+
+    alias = DEFAULT_DB_ALIAS if session is None else await read_alias(session)
+    pool = get_pool(alias)
+    async with pool.connection() as conn:
+        # closing the cursor also discards unread rows
+        async with conn.cursor(aiomysql.SSCursor) as cursor:
+            await cursor.execute(sql, params)
+            record = record_type(cursor.description)
+            while True:
+                rows = await cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield record(row)
+
+
+# ============= INCIDENT MANAGEMENT =============
+
+
+async def create_incident(
+    incident_type, location_lat, location_lng, severity, description=None
+):
+    if settings.DISPATCH_BATCH_WINDOW_MS > 0:
+        from .assignment import get_assignment_engine
+
+        try:
+            return await get_assignment_engine().submit_async(
+                incident_type, location_lat, location_lng, severity
+            )
+        except Exception as e:
+            raise Exception(f"Incident created but not assigned: {str(e)}")
+
+    try:
+        preferred_vehicle_ids = None
+        # loading the graph and the A*/Dijkstra ranking are CPU-bound, they
+        # run on the thread pool so the event loop keeps serving requests
+        router = await sync_to_async(get_router, thread_sensitive=False)()
+        if router is not None:
+            limit = settings.ROUTING_CANDIDATES
+            for radius in candidate_radii():
+                candidates = await fetch_all(
+                    *vehicle_candidates_query(
+                        incident_type, location_lat, location_lng, limit, radius
+                    )
+                )
+                if enough_candidates(candidates, limit, radius):
+                    break
+            preferred_vehicle_ids = await sync_to_async(
+                rank_preferred_vehicles, thread_sensitive=False
+            )(router, location_lat, location_lng, candidates)
+
+        incident = await call_procedure(
+            *new_incident_call(
+                incident_type, location_lat, location_lng, severity, preferred_vehicle_ids
+            )
+        )
+
+        # dashboards render the listing shape, not the procedure's row
+        await publish_incidents("incident.created", [incident["incident_id"]])
+        await publish_vehicles([incident["vehicle_id"]])
+        return incident
+
+    except Exception as e:
+        raise Exception(f"Incident created but not assigned: {str(e)}")
+
+
+async def get_dispatched_incidents(incident_ids):
+    """Get incidents with their dispatch info, keyed by incident_id"""
+    if not incident_ids:
+        return {}
+    try:
+        incidents = await fetch_all(*dispatched_incidents_query(incident_ids))
+        return {incident["incident_id"]: incident for incident in incidents}
+    except Exception as e:
+        raise Exception(f"Failed to fetch incidents: {str(e)}")
+
+
+def iter_all_incidents(status=None, since=None):
+    # the generator starts after the view returned, take the session now
+    return stream_query(*all_incidents_query(status, since), session=current_session())
+
+
+async def resolve_incident(incident_id):
+    """Resolve incident using stored procedure"""
+    try:
+        incident = await call_procedure("CALL resolve_incident(%s)", [incident_id])
+        if not incident:
+            raise Exception("Incident not found")
+
+        await send_event_async("incident.updated", incident, *incident_scope(incident))
+        await publish_freed_vehicles(split_ids(incident["vehicle_ids"]), incident_id)
+        # the response-time sketch update is a locking transaction on
+        # Django's connection, rare next to reports, so it stays sync
+        await sync_to_async(record_resolution)(incident_id)
+        return incident
+    except Exception as e:
+        raise Exception(f"Failed to resolve incident: {str(e)}")
+
+
+# ============= VEHICLE MANAGEMENT =============
+
+
+def iter_all_vehicles(status=None, since=None):
+    return stream_query(*all_vehicles_query(status, since), session=current_session())
+
+
+async def get_removed_incident_ids(status, since):
+    """repo.get_removed_incident_ids"""
+    try:
+        sql, params = removed_incident_ids_query(status, since)
+        rows = await fetch_all(sql, params, alias=await read_alias(current_session()))
+        return [row["incident_id"] for row in rows]
+    except Exception as e:
+        raise Exception(f"Failed to fetch removed incidents: {str(e)}")
+
+
+async def get_removed_vehicle_ids(status, since):
+    """repo.get_removed_vehicle_ids"""
+    try:
+        sql, params = removed_vehicle_ids_query(status, since)
+        rows = await fetch_all(sql, params, alias=await read_alias(current_session()))
+        return [row["vehicle_id"] for row in rows]
+    except Exception as e:
+        raise Exception(f"Failed to fetch removed vehicles: {str(e)}")
+
+
+async def get_deleted_vehicle_ids(since):
+    """Ids of vehicles deleted after a delta-sync cursor"""
+    try:
+        sql, params = deleted_vehicle_ids_query(since)
+        rows = await fetch_all(sql, params, alias=await read_alias(current_session()))
+        return [row["vehicle_id"] for row in rows]
+    except Exception as e:
+        raise Exception(f"Failed to fetch deleted vehicles: {str(e)}")
+
+
+async def get_vehicle_by_id(vehicle_id):
+    try:
+        vehicle = await fetch_one(VEHICLE_BY_ID, [vehicle_id])
+        if not vehicle:
+            raise Exception("Vehicle not found")
+        return vehicle
+    except Exception as e:
+        raise Exception(f"Failed to fetch vehicle: {str(e)}")
+
+
+async def vehicle_exists(vehicle_id):
+    try:
+        return await fetch_one(VEHICLE_EXISTS, [vehicle_id]) is not None
+    except Exception as e:
+        raise Exception(f"Failed to fetch vehicle: {str(e)}")
+
+
+async def get_vehicles_by_ids(vehicle_ids):
+    if not vehicle_ids:
+        return []
+    try:
+        return await fetch_all(*vehicles_by_ids_query(vehicle_ids))
+    except Exception as e:
+        raise Exception(f"Failed to fetch vehicles: {str(e)}")
+
+
+async def update_vehicle_location(vehicle_id, lat, lng):
+    """Update vehicle location"""
+    try:
+        if await execute(VEHICLE_LOCATION, vehicle_location_params(vehicle_id, lat, lng)) == 0:
+            raise Exception("Vehicle not found")
+
+        vehicle = await get_vehicle_by_id(vehicle_id)
+        await send_event_async("vehicle.updated", vehicle, *vehicle_scope(vehicle))
+        return vehicle
+    except Exception as e:
+        raise Exception(f"Failed to update vehicle location: {str(e)}")
+
+
+# ============= HELPER FUNCTIONS =============
+
+
+async def publish_vehicles(vehicle_ids):
+    """Publish the current row of each vehicle after its status changed"""
+    ids = sorted({int(v) for v in vehicle_ids if v is not None})
+    for vehicle in await get_vehicles_by_ids(ids):
+        await send_event_async("vehicle.updated", vehicle, *vehicle_scope(vehicle))
+
+
+async def publish_freed_vehicles(vehicle_ids, incident_id):
+    """repo.publish_freed_vehicles, vehicles and the backlog incidents they picked up"""
+    ids = sorted({int(v) for v in vehicle_ids if v is not None})
+    if not ids:
+        return
+    await publish_vehicles(ids)
+    rows = await fetch_all(*picked_up_incidents_query(ids, incident_id))
+    picked_up = [row["incident_id"] for row in rows]
+    await publish_incidents("incident.updated", picked_up)
+
+
+async def publish_incidents(event, incident_ids):
+    """repo.publish_incidents"""
+    if not incident_ids:
+        return
+    for incident in await fetch_all(*incident_summaries_query(incident_ids)):
+        await send_event_async(event, incident, *incident_scope(incident))
+
+
+async def get_sync_cursor():
+    """repo.get_sync_cursor, the database clock in microseconds"""
+    pool = get_pool()
+    async with pool.connection() as conn:
+        async with conn.cursor() as cursor:
+            await SYNC_CURSOR.execute_async(cursor)
+            return sync_cursor_value((await cursor.fetchone())[0])
@@ -0,0 +1,167 @@
+from django.views.decorators.csrf import csrf_exempt
+from . import async_repo
+from .auth import STAFF, auth_user
+from .location_buffer import check_position, get_location_buffer
+from .rows import JsonResponse
+from .streaming import async_streaming_json_response
+from .views import (
+    check_incident_report,
+    check_location_update,
+    check_request_method,
+    parse_listing_filters,
+)
+import json
+
+
+# The hot endpoints of views on async_repo, routed instead of them when
+# ASYNC_DB is set. Same requests, same responses.
+
+
+@csrf_exempt
+async def report_incident(request):
+    """Reporter API: Report new incident (auto-assigns vehicle via stored procedure)"""
+    err = check_request_method(request, "POST")
+    if err:
+        return JsonResponse({"message": str(err)}, status=400)
+
+    try:
+        data = json.loads(request.body)
+        err = check_incident_report(data)
+        if err:
+            return JsonResponse({"message": err}, status=400)
+
+        incident = await async_repo.create_incident(
+            incident_type=data["type"].upper(),
+            location_lat=data["lat"],
+            location_lng=data["lng"],
+            severity=data["severity_level"].upper(),
+            description=data.get("description", ""),
+        )
+
+        return JsonResponse(
+            {
+                "message": "Incident reported and vehicle auto-assigned successfully",
+                "incident": incident,
+            },
+            status=201,
+        )
+
+    except Exception as e:
+        return JsonResponse({"message": str(e)}, status=500)
+
+
+@csrf_exempt
+async def update_unit_location(request):
+    """Responder API: Update vehicle location"""
+    err = check_request_method(request, "POST")
+    if err:
+        return JsonResponse({"message": str(err)}, status=400)
+
+    try:
+        data = json.loads(request.body)
+        err = check_location_update(data)
+        if err:
+            return JsonResponse({"message": err}, status=400)
+        lat, lng = check_position(data["lat"], data["lng"])
+
+        buffer = get_location_buffer()
+        if buffer is not None:
+            # the buffered write cannot report a missing row, so check first
+            if not await async_repo.vehicle_exists(data["vehicle_id"]):
+                return JsonResponse({"message": "Vehicle not found"}, status=404)
+            buffer.submit(data["vehicle_id"], lat, lng)
+            return JsonResponse(
+                {"message": "Location accepted", "vehicle_id": data["vehicle_id"]},
+                status=202,
+            )
+
+        vehicle = await async_repo.update_vehicle_location(
+            vehicle_id=data["vehicle_id"], lat=lat, lng=lng
+        )
+
+        return JsonResponse(
+            {"message": "Location updated successfully", "vehicle": vehicle}, status=200
+        )
+
+    except Exception as e:
+        return JsonResponse({"message": str(e)}, status=500)
+
+
+@csrf_exempt
+async def resolve_incident_endpoint(request):
+    """Responder API: Resolve incident (uses stored procedure)"""
+    err = check_request_method(request, "POST")
+    if err:
+        return JsonResponse({"message": str(err)}, status=400)
+
+    try:
+        data = json.loads(request.body)
+
+        if "incident_id" not in data:
+            return JsonResponse({"message": "Missing incident_id"}, status=400)
+
+        incident = await async_repo.resolve_incident(data["incident_id"])
+
+        return JsonResponse(
+            {"message": "Incident resolved successfully", "incident": incident},
+            status=200,
+        )
+
+    except Exception as e:
+        return JsonResponse({"message": str(e)}, status=500)
+
+
+@csrf_exempt
+@auth_user(roles=STAFF)
+async def list_incidents(request):
+    """Admin/Dispatcher API: views.list_incidents"""
+    err = check_request_method(request, "GET")
+    if err:
+        return JsonResponse({"message": str(err)}, status=400)
+
+    try:
+        try:
+            status, since = parse_listing_filters(request.GET)
+        except ValueError:
+            return JsonResponse({"message": "Invalid cursor"}, status=400)
+
+        cursor = await async_repo.get_sync_cursor()
+        extra = {"cursor": cursor}
+        if since is not None and status:
+            extra["removed"] = await async_repo.get_removed_incident_ids(status, since)
+
+        return async_streaming_json_response(
+            "incidents", async_repo.iter_all_incidents(status, since), extra
+        )
+
+    except Exception as e:
+        return JsonResponse({"message": str(e)}, status=500)
+
+
+@csrf_exempt
+@auth_user(roles=STAFF)
+async def list_vehicles(request):
+    """Admin/Dispatcher API: views.list_vehicles"""
+    err = check_request_method(request, "GET")
+    if err:
+        return JsonResponse({"message": str(err)}, status=400)
+
+    try:
+        try:
+            status, since = parse_listing_filters(request.GET)
+        except ValueError:
+            return JsonResponse({"message": "Invalid cursor"}, status=400)
+
+        cursor = await async_repo.get_sync_cursor()
+        extra = {"cursor": cursor}
+        if since is not None:
+            extra["deleted"] = await async_repo.get_deleted_vehicle_ids(since)
+            if status:
+                extra["removed"] = await async_repo.get_removed_vehicle_ids(status, since)
+
+        return async_streaming_json_response(
+            "vehicles", async_repo.iter_all_vehicles(status, since), extra
+        )
+
+    except Exception as e:
+        return JsonResponse({"message": str(e)}, status=500)
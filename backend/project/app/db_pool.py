@@ -0,0 +1,340 @@
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from .sketch import DDSketch
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class PoolBase:
+    """
+    Bookkeeping shared by the sync and async pools: when a connection is
+    too old to hand out, when it has been idle long enough to ping first,
+    and how long checkouts waited.
+
+    connect, ping, reset and close are the driver calls. ping and reset
+    raise when the connection is no good; reset runs on every return and
+    leaves the connection as a new checkout expects it.
+    """
+
+    def __init__(self, connect, ping, reset, close, size, timeout, max_lifetime, check_after):
+        self.connect = connect
+        self.ping = ping
+        self.reset = reset
+        self.close = close
+        self.size = size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.check_after = check_after
+        # (connection, opened_at, returned_at), the most recently returned last
+        self.idle = []
+        self.opened_at = {}
+        self.in_use = 0
+        self.acquired = 0
+        self.waited = 0
+        self.timeouts = 0
+        self.opened = 0
+        self.recycled = 0
+        self.failed_checks = 0
+        self.discarded = 0
+        self.wait_ms = DDSketch()
+
+    def take(self):
+        """
+        Claim an idle connection, or a slot to open one in: the entry or
+        None. False when the pool is exhausted.
+        """
+        if self.idle:
+            self.in_use += 1
+            # newest first, so surplus connections go idle and age out
+            return self.idle.pop()
+        if self.in_use + len(self.idle) < self.size:
+            self.in_use += 1
+            return None
+        return False
+
+    def record_wait(self, started):
+        waited = time.monotonic() - started
+        self.acquired += 1
+        if waited > 0.001:
+            self.waited += 1
+        self.wait_ms.add(waited * 1000)
+
+    def usable(self, entry, now):
+        """
+        Whether an idle entry can be handed out as is, True, or needs a
+        ping first, None. False when it outlived max_lifetime.
+        """
+        connection, opened_at, returned_at = entry
+        if now - opened_at >= self.max_lifetime:
+            self.recycled += 1
+            return False
+        if now - returned_at >= self.check_after:
+            return None
+        return True
+
+    def keep(self, connection, now):
+        """Whether a returned connection goes back to the idle list"""
+        opened_at = self.opened_at.get(id(connection))
+        if opened_at is None:
+            return False
+        if now - opened_at >= self.max_lifetime:
+            self.recycled += 1
+            return False
+        return True
+
+    def opened_connection(self, connection):
+        self.opened += 1
+        self.opened_at[id(connection)] = time.monotonic()
+        return connection
+
+    def forget(self, connection):
+        self.opened_at.pop(id(connection), None)
+        self.discarded += 1
+
+    def metrics(self):
+        return {
+            "size": self.size,
+            "in_use": self.in_use,
+            "idle": len(self.idle),
+            "acquired": self.acquired,
+            "waited": self.waited,
+            "timeouts": self.timeouts,
+            "wait_p50_ms": round_ms(self.wait_ms.quantile(0.5)),
+            "wait_p99_ms": round_ms(self.wait_ms.quantile(0.99)),
+            "wait_max_ms": round_ms(self.wait_ms.max if self.wait_ms.count else None),
+            "opened": self.opened,
+            "recycled": self.recycled,
+            "failed_health_checks": self.failed_checks,
+            "discarded": self.discarded,
+        }
+
+
+class ConnectionPool(PoolBase):
+    """
+    At most size connections shared by every thread of a process. A
+    checkout blocks up to timeout seconds for one to come back, then raises
+    PoolTimeout.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lock = threading.Lock()
+        self.returned = threading.Condition(self.lock)
+
+    def acquire(self):
+        started = time.monotonic()
+        with self.lock:
+            entry = self.take()
+            while entry is False:
+                remaining = started + self.timeout - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeout(
+                        f"No database connection free within {self.timeout}s "
+                        f"({self.size} in use)"
+                    )
+                self.returned.wait(remaining)
+                entry = self.take()
+            self.record_wait(started)
+
+        try:
+            # pings and connects happen outside the lock
+            while entry is not None:
+                with self.lock:
+                    fresh = self.usable(entry, time.monotonic())
+                if fresh is None:
+                    try:
+                        self.ping(entry[0])
+                        fresh = True
+                    except Exception:
+                        with self.lock:
+                            self.failed_checks += 1
+                if fresh:
+                    return entry[0]
+                self.discard(entry[0])
+                entry = None
+            connection = self.connect()
+            with self.lock:
+                return self.opened_connection(connection)
+        except BaseException:
+            with self.lock:
+                self.in_use -= 1
+                self.returned.notify()
+            raise
+
+    def release(self, connection, discard=False):
+        if not discard:
+            try:
+                self.reset(connection)
+            except Exception:
+                discard = True
+        with self.lock:
+            self.in_use -= 1
+            now = time.monotonic()
+            if not discard and self.keep(connection, now):
+                self.idle.append((connection, self.opened_at[id(connection)], now))
+                connection = None
+            self.returned.notify()
+        if connection is not None:
+            self.discard(connection)
+
+    def discard(self, connection):
+        with self.lock:
+            self.forget(connection)
+        try:
+            self.close(connection)
+        except Exception:
+            pass
+
+    def metrics(self):
+        with self.lock:
+            return super().metrics()
+
+    @contextmanager
+    def connection(self):
+        connection = self.acquire()
+        try:
+            yield connection
+        except BaseException as e:
+            # a statement cut short may have left unread results behind
+            self.release(connection, discard=not clean_exit(e))
+            raise
+        self.release(connection)
+
+    def close_all(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for connection, _, _ in idle:
+            self.discard(connection)
+
+
+class AsyncConnectionPool(PoolBase):
+    """
+    ConnectionPool for one event loop, connect, ping and reset are
+    coroutine functions. Waiting for a connection suspends the caller.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.returned = asyncio.Condition()
+
+    async def acquire(self):
+        started = time.monotonic()
+        async with self.returned:
+            entry = self.take()
+            while entry is False:
+                remaining = started + self.timeout - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeout(
+                        f"No database connection free within {self.timeout}s "
+                        f"({self.size} in use)"
+                    )
+                try:
+                    await asyncio.wait_for(self.returned.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+                entry = self.take()
+            self.record_wait(started)
+
+        try:
+            while entry is not None:
+                fresh = self.usable(entry, time.monotonic())
+                if fresh is None:
+                    try:
+                        await self.ping(entry[0])
+                        fresh = True
+                    except Exception:
+                        self.failed_checks += 1
+                if fresh:
+                    return entry[0]
+                self.discard(entry[0])
+                entry = None
+            return self.opened_connection(await self.connect())
+        except BaseException:
+            self.in_use -= 1
+            await self.notify()
+            raise
+
+    async def release(self, connection, discard=False):
+        if not discard:
+            try:
+                await self.reset(connection)
+            except Exception:
+                discard = True
+        self.in_use -= 1
+        now = time.monotonic()
+        if not discard and self.keep(connection, now):
+            self.idle.append((connection, self.opened_at[id(connection)], now))
+        else:
+            self.discard(connection)
+        await self.notify()
+
+    async def notify(self):
+        async with self.returned:
+            self.returned.notify()
+
+    def discard(self, connection):
+        self.forget(connection)
+        try:
+            self.close(connection)
+        except Exception:
+            pass
+
+    @asynccontextmanager
+    async def connection(self):
+        connection = await self.acquire()
+        try:
+            yield connection
+        except BaseException as e:
+            # a cancelled request can leave a reply half read on the socket
+            await asyncio.shield(
+                self.release(connection, discard=not clean_exit(e))
+            )
+            raise
+        # shielded, a cancellation now must not leak the checkout
+        await asyncio.shield(self.release(connection))
+
+    def close_all(self):
+        idle, self.idle = self.idle, []
+        for connection, _, _ in idle:
+            self.discard(connection)
+
+
+def clean_exit(e):
+    """
+    Whether a connection is fit for reuse after e left its block: errors
+    the server reported are, interruptions mid-statement are not. A closed
+    generator already closed its cursor.
+    """
+    return isinstance(e, (Exception, GeneratorExit))
+
+
+def round_ms(value):
+    return None if value is None else round(value, 2)
+
+
+# one sync pool per database alias, created by the app.mysql_pool backend
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, create):
+    """The process-wide pool of a database alias, made by create() on first use"""
+    with _pools_lock:
+        pool = _pools.get(alias)
+        if pool is None:
+            pool = _pools[alias] = create()
+        return pool
+
+
+def pool_metrics():
+    """Metrics of every sync pool in this process, by alias"""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {alias: pool.metrics() for alias, pool in pools.items()}
@@ -0,0 +1,201 @@
+import asyncio
+import json
+import logging
+import math
+import re
+import uuid
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+from .rows import RecordJSONEncoder
+
+# unscoped dashboards get every event
+DASHBOARD_GROUP = "dashboard"
+# scoped dashboards still need events that carry no zone or location
+SCOPED_BROADCAST_GROUP = "dashboard.scoped"
+
+# map viewports subscribe to the tiles they overlap, ~5 km squares
+TILE_DEG = 0.05
+MAX_VIEWPORT_TILES = 400
+
+logger = logging.getLogger(__name__)
+
+# the ASGI server's event loop, which owns the in-memory layer's queues
+_server_loop = None
+
+
+def zone_group(zone):
+    return "zone." + re.sub(r"[^A-Za-z0-9_.-]", "_", str(zone))[:80]
+
+
+def responder_group(responder_id):
+    """The responder's location uplinks"""
+    return f"responder.{int(responder_id)}"
+
+
+def tile_of(lng, lat):
+    return math.floor(float(lng) / TILE_DEG), math.floor(float(lat) / TILE_DEG)
+
+
+def tile_group(tile):
+    return f"tile.{tile[0]}.{tile[1]}"
+
+
+def tiles_for_bbox(min_lng, min_lat, max_lng, max_lat):
+    (x0, y0), (x1, y1) = tile_of(min_lng, min_lat), tile_of(max_lng, max_lat)
+    if (x1 - x0 + 1) * (y1 - y0 + 1) > MAX_VIEWPORT_TILES:
+        raise ValueError("Viewport is too large, zoom in or subscribe to zones")
+    return [(x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+
+
+def publish(event, data, zones=(), point=None):
+    """
+    Send a change event to dashboards once the current transaction commits
+    (immediately in autocommit mode). Scoped dashboards only get it through
+    the groups of its zones and of the tile containing point.
+    """
+    transaction.on_commit(lambda: send_event(event, data, zones, point))
+
+
+def publish_incident(event, incident):
+    publish(event, incident, *incident_scope(incident))
+
+
+def publish_vehicle(event, vehicle):
+    publish(event, vehicle, *vehicle_scope(vehicle))
+
+
+def incident_scope(incident):
+    """zones and point of an incident event"""
+    if incident.get("station_zones"):
+        zones = str(incident["station_zones"]).split(",")
+    elif incident.get("station_zone"):
+        zones = [incident["station_zone"]]
+    else:
+        zones = []
+    return zones, (incident["lng"], incident["lat"])
+
+
+def vehicle_scope(vehicle):
+    zones = [vehicle["zone"]] if vehicle.get("zone") else []
+    return zones, (vehicle["lng"], vehicle["lat"])
+
+
+def publish_responder_vehicle(responder_id, vehicle_id):
+    """
+    Point the responder's open location uplinks at vehicle_id once the
+    current transaction commits; None closes them.
+    """
+    message = {"type": "responder.vehicle", "vehicle_id": vehicle_id}
+    transaction.on_commit(lambda: fan_out([(responder_group(responder_id), message)]))
+
+
+def publish_locations(positions):
+    """positions: dicts with vehicle_id, lng, lat and zone"""
+    transaction.on_commit(lambda: send_locations(positions))
+
+
+def send_event(event, data, zones=(), point=None):
+    message = event_message(event, data, zones, point)
+    fan_out([(group, message) for group in event_groups(zones, point)])
+
+
+def event_message(event, data, zones=(), point=None, event_id=None):
+    return {
+        "type": "dashboard.event",
+        "event_id": event_id or uuid.uuid4().hex,
+        "event": event,
+        # plain JSON types so any channel layer can carry it
+        "data": json.loads(json.dumps(data, cls=RecordJSONEncoder)),
+        "zones": list(zones),
+        "point": list(point) if point else None,
+    }
+
+
+def event_groups(zones=(), point=None):
+    """Every group an event goes to, the full feed plus its zones and tile"""
+    groups = [DASHBOARD_GROUP]
+    if zones or point:
+        groups += [zone_group(zone) for zone in zones]
+        if point:
+            groups.append(tile_group(tile_of(*point)))
+    else:
+        groups.append(SCOPED_BROADCAST_GROUP)
+    return groups
+
+
+def send_locations(positions):
+    # every group gets its part of the flush under one id, so a dashboard in
+    # a zone and a tile can tell the positions it already has
+    event_id = uuid.uuid4().hex
+    messages = [(DASHBOARD_GROUP, location_message(positions, event_id))]
+
+    by_group = {}
+    for position in positions:
+        if position.get("zone"):
+            by_group.setdefault(zone_group(position["zone"]), []).append(position)
+        tile = tile_group(tile_of(position["lng"], position["lat"]))
+        by_group.setdefault(tile, []).append(position)
+    messages += [
+        (group, location_message(subset, event_id)) for group, subset in by_group.items()
+    ]
+    fan_out(messages)
+
+
+def location_message(positions, event_id=None):
+    return event_message("vehicle.locations", {"positions": positions}, event_id=event_id)
+
+
+def bind_server_loop():
+    """Called on the server loop by the dashboards, so fan_out can reach their queues"""
+    global _server_loop
+    _server_loop = asyncio.get_running_loop()
+
+
+def fan_out(messages):
+    """
+    Send from synchronous code on any thread. Request threads and the
+    location and dispatch workers hand the sends to the server loop without
+    waiting; with no server loop in this process (management commands, a
+    Redis layer fed from elsewhere) they run on a loop of their own.
+    """
+    layer = get_channel_layer()
+    if layer is None:
+        return
+    loop = _server_loop
+    # a lost event must never fail the write, dashboards resync on reconnect
+    if loop is not None and loop.is_running():
+        future = asyncio.run_coroutine_threadsafe(group_send_all(layer, messages), loop)
+        future.add_done_callback(log_failed_send)
+        return
+    try:
+        async_to_sync(group_send_all)(layer, messages)
+    except Exception:
+        logger.exception("Dashboard event fan-out failed")
+
+
+def log_failed_send(future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("Dashboard event fan-out failed", exc_info=future.exception())
+
+
+async def send_event_async(event, data, zones=(), point=None):
+    """
+    send_event for async views. Their writes run in autocommit, so there is
+    no transaction to wait for, and async_to_sync can't be used on the loop.
+    """
+    layer = get_channel_layer()
+    if layer is None:
+        return
+    message = event_message(event, data, zones, point)
+    try:
+        await group_send_all(layer, [(group, message) for group in event_groups(zones, point)])
+    except Exception:
+        logger.exception("Dashboard event fan-out failed")
+
+
+async def group_send_all(layer, messages):
+    for group, message in messages:
+        await layer.group_send(group, message)
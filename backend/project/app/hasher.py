@@ -1,4 +1,9 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import bcrypt
+from django.conf import settings
 
 
 def check_password(raw_password, hashed_password):
@@ -6,5 +11,47 @@ def check_password(raw_password, hashed_password):
 
 
 def hash_password(raw_password):
-    hashed = bcrypt.hashpw(raw_password.encode(), bcrypt.gensalt())
+    rounds = settings.PASSWORD_HASH_ROUNDS
+    hashed = bcrypt.hashpw(raw_password.encode(), bcrypt.gensalt(rounds=rounds))
     return hashed.decode()
+
+
+def needs_rehash(hashed_password):
+    """True when a hash was made with a cost other than PASSWORD_HASH_ROUNDS"""
+    # $2b$<cost>$<salt and hash>
+    try:
+        return int(hashed_password.split("$")[2]) != settings.PASSWORD_HASH_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+
+# bcrypt releases the GIL, so a login burst runs on these threads in
+# parallel while request handling keeps the rest of the CPU
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_hash_executor():
+    """The process-wide executor, PASSWORD_HASH_WORKERS hashes at a time"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS,
+                thread_name_prefix="password-hash",
+            )
+        return _executor
+
+
+async def check_password_async(raw_password, hashed_password):
+    """check_password on the hash executor, the caller's thread stays free"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_hash_executor(), check_password, raw_password, hashed_password
+    )
+
+
+async def hash_password_async(raw_password):
+    """hash_password on the hash executor"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_hash_executor(), hash_password, raw_password)
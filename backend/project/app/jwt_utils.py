@@ -1,7 +1,8 @@
 # yourapp/jwt_utils.py
 import jwt
 import datetime
-from .repo import get_user_by_user_id
+from .token_cache import get_token_cache
+from .user_cache import get_cached_user
 from django.conf import settings
 
 def generate_access_token(user):
@@ -40,8 +41,15 @@ def generate_refresh_token(user):
 
 def decode_token(token, verify_exp=True):
     """
-    Decodes token and returns payload or raises jwt exceptions.
+    Decodes token and returns payload or raises jwt exceptions. Tokens
+    verified before are answered from the token cache until they expire.
     """
+    cache = get_token_cache() if verify_exp else None
+    if cache is not None:
+        payload = cache.get(token)
+        if payload is not None:
+            return payload
+
     options = {"verify_exp": verify_exp}
     try:
         payload = jwt.decode(
@@ -53,6 +61,8 @@ def decode_token(token, verify_exp=True):
         )
     except jwt.ExpiredSignatureError or jwt.InvalidTokenError:
         raise
+    if cache is not None:
+        cache.put(token, payload)
     return payload
 
 
@@ -72,6 +82,6 @@ def refresh_access_token(refresh_token):
         raise Exception("Invalid refresh token")
 
     user_id = payload["user_id"]
-    user = get_user_by_user_id(user_id)
+    user = get_cached_user(user_id)
     new_access = generate_access_token(user)
     return new_access
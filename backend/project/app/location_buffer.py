@@ -0,0 +1,156 @@
+import atexit
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .repo import update_vehicle_locations_batch
+
+logger = logging.getLogger(__name__)
+
+
+def check_position(lat, lng):
+    """(lat, lng) as floats, ValueError unless both are finite and on the globe"""
+    try:
+        lat, lng = float(lat), float(lng)
+    except (TypeError, ValueError):
+        raise ValueError("Invalid coordinates: lat and lng must be numbers")
+    if not (math.isfinite(lat) and math.isfinite(lng)):
+        raise ValueError("Invalid coordinates: lat and lng must be finite")
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise ValueError(
+            "Invalid coordinates: lat must be within [-90, 90] and lng within [-180, 180]"
+        )
+    return lat, lng
+
+
+class LocationBuffer:
+    """
+    Write-behind buffer for vehicle GPS pings. Only the latest position per
+    vehicle is kept, and everything pending is written in one bulk UPDATE
+    every flush interval.
+    """
+
+    def __init__(self, flush_ms):
+        self.interval = flush_ms / 1000
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.oldest_pending = None
+
+        self.received = 0
+        self.written = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.dropped = 0
+        self.last_flush_lag_ms = 0.0
+        self.max_flush_lag_ms = 0.0
+        self.last_flush_at = None
+
+        self.thread = threading.Thread(
+            target=self.run, name="location-buffer", daemon=True
+        )
+        self.thread.start()
+        atexit.register(self.close)
+
+    def submit(self, vehicle_id, lat, lng):
+        """Queue a position, ValueError for an id or coordinates that cannot be written"""
+        vehicle_id = int(vehicle_id)
+        lat, lng = check_position(lat, lng)
+        with self.lock:
+            if not self.pending:
+                self.oldest_pending = time.monotonic()
+            self.pending[vehicle_id] = (lng, lat)
+            self.received += 1
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Vehicle location flush failed")
+            finally:
+                close_old_connections()
+
+    def flush(self):
+        with self.lock:
+            if not self.pending:
+                return 0
+            positions, self.pending = self.pending, {}
+            oldest, self.oldest_pending = self.oldest_pending, None
+
+        written = len(positions)
+        try:
+            update_vehicle_locations_batch(positions)
+        except Exception:
+            logger.exception(
+                "Bulk location update of %d vehicles failed, retrying one by one",
+                len(positions),
+            )
+            with self.lock:
+                self.failed_flushes += 1
+            # a row the bulk UPDATE chokes on must not hold back the others,
+            # and is not kept either: the vehicle's next ping replaces it
+            written = 0
+            for vehicle_id, position in positions.items():
+                try:
+                    update_vehicle_locations_batch({vehicle_id: position})
+                    written += 1
+                except Exception:
+                    logger.exception("Dropped location of vehicle %s", vehicle_id)
+                    with self.lock:
+                        self.dropped += 1
+
+        lag_ms = (time.monotonic() - oldest) * 1000
+        with self.lock:
+            self.written += written
+            self.flushes += 1
+            self.last_flush_lag_ms = lag_ms
+            self.max_flush_lag_ms = max(self.max_flush_lag_ms, lag_ms)
+            self.last_flush_at = time.time()
+        return written
+
+    def close(self):
+        """Best-effort flush of whatever is still pending at shutdown"""
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Final vehicle location flush failed")
+
+    def metrics(self):
+        with self.lock:
+            return {
+                "flush_interval_ms": self.interval * 1000,
+                "pending": len(self.pending),
+                "received": self.received,
+                "written": self.written,
+                "flushes": self.flushes,
+                "failed_flushes": self.failed_flushes,
+                "dropped": self.dropped,
+                # pings received per row written, higher means more coalescing
+                "coalescing_ratio": (
+                    round(self.received / self.written, 2) if self.written else None
+                ),
+                "last_flush_lag_ms": round(self.last_flush_lag_ms, 1),
+                "max_flush_lag_ms": round(self.max_flush_lag_ms, 1),
+                "last_flush_at": self.last_flush_at,
+            }
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_location_buffer():
+    """The process-wide buffer, or None when LOCATION_FLUSH_MS is 0"""
+    global _buffer
+    if settings.LOCATION_FLUSH_MS <= 0:
+        return None
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = LocationBuffer(settings.LOCATION_FLUSH_MS)
+        return _buffer
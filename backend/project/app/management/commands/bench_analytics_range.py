@@ -0,0 +1,151 @@
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from app.repo import get_response_percentiles, get_rollup_series, rebuild_hourly_rollups
+
+# seeded incidents sit in a box off the coast of null island, in a year no
+# real incident is from
+BENCH_BOX = "POLYGON((-0.5 -0.5, 0.5 -0.5, 0.5 0.5, -0.5 0.5, -0.5 -0.5))"
+YEAR_START = datetime(2001, 1, 1)
+YEAR_END = datetime(2002, 1, 1)
+
+# what answering the same question from raw incidents costs
+RAW_QUERY = """
+    SELECT DATE(i.time_resolved) AS bucket, i.type, COUNT(*),
+        AVG(TIMESTAMPDIFF(SECOND, i.time_reported, i.time_resolved)),
+        MIN(TIMESTAMPDIFF(SECOND, i.time_reported, i.time_resolved)),
+        MAX(TIMESTAMPDIFF(SECOND, i.time_reported, i.time_resolved))
+    FROM incident i
+    WHERE i.status = 'RESOLVED'
+    AND i.time_resolved >= %s AND i.time_resolved < %s
+    GROUP BY bucket, i.type
+"""
+
+# an exact p90 per type has to sort every resolved incident of the year
+EXACT_P90_QUERY = """
+    SELECT x.type, MIN(x.seconds)
+    FROM (
+        SELECT i.type, TIMESTAMPDIFF(SECOND, i.time_reported, i.time_resolved) AS seconds,
+            CUME_DIST() OVER (
+                PARTITION BY i.type
+                ORDER BY TIMESTAMPDIFF(SECOND, i.time_reported, i.time_resolved)
+            ) AS rank_share
+        FROM incident i
+        WHERE i.status = 'RESOLVED'
+        AND i.time_resolved >= %s AND i.time_resolved < %s
+    ) x
+    WHERE x.rank_share >= 0.9
+    GROUP BY x.type
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare a year of daily analytics and response-time percentiles "
+        "answered from the hourly rollups and sketches with the same over raw "
+        "incidents. Seeds synthetic incidents, "
+        "so run it against a development database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", nargs="+", type=int, default=[10000, 100000, 1000000])
+        parser.add_argument("--queries", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        self.stdout.write(
+            f"{'incidents':>10} {'query':>14} {'mean ms':>10} {'p50 ms':>10} {'max ms':>10}"
+        )
+        seeded = 0
+        try:
+            for size in options["sizes"]:
+                self.seed(size - seeded, rng)
+                seeded = size
+
+                start = time.perf_counter()
+                rebuild_hourly_rollups(YEAR_START, YEAR_END)
+                self.report(size, "backfill", [(time.perf_counter() - start) * 1000])
+
+                runs = range(options["queries"])
+                self.report(size, "raw by day", [self.timed(self.raw) for _ in runs])
+                for granularity in ("hour", "day", "month"):
+                    self.report(
+                        size,
+                        f"rollup {granularity}",
+                        [self.timed(self.rollup, granularity) for _ in runs],
+                    )
+                self.report(size, "exact p90", [self.timed(self.exact_p90) for _ in runs])
+                self.report(size, "sketch p50-99", [self.timed(self.sketch) for _ in runs])
+        finally:
+            self.cleanup()
+
+    def seed(self, count, rng):
+        seconds = int((YEAR_END - YEAR_START).total_seconds())
+        with connection.cursor() as cursor:
+            batch = []
+            for _ in range(count):
+                reported = YEAR_START + timedelta(seconds=rng.randrange(seconds - 86400))
+                batch.append(
+                    [
+                        f"POINT({rng.uniform(-0.4, 0.4):.6f} {rng.uniform(-0.4, 0.4):.6f})",
+                        rng.choice(("FIRE", "POLICE", "MEDICAL")),
+                        rng.choice(("LOW", "MEDIUM", "HIGH", "CRITICAL")),
+                        reported,
+                        reported + timedelta(seconds=rng.randrange(300, 7200)),
+                    ]
+                )
+                if len(batch) == 1000:
+                    self.insert_incidents(cursor, batch)
+                    batch = []
+            if batch:
+                self.insert_incidents(cursor, batch)
+
+    def insert_incidents(self, cursor, batch):
+        cursor.executemany(
+            """
+            INSERT INTO incident (location, type, severity_level, time_reported, time_resolved, status)
+            VALUES (ST_GeomFromText(%s, 4326), %s, %s, %s, %s, 'RESOLVED')
+        """,
+            batch,
+        )
+
+    def cleanup(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "DELETE FROM incident WHERE MBRContains(ST_GeomFromText(%s, 4326), location)",
+                [BENCH_BOX],
+            )
+        rebuild_hourly_rollups(YEAR_START, YEAR_END)
+
+    def raw(self):
+        with connection.cursor() as cursor:
+            cursor.execute(RAW_QUERY, [YEAR_START, YEAR_END])
+            cursor.fetchall()
+
+    def rollup(self, granularity):
+        get_rollup_series(YEAR_START, YEAR_END, granularity)
+
+    def exact_p90(self):
+        with connection.cursor() as cursor:
+            cursor.execute(EXACT_P90_QUERY, [YEAR_START, YEAR_END])
+            cursor.fetchall()
+
+    def sketch(self):
+        get_response_percentiles(YEAR_START, YEAR_END)
+
+    def timed(self, run, *args):
+        start = time.perf_counter()
+        run(*args)
+        return (time.perf_counter() - start) * 1000
+
+    def report(self, size, label, timings):
+        self.stdout.write(
+            f"{size:>10} {label:>14} {statistics.mean(timings):>10.2f} "
+            f"{statistics.median(timings):>10.2f} {max(timings):>10.2f}"
+        )
@@ -0,0 +1,189 @@
+import asyncio
+import json
+import random
+import statistics
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import AsyncRequestFactory, override_settings
+
+from app import async_views, views
+from app.async_repo import close_pool
+from app.jwt_utils import generate_access_token
+
+BENCH_ZONE = "__bench__"
+# far from any real station, so reports are dispatched to the seeded fleet
+BENCH_BOX = "POLYGON((-0.5 -0.5, 0.5 -0.5, 0.5 0.5, -0.5 0.5, -0.5 -0.5))"
+SPREAD = 0.4
+
+
+class Command(BaseCommand):
+    help = (
+        "Requests/s and latency of the hot endpoints with N requests in flight "
+        "on one event loop, as under ASGI: sync views, which Django runs one at "
+        "a time on its sync thread, versus the async views on aiomysql. Seeds "
+        "synthetic stations and vehicles, so run it against a development "
+        "database. Needs aiomysql."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--vehicles", type=int, default=300)
+        parser.add_argument("--requests", type=int, default=1000)
+        parser.add_argument("--concurrency", type=int, default=50)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        self.factory = AsyncRequestFactory()
+        self.auth = {
+            "HTTP_AUTHORIZATION": "Bearer "
+            + generate_access_token({"user_id": 0, "role": "ADMIN"})
+        }
+        self.stdout.write(
+            f"{options['requests']} requests per endpoint, {options['concurrency']} "
+            f"in flight, async pool of {settings.ASYNC_DB_POOL_SIZE}"
+        )
+        self.stdout.write(
+            f"{'endpoint':>10} {'stack':>6} {'req/s':>9} {'p50 ms':>9} "
+            f"{'p99 ms':>9} {'errors':>7}"
+        )
+        try:
+            vehicle_ids = self.seed(options["vehicles"], rng)
+            # every location update goes to the database, not the GPS buffer
+            with override_settings(LOCATION_FLUSH_MS=0):
+                for label, stack in (("sync", views), ("async", async_views)):
+                    self.run_stack(label, stack, vehicle_ids, rng, options)
+        finally:
+            self.cleanup()
+
+    def run_stack(self, label, stack, vehicle_ids, rng, options):
+        n = options["requests"]
+        reports = [self.report_request(rng) for _ in range(n)]
+        responses = self.measure("report", label, stack.report_incident, reports, options)
+        incident_ids = [
+            json.loads(r.content)["incident"]["incident_id"]
+            for r in responses
+            if r.status_code == 201
+        ]
+
+        locations = [self.location_request(rng, vehicle_ids) for _ in range(n)]
+        self.measure("location", label, stack.update_unit_location, locations, options)
+
+        # listings are heavier, a tenth as many
+        listings = [
+            self.factory.get("/admin/incidents/", **self.auth) for _ in range(n // 10)
+        ]
+        self.measure("incidents", label, stack.list_incidents, listings, options)
+        listings = [
+            self.factory.get("/admin/vehicles/", **self.auth) for _ in range(n // 10)
+        ]
+        self.measure("vehicles", label, stack.list_vehicles, listings, options)
+
+        resolves = [
+            self.factory.post(
+                "/incidents/resolve/",
+                {"incident_id": incident_id},
+                content_type="application/json",
+            )
+            for incident_id in incident_ids
+        ]
+        self.measure("resolve", label, stack.resolve_incident_endpoint, resolves, options)
+
+    def measure(self, endpoint, label, view, requests, options):
+        if not requests:
+            return []
+        if not asyncio.iscoroutinefunction(view):
+            # what Django's ASGI handler does with a sync view
+            view = sync_to_async(view, thread_sensitive=True)
+        seconds, latencies, responses = asyncio.run(
+            self.burst(view, requests, options["concurrency"])
+        )
+        latencies.sort()
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        errors = sum(1 for r in responses if r.status_code >= 400)
+        self.stdout.write(
+            f"{endpoint:>10} {label:>6} {len(requests) / seconds:>9.1f} "
+            f"{statistics.median(latencies):>9.2f} {p99:>9.2f} {errors:>7}"
+        )
+        return responses
+
+    async def burst(self, view, requests, concurrency):
+        latencies = []
+        responses = []
+        queue = iter(requests)
+
+        async def client():
+            for request in queue:
+                start = time.perf_counter()
+                response = await view(request)
+                if response.streaming:
+                    # a listing is done once its last chunk is written
+                    async for _ in response:
+                        pass
+                latencies.append((time.perf_counter() - start) * 1000)
+                responses.append(response)
+
+        start = time.perf_counter()
+        try:
+            await asyncio.gather(*(client() for _ in range(concurrency)))
+        finally:
+            await close_pool()
+        return time.perf_counter() - start, latencies, responses
+
+    def report_request(self, rng):
+        body = {
+            "type": rng.choice(("FIRE", "POLICE", "MEDICAL")),
+            "lat": round(rng.uniform(-SPREAD, SPREAD), 6),
+            "lng": round(rng.uniform(-SPREAD, SPREAD), 6),
+            "severity_level": rng.choice(("LOW", "MEDIUM", "HIGH", "CRITICAL")),
+        }
+        return self.factory.post(
+            "/incidents/report/", body, content_type="application/json"
+        )
+
+    def location_request(self, rng, vehicle_ids):
+        body = {
+            "vehicle_id": rng.choice(vehicle_ids),
+            "lat": round(rng.uniform(-SPREAD, SPREAD), 6),
+            "lng": round(rng.uniform(-SPREAD, SPREAD), 6),
+        }
+        return self.factory.post(
+            "/vehicles/location/", body, content_type="application/json"
+        )
+
+    def seed(self, size, rng):
+        vehicle_ids = []
+        with connection.cursor() as cursor:
+            for station_type in ("FIRE", "POLICE", "MEDICAL"):
+                cursor.execute(
+                    """
+                    INSERT INTO station (type, zone, location)
+                    VALUES (%s, %s, ST_GeomFromText('POINT(0 0)', 4326))
+                """,
+                    [station_type, BENCH_ZONE],
+                )
+                station_id = cursor.lastrowid
+                for _ in range(size // 3):
+                    lng = rng.uniform(-SPREAD, SPREAD)
+                    lat = rng.uniform(-SPREAD, SPREAD)
+                    cursor.execute(
+                        """
+                        INSERT INTO vehicle (location, capacity, station_id, status)
+                        VALUES (ST_GeomFromText(%s, 4326), 2, %s, 'AVAILABLE')
+                    """,
+                        [f"POINT({lng:.6f} {lat:.6f})", station_id],
+                    )
+                    vehicle_ids.append(cursor.lastrowid)
+        return vehicle_ids
+
+    def cleanup(self):
+        # dispatches cascade with their incident, vehicles with their station
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "DELETE FROM incident WHERE MBRContains(ST_GeomFromText(%s, 4326), location)",
+                [BENCH_BOX],
+            )
+            cursor.execute("DELETE FROM station WHERE zone = %s", [BENCH_ZONE])
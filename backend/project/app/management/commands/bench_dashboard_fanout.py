@@ -0,0 +1,121 @@
+import asyncio
+import json
+import random
+import statistics
+import time
+from collections import defaultdict
+
+from channels.layers import InMemoryChannelLayer
+from django.core.management.base import BaseCommand
+
+from app.events import event_groups, event_message
+from ws.subscriptions import Subscription
+
+# service area the synthetic incidents and viewports fall in
+MIN_LNG, MIN_LAT, MAX_LNG, MAX_LAT = 29.70, 31.00, 30.20, 31.30
+VIEWPORT_LNG, VIEWPORT_LAT = 0.08, 0.05
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure per-message dashboard fan-out with many connected clients, "
+        "for the full feed against zone and viewport subscriptions. Runs on an "
+        "in-process channel layer, no database needed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=5000)
+        parser.add_argument("--zones", type=int, default=50)
+        parser.add_argument("--messages", type=int, default=100)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        zones = [f"zone-{i}" for i in range(options["zones"])]
+        events = []
+        for i in range(options["messages"]):
+            point = (rng.uniform(MIN_LNG, MAX_LNG), rng.uniform(MIN_LAT, MAX_LAT))
+            events.append((i, [rng.choice(zones)], point))
+
+        def full_feed(i):
+            return Subscription()
+
+        def by_zone(i):
+            subscription = Subscription()
+            subscription.add_zone(zones[i % len(zones)])
+            return subscription
+
+        def by_viewport(i):
+            subscription = Subscription()
+            lng = rng.uniform(MIN_LNG, MAX_LNG - VIEWPORT_LNG)
+            lat = rng.uniform(MIN_LAT, MAX_LAT - VIEWPORT_LAT)
+            subscription.add_bbox([lng, lat, lng + VIEWPORT_LNG, lat + VIEWPORT_LAT])
+            return subscription
+
+        self.stdout.write(
+            f"{options['clients']} clients, {len(zones)} zones, "
+            f"{len(events)} messages"
+        )
+        self.stdout.write(
+            f"{'subscription':>14} {'send mean ms':>13} {'send p95 ms':>12} "
+            f"{'queued/msg':>11} {'sent/msg':>9} {'drain ms/msg':>13}"
+        )
+        for label, subscribe in (
+            ("full feed", full_feed),
+            ("zone", by_zone),
+            ("viewport", by_viewport),
+        ):
+            asyncio.run(self.run(label, subscribe, options["clients"], events))
+
+    async def run(self, label, subscribe, clients, events):
+        layer = InMemoryChannelLayer(capacity=len(events) + 10)
+        members = defaultdict(list)
+        subscriptions = {}
+        for i in range(clients):
+            channel = await layer.new_channel()
+            subscriptions[channel] = subscribe(i)
+            for group in subscriptions[channel].groups():
+                await layer.group_add(group, channel)
+                members[group].append(channel)
+
+        inbox = defaultdict(list)
+        send_ms = []
+        for i, zones, point in events:
+            message = event_message(
+                "incident.updated", {"incident_id": i}, zones, point
+            )
+            groups = event_groups(zones, point)
+            start = time.perf_counter()
+            for group in groups:
+                await layer.group_send(group, message)
+            send_ms.append((time.perf_counter() - start) * 1000)
+            for group in groups:
+                for channel in members.get(group, ()):
+                    inbox[channel].append(message)
+        await layer.flush()
+
+        # what each consumer does per message: dedupe, filter, serialize.
+        # Replayed from the group membership, the in-memory layer's receive
+        # scans every channel and would swamp the numbers.
+        sent = 0
+        start = time.perf_counter()
+        for channel, messages in inbox.items():
+            seen = set()
+            for message in messages:
+                if message["event_id"] in seen:
+                    continue
+                seen.add(message["event_id"])
+                data = subscriptions[channel].filter(message)
+                if data is not None:
+                    json.dumps({"event": message["event"], "data": data})
+                    sent += 1
+        drain_ms = (time.perf_counter() - start) * 1000
+        queued = sum(len(messages) for messages in inbox.values())
+
+        send_ms.sort()
+        p95 = send_ms[min(len(send_ms) - 1, int(len(send_ms) * 0.95))]
+        self.stdout.write(
+            f"{label:>14} {statistics.mean(send_ms):>13.2f} {p95:>12.2f} "
+            f"{queued / len(events):>11.0f} "
+            f"{sent / len(events):>9.0f} {drain_ms / len(events):>13.2f}"
+        )
@@ -0,0 +1,122 @@
+import random
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.db.backends.mysql.base import DatabaseWrapper as MySQLWrapper
+
+from app.db_pool import pool_metrics
+from app.mysql_pool.base import DatabaseWrapper as PooledWrapper
+from app.repo import VEHICLE_BY_ID, VEHICLE_LOCATION, vehicle_location_params
+
+BENCH_ZONE = "__bench__"
+CENTER_LNG, CENTER_LAT = 29.93, 31.21
+SPREAD = 0.15
+
+
+class Command(BaseCommand):
+    help = (
+        "Per-request database time of a location update (UPDATE, then read the "
+        "vehicle back), connecting per request as Django does without a pool "
+        "versus checking a connection out of the pool. Seeds synthetic "
+        "vehicles, so run it against a development database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--threads", type=int, default=4)
+        parser.add_argument("--vehicles", type=int, default=100)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        self.stdout.write(
+            f"{options['requests']} requests on {options['threads']} threads"
+        )
+        self.stdout.write(
+            f"{'connections':>12} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'connect ms':>11}"
+        )
+        try:
+            vehicle_ids = self.seed(options["vehicles"], rng)
+            for label, wrapper in (("per request", MySQLWrapper), ("pooled", PooledWrapper)):
+                self.run(label, wrapper, vehicle_ids, rng, options)
+            self.stdout.write(f"pool: {pool_metrics().get('bench')}")
+        finally:
+            self.cleanup()
+
+    def run(self, label, wrapper, vehicle_ids, rng, options):
+        latencies = []
+        connects = []
+        per_thread = options["requests"] // options["threads"]
+        work = [
+            [rng.choice(vehicle_ids) for _ in range(per_thread)]
+            for _ in range(options["threads"])
+        ]
+
+        def client(ids):
+            # a wrapper per thread, as Django keeps one connection per thread
+            db = wrapper(connections.settings["default"], alias="bench")
+            for vehicle_id in ids:
+                start = time.perf_counter()
+                db.ensure_connection()
+                connected = time.perf_counter()
+                with db.cursor() as cursor:
+                    lng = CENTER_LNG + rng.uniform(-SPREAD, SPREAD)
+                    lat = CENTER_LAT + rng.uniform(-SPREAD, SPREAD)
+                    # plain SQL on both, this measures connecting alone
+                    cursor.execute(
+                        VEHICLE_LOCATION.sql, vehicle_location_params(vehicle_id, lat, lng)
+                    )
+                    cursor.execute(VEHICLE_BY_ID.sql, [vehicle_id])
+                    cursor.fetchall()
+                # what request_finished does with CONN_MAX_AGE = 0
+                db.close()
+                end = time.perf_counter()
+                latencies.append((end - start) * 1000)
+                connects.append((connected - start) * 1000)
+
+        threads = [threading.Thread(target=client, args=(ids,)) for ids in work]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        seconds = time.perf_counter() - start
+
+        latencies.sort()
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        self.stdout.write(
+            f"{label:>12} {len(latencies) / seconds:>9.1f} "
+            f"{statistics.median(latencies):>9.2f} {p99:>9.2f} "
+            f"{statistics.mean(connects):>11.3f}"
+        )
+
+    def seed(self, size, rng):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO station (type, zone, location)
+                VALUES ('POLICE', %s, ST_GeomFromText(%s, 4326))
+            """,
+                [BENCH_ZONE, f"POINT({CENTER_LNG} {CENTER_LAT})"],
+            )
+            station_id = cursor.lastrowid
+            cursor.executemany(
+                """
+                INSERT INTO vehicle (location, capacity, station_id, status)
+                VALUES (ST_GeomFromText(%s, 4326), 2, %s, 'AVAILABLE')
+            """,
+                [
+                    [f"POINT({CENTER_LNG:.6f} {CENTER_LAT:.6f})", station_id]
+                    for _ in range(size)
+                ],
+            )
+            cursor.execute("SELECT vehicle_id FROM vehicle WHERE station_id = %s", [station_id])
+            return [row[0] for row in cursor.fetchall()]
+
+    def cleanup(self):
+        # vehicles cascade with their station
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM station WHERE zone = %s", [BENCH_ZONE])
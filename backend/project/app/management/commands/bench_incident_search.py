@@ -0,0 +1,143 @@
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from app.repo import SEVERITY_ORDER, encode_page_cursor, get_all_incidents, search_incidents
+
+# seeded incidents sit in a box off the coast of null island, which is also
+# how they are found again for cleanup
+BENCH_BOX = "POLYGON((-0.5 -0.5, 0.5 -0.5, 0.5 0.5, -0.5 0.5, -0.5 -0.5))"
+PAGE_SIZE = 50
+
+OFFSET_QUERY = """
+    SELECT i.incident_id
+    FROM incident i
+    WHERE i.status = 'RESOLVED'
+    ORDER BY i.severity_level DESC, i.time_reported DESC, i.incident_id DESC
+    LIMIT %s OFFSET %s
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare keyset search pages with OFFSET paging and the full incident "
+        "list as resolved incidents pile up. Seeds synthetic incidents, so run "
+        "it against a development database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", nargs="+", type=int, default=[10000, 100000, 1000000])
+        parser.add_argument("--queries", type=int, default=50)
+        parser.add_argument(
+            "--legacy-max",
+            type=int,
+            default=100000,
+            help="skip the full list above this many incidents",
+        )
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        self.stdout.write(
+            f"{'incidents':>10} {'query':>14} {'mean ms':>10} {'p50 ms':>10} {'p99 ms':>10}"
+        )
+        seeded = 0
+        try:
+            for size in options["sizes"]:
+                self.seed(size - seeded, rng)
+                seeded = size
+
+                depths = [rng.randrange(size) for _ in range(options["queries"])]
+                self.report(size, "keyset first", [self.timed(self.keyset, None) for _ in depths])
+                cursors = [self.cursor_at(depth) for depth in depths]
+                self.report(size, "keyset deep", [self.timed(self.keyset, c) for c in cursors])
+                self.report(size, "offset deep", [self.timed(self.offset, d) for d in depths])
+                if size <= options["legacy_max"]:
+                    self.report(
+                        size,
+                        "full list",
+                        [self.timed(get_all_incidents, "RESOLVED") for _ in range(5)],
+                    )
+        finally:
+            self.cleanup()
+
+    def seed(self, count, rng):
+        start = datetime(2000, 1, 1)
+        with connection.cursor() as cursor:
+            batch = []
+            for _ in range(count):
+                reported = start + timedelta(seconds=rng.randrange(10 * 365 * 86400))
+                batch.append(
+                    [
+                        f"POINT({rng.uniform(-0.4, 0.4):.6f} {rng.uniform(-0.4, 0.4):.6f})",
+                        rng.choice(("FIRE", "POLICE", "MEDICAL")),
+                        rng.choice(list(SEVERITY_ORDER)),
+                        reported,
+                        reported + timedelta(minutes=rng.randrange(5, 120)),
+                    ]
+                )
+                if len(batch) == 1000:
+                    self.insert_incidents(cursor, batch)
+                    batch = []
+            if batch:
+                self.insert_incidents(cursor, batch)
+
+    def insert_incidents(self, cursor, batch):
+        cursor.executemany(
+            """
+            INSERT INTO incident (location, type, severity_level, time_reported, time_resolved, status)
+            VALUES (ST_GeomFromText(%s, 4326), %s, %s, %s, %s, 'RESOLVED')
+        """,
+            batch,
+        )
+
+    def cleanup(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "DELETE FROM incident WHERE MBRContains(ST_GeomFromText(%s, 4326), location)",
+                [BENCH_BOX],
+            )
+
+    def cursor_at(self, depth):
+        """The cursor a client paging from the start would hold at this depth"""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT i.severity_level, i.time_reported, i.incident_id
+                FROM incident i
+                WHERE i.status = 'RESOLVED'
+                ORDER BY i.severity_level DESC, i.time_reported DESC, i.incident_id DESC
+                LIMIT 1 OFFSET %s
+            """,
+                [depth],
+            )
+            severity, reported, incident_id = cursor.fetchone()
+        return encode_page_cursor(
+            "priority",
+            [SEVERITY_ORDER[severity], reported.isoformat(sep=" "), incident_id],
+        )
+
+    def keyset(self, cursor):
+        search_incidents(status="RESOLVED", after=cursor, limit=PAGE_SIZE)
+
+    def offset(self, depth):
+        with connection.cursor() as cursor:
+            cursor.execute(OFFSET_QUERY, [PAGE_SIZE, depth])
+            cursor.fetchall()
+
+    def timed(self, run, arg):
+        start = time.perf_counter()
+        run(arg)
+        return (time.perf_counter() - start) * 1000
+
+    def report(self, size, label, timings):
+        timings.sort()
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        self.stdout.write(
+            f"{size:>10} {label:>14} {statistics.mean(timings):>10.2f} "
+            f"{statistics.median(timings):>10.2f} {p99:>10.2f}"
+        )
@@ -0,0 +1,73 @@
+import asyncio
+import statistics
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app.hasher import check_password, check_password_async, hash_password
+
+
+def handle_report():
+    """Stand-in for report_incident: a few milliseconds of sync view work"""
+    time.sleep(0.003)
+
+
+class Command(BaseCommand):
+    help = (
+        "Shift-change login burst under ASGI: login throughput and the latency "
+        "of incident reports arriving meanwhile, with bcrypt inside sync views "
+        "versus on the bounded hash executor. No database needed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--logins", type=int, default=200)
+        parser.add_argument("--reports", type=int, default=100)
+        parser.add_argument("--report-interval-ms", type=float, default=10)
+
+    def handle(self, *args, **options):
+        hashed = hash_password("shift-change")
+        self.stdout.write(
+            f"{options['logins']} logins at cost {settings.PASSWORD_HASH_ROUNDS}, "
+            f"{settings.PASSWORD_HASH_WORKERS} hash workers, a report every "
+            f"{options['report_interval_ms']} ms"
+        )
+        self.stdout.write(
+            f"{'hashing':>10} {'logins/s':>10} {'report p50 ms':>14} {'report p99 ms':>14}"
+        )
+        for label, login in (
+            # Django runs sync views one at a time on the thread-sensitive thread
+            ("sync view", sync_to_async(check_password, thread_sensitive=True)),
+            ("executor", check_password_async),
+        ):
+            seconds, latencies = asyncio.run(self.burst(login, hashed, options))
+            latencies.sort()
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            self.stdout.write(
+                f"{label:>10} {options['logins'] / seconds:>10.1f} "
+                f"{statistics.median(latencies):>14.1f} {p99:>14.1f}"
+            )
+
+    async def burst(self, login, hashed, options):
+        report = sync_to_async(handle_report, thread_sensitive=True)
+        latencies = []
+
+        async def timed_report():
+            start = time.perf_counter()
+            await report()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        async def reports():
+            pending = []
+            for _ in range(options["reports"]):
+                pending.append(asyncio.create_task(timed_report()))
+                await asyncio.sleep(options["report_interval_ms"] / 1000)
+            await asyncio.gather(*pending)
+
+        start = time.perf_counter()
+        logins = asyncio.gather(
+            *(login("shift-change", hashed) for _ in range(options["logins"]))
+        )
+        await asyncio.gather(logins, reports())
+        return time.perf_counter() - start, latencies
@@ -0,0 +1,131 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+BENCH_ZONE = "__bench__"
+CENTER_LNG, CENTER_LAT = 29.93, 31.21
+SPREAD = 0.15
+
+LEGACY_QUERY = """
+    SELECT v.vehicle_id
+    FROM vehicle v
+    JOIN station s ON s.station_id = v.station_id
+    WHERE v.status = 'AVAILABLE'
+      AND s.type = %s
+    ORDER BY ST_Distance_Sphere(v.location, ST_GeomFromText(%s, 4326))
+    LIMIT 1
+    FOR UPDATE SKIP LOCKED
+"""
+
+INDEXED_QUERY = """
+    CALL select_nearest_vehicle(ST_GeomFromText(%s, 4326), %s, @vehicle_id)
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the full-scan nearest vehicle query with select_nearest_vehicle. "
+        "Seeds synthetic vehicles, so run it against a development database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes", nargs="+", type=int, default=[1000, 10000, 100000]
+        )
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        self.stdout.write(
+            f"{'vehicles':>10} {'query':>8} {'mean ms':>10} {'p50 ms':>10} {'p99 ms':>10}"
+        )
+        try:
+            for size in options["sizes"]:
+                station_ids = self.seed(size, rng)
+                points = [
+                    (self.random_point(rng), rng.choice(list(station_ids)))
+                    for _ in range(options["queries"])
+                ]
+                for label, run in (
+                    ("legacy", self.run_legacy),
+                    ("indexed", self.run_indexed),
+                ):
+                    timings = [self.timed(run, point, inc_type) for point, inc_type in points]
+                    self.report(size, label, timings)
+                self.cleanup()
+        finally:
+            self.cleanup()
+
+    def seed(self, size, rng):
+        station_ids = {}
+        with connection.cursor() as cursor:
+            for station_type in ("FIRE", "POLICE", "MEDICAL"):
+                cursor.execute(
+                    """
+                    INSERT INTO station (type, zone, location)
+                    VALUES (%s, %s, ST_GeomFromText(%s, 4326))
+                """,
+                    [station_type, BENCH_ZONE, f"POINT({CENTER_LNG} {CENTER_LAT})"],
+                )
+                station_ids[station_type] = cursor.lastrowid
+
+            ids = list(station_ids.values())
+            batch = []
+            for _ in range(size):
+                batch.append([self.random_point(rng), 2, rng.choice(ids)])
+                if len(batch) == 1000:
+                    self.insert_vehicles(cursor, batch)
+                    batch = []
+            if batch:
+                self.insert_vehicles(cursor, batch)
+        return station_ids
+
+    def insert_vehicles(self, cursor, batch):
+        cursor.executemany(
+            """
+            INSERT INTO vehicle (location, capacity, station_id, status)
+            VALUES (ST_GeomFromText(%s, 4326), %s, %s, 'AVAILABLE')
+        """,
+            batch,
+        )
+
+    def cleanup(self):
+        # vehicles cascade with their station
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM station WHERE zone = %s", [BENCH_ZONE])
+
+    def random_point(self, rng):
+        lng = CENTER_LNG + rng.uniform(-SPREAD, SPREAD)
+        lat = CENTER_LAT + rng.uniform(-SPREAD, SPREAD)
+        return f"POINT({lng:.6f} {lat:.6f})"
+
+    def run_legacy(self, cursor, point, inc_type):
+        cursor.execute(LEGACY_QUERY, [inc_type, point])
+        cursor.fetchall()
+
+    def run_indexed(self, cursor, point, inc_type):
+        cursor.execute(INDEXED_QUERY, [point, inc_type])
+        cursor.execute("SELECT @vehicle_id")
+        cursor.fetchall()
+
+    def timed(self, run, point, inc_type):
+        # locks are released by rolling back, so every query sees the same fleet
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                start = time.perf_counter()
+                run(cursor, point, inc_type)
+                elapsed = time.perf_counter() - start
+            transaction.set_rollback(True)
+        return elapsed * 1000
+
+    def report(self, size, label, timings):
+        timings.sort()
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        self.stdout.write(
+            f"{size:>10} {label:>8} {statistics.mean(timings):>10.2f} "
+            f"{statistics.median(timings):>10.2f} {p99:>10.2f}"
+        )
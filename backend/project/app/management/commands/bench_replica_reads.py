@@ -0,0 +1,130 @@
+import random
+import statistics
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import override_settings
+
+from app.replicas import replica_metrics
+from app.repo import (
+    VEHICLE_LOCATION,
+    get_all_incidents,
+    get_incident_type_summary,
+    get_responder_response_times,
+    get_station_response_times,
+    vehicle_location_params,
+)
+
+BENCH_ZONE = "__bench__"
+CENTER_LNG, CENTER_LAT = 29.93, 31.21
+SPREAD = 0.15
+
+
+class Command(BaseCommand):
+    help = (
+        "Location update latency on the primary while analytics and listing "
+        "readers run alongside, with the readers on the primary versus on the "
+        "replicas in DB_REPLICA_HOSTS. Seeds synthetic vehicles, so run it "
+        "against a development primary and its replica."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--updates", type=int, default=1000)
+        parser.add_argument("--readers", type=int, default=4)
+        parser.add_argument("--vehicles", type=int, default=100)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        if not settings.DB_REPLICAS:
+            raise CommandError("Set DB_REPLICA_HOSTS to compare against the replicas")
+        rng = random.Random(options["seed"])
+        self.stdout.write(
+            f"{options['updates']} updates next to {options['readers']} readers"
+        )
+        self.stdout.write(
+            f"{'readers on':>10} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9} {'reads':>7}"
+        )
+        try:
+            vehicle_ids = self.seed(options["vehicles"])
+            self.run("primary", [], vehicle_ids, rng, options)
+            self.run("replicas", settings.DB_REPLICAS, vehicle_ids, rng, options)
+            self.stdout.write(f"replicas: {replica_metrics()}")
+        finally:
+            self.cleanup()
+
+    def run(self, label, replicas, vehicle_ids, rng, options):
+        stop = threading.Event()
+        reads = []
+
+        def reader():
+            queries = [
+                get_incident_type_summary,
+                get_station_response_times,
+                get_responder_response_times,
+                get_all_incidents,
+            ]
+            try:
+                while not stop.is_set():
+                    for query in queries:
+                        query()
+                        reads.append(1)
+            finally:
+                connections.close_all()
+
+        latencies = []
+        with override_settings(DB_REPLICAS=replicas):
+            threads = [threading.Thread(target=reader) for _ in range(options["readers"])]
+            for thread in threads:
+                thread.start()
+            try:
+                with connection.cursor() as cursor:
+                    for _ in range(options["updates"]):
+                        lng = CENTER_LNG + rng.uniform(-SPREAD, SPREAD)
+                        lat = CENTER_LAT + rng.uniform(-SPREAD, SPREAD)
+                        start = time.perf_counter()
+                        VEHICLE_LOCATION.execute(
+                            cursor, vehicle_location_params(rng.choice(vehicle_ids), lat, lng)
+                        )
+                        latencies.append((time.perf_counter() - start) * 1000)
+            finally:
+                stop.set()
+                for thread in threads:
+                    thread.join()
+
+        latencies.sort()
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        self.stdout.write(
+            f"{label:>10} {statistics.median(latencies):>9.2f} {p99:>9.2f} "
+            f"{latencies[-1]:>9.2f} {len(reads):>7}"
+        )
+
+    def seed(self, size):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO station (type, zone, location)
+                VALUES ('POLICE', %s, ST_GeomFromText(%s, 4326))
+            """,
+                [BENCH_ZONE, f"POINT({CENTER_LNG} {CENTER_LAT})"],
+            )
+            station_id = cursor.lastrowid
+            cursor.executemany(
+                """
+                INSERT INTO vehicle (location, capacity, station_id, status)
+                VALUES (ST_GeomFromText(%s, 4326), 2, %s, 'AVAILABLE')
+            """,
+                [
+                    [f"POINT({CENTER_LNG:.6f} {CENTER_LAT:.6f})", station_id]
+                    for _ in range(size)
+                ],
+            )
+            cursor.execute("SELECT vehicle_id FROM vehicle WHERE station_id = %s", [station_id])
+            return [row[0] for row in cursor.fetchall()]
+
+    def cleanup(self):
+        # vehicles cascade with their station
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM station WHERE zone = %s", [BENCH_ZONE])
@@ -0,0 +1,102 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.routing import RoadNetwork
+
+CENTER_LNG, CENTER_LAT = 29.93, 31.21
+# roughly 100 m between grid intersections
+GRID_STEP_DEG = 0.001
+NEARBY_DEG = 0.02
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure road-network query latency on a GeoJSON extract, or on a "
+        "synthetic city grid when no graph is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--graph", help="GeoJSON road extract")
+        parser.add_argument("--grid-size", type=int, default=300)
+        parser.add_argument("--queries", type=int, default=500)
+        parser.add_argument("--candidates", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+
+        start = time.perf_counter()
+        if options["graph"]:
+            network = RoadNetwork.from_geojson(options["graph"])
+        else:
+            network = self.synthetic_grid(options["grid_size"], rng)
+        edges = sum(len(out) for out in network.adjacency)
+        self.stdout.write(
+            f"graph: {len(network)} nodes, {edges} edges, "
+            f"loaded in {time.perf_counter() - start:.2f}s"
+        )
+
+        lngs, lats = network.lngs, network.lats
+        min_lng, max_lng = min(lngs), max(lngs)
+        min_lat, max_lat = min(lats), max(lats)
+
+        def random_point():
+            return rng.uniform(min_lng, max_lng), rng.uniform(min_lat, max_lat)
+
+        point_to_point = []
+        ranking = []
+        for _ in range(options["queries"]):
+            (from_lng, from_lat), (to_lng, to_lat) = random_point(), random_point()
+            start = time.perf_counter()
+            network.travel_time(from_lng, from_lat, to_lng, to_lat)
+            point_to_point.append((time.perf_counter() - start) * 1000)
+
+            # candidates come from a straight-line search, so they sit nearby
+            sources = [
+                (
+                    to_lng + rng.uniform(-NEARBY_DEG, NEARBY_DEG),
+                    to_lat + rng.uniform(-NEARBY_DEG, NEARBY_DEG),
+                )
+                for _ in range(options["candidates"])
+            ]
+            start = time.perf_counter()
+            network.travel_times_to(to_lng, to_lat, sources)
+            ranking.append((time.perf_counter() - start) * 1000)
+
+        self.stdout.write(
+            f"{'query':>16} {'mean ms':>10} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}"
+        )
+        self.report("a* point", point_to_point)
+        self.report(f"rank top-{options['candidates']}", ranking)
+
+    def synthetic_grid(self, size, rng):
+        """Square street grid with a mix of road classes and one-way streets"""
+        network = RoadNetwork()
+        origin_lng = CENTER_LNG - size * GRID_STEP_DEG / 2
+        origin_lat = CENTER_LAT - size * GRID_STEP_DEG / 2
+
+        def point(x, y):
+            return (origin_lng + x * GRID_STEP_DEG, origin_lat + y * GRID_STEP_DEG)
+
+        for line in range(size):
+            speed = 60 if line % 20 == 0 else 30
+            for horizontal in (True, False):
+                oneway = rng.choice((0, 0, 0, 1, -1)) if speed == 30 else 0
+                coordinates = [
+                    point(i, line) if horizontal else point(line, i)
+                    for i in range(size)
+                ]
+                network.add_way(coordinates, speed, oneway)
+        return network
+
+    def report(self, label, timings):
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        self.stdout.write(
+            f"{label:>16} {statistics.mean(timings):>10.2f} "
+            f"{statistics.median(timings):>10.2f} {p95:>10.2f} {p99:>10.2f}"
+        )
@@ -0,0 +1,110 @@
+import gc
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+
+from app.rows import RecordJSONEncoder, map_rows
+
+# cursor.description of the incident listing, only the names are used
+DESCRIPTION = tuple(
+    (name, None, None, None, None, None, None)
+    for name in (
+        "incident_id",
+        "time_reported",
+        "time_resolved",
+        "lng",
+        "lat",
+        "type",
+        "status",
+        "severity_level",
+        "vehicle_ids",
+        "station_zones",
+        "response_time",
+    )
+)
+
+
+def legacy_zip(row, description):
+    """The per-row dict helper repo.py used before row records"""
+    if row is None:
+        return None
+    columns = [col[0] for col in description]
+    return dict(zip(columns, row))
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare per-row dicts with compiled row records: rows mapped per "
+        "second, memory held per row and JSON rows per second. No database needed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=50000)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        rows = self.synthetic_rows(options["rows"], random.Random(options["seed"]))
+
+        strategies = (
+            ("dict", lambda: [legacy_zip(row, DESCRIPTION) for row in rows]),
+            ("record", lambda: map_rows(rows, DESCRIPTION)),
+        )
+        self.stdout.write(f"{len(rows)} rows x {len(DESCRIPTION)} columns")
+        self.stdout.write(
+            f"{'mapper':>8} {'map rows/s':>12} {'bytes/row':>10} {'json rows/s':>12}"
+        )
+        encoder = RecordJSONEncoder()
+        for label, run in strategies:
+            map_seconds = min(self.timed(run) for _ in range(options["repeat"]))
+            mapped = run()
+            json_seconds = min(
+                self.timed(lambda: encoder.encode(mapped)) for _ in range(options["repeat"])
+            )
+            del mapped
+            self.stdout.write(
+                f"{label:>8} {len(rows) / map_seconds:>12,.0f} "
+                f"{self.bytes_per_row(run, len(rows)):>10.0f} "
+                f"{len(rows) / json_seconds:>12,.0f}"
+            )
+
+    def synthetic_rows(self, count, rng):
+        start = datetime(2024, 1, 1)
+        rows = []
+        for i in range(count):
+            reported = start + timedelta(seconds=rng.randrange(365 * 86400))
+            rows.append(
+                (
+                    i + 1,
+                    reported,
+                    reported + timedelta(minutes=rng.randrange(5, 90)),
+                    29.9 + rng.random() / 10,
+                    31.2 + rng.random() / 10,
+                    rng.choice(("FIRE", "POLICE", "MEDICAL")),
+                    "RESOLVED",
+                    rng.choice(("LOW", "MEDIUM", "HIGH", "CRITICAL")),
+                    str(rng.randrange(1, 500)),
+                    "Smouha",
+                    rng.randrange(5, 90),
+                )
+            )
+        return rows
+
+    def timed(self, run):
+        gc.collect()
+        start = time.perf_counter()
+        run()
+        return time.perf_counter() - start
+
+    def bytes_per_row(self, run, count):
+        """Memory the mapped list adds on top of the driver's row tuples"""
+        gc.collect()
+        tracemalloc.start()
+        mapped = run()
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del mapped
+        return size / count
@@ -0,0 +1,112 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import override_settings
+
+from app.mysql_pool.base import DatabaseWrapper as PooledWrapper
+from app.repo import (
+    INCIDENT_BY_ID,
+    SYNC_CURSOR,
+    USER_BY_ID,
+    VEHICLE_BY_ID,
+    VEHICLE_LOCATION,
+    vehicle_location_params,
+)
+from app.statements import statement_metrics
+
+BENCH_ZONE = "__bench__"
+CENTER_LNG, CENTER_LAT = 29.93, 31.21
+SPREAD = 0.15
+
+
+class Command(BaseCommand):
+    help = (
+        "Latency of the hot repository statements on a pooled connection, sent "
+        "as SQL text on every call versus prepared once and executed. Seeds "
+        "synthetic vehicles, so run it against a development database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--calls", type=int, default=2000)
+        parser.add_argument("--vehicles", type=int, default=100)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        self.stdout.write(
+            f"{'statement':>16} {'mode':>9} {'p50 ms':>9} {'p99 ms':>9} {'mean ms':>9}"
+        )
+        db = PooledWrapper(connections.settings["default"], alias="bench")
+        try:
+            vehicle_ids = self.seed(options["vehicles"], rng)
+
+            def location():
+                lng = CENTER_LNG + rng.uniform(-SPREAD, SPREAD)
+                lat = CENTER_LAT + rng.uniform(-SPREAD, SPREAD)
+                return vehicle_location_params(rng.choice(vehicle_ids), lat, lng)
+
+            cases = [
+                (VEHICLE_LOCATION, location),
+                (VEHICLE_BY_ID, lambda: [rng.choice(vehicle_ids)]),
+                (USER_BY_ID, lambda: [rng.randrange(1, 1000)]),
+                (INCIDENT_BY_ID, lambda: [rng.randrange(1, 1000)]),
+                (SYNC_CURSOR, lambda: []),
+            ]
+            for statement, params in cases:
+                for mode, enabled in (("text", False), ("prepared", True)):
+                    with override_settings(PREPARED_STATEMENTS=enabled):
+                        timings = self.timed(db, statement, params, options["calls"])
+                    self.report(statement.name, mode, timings)
+            self.stdout.write(f"registry: {statement_metrics()}")
+        finally:
+            db.close()
+            self.cleanup()
+
+    def timed(self, db, statement, params, calls):
+        timings = []
+        with db.cursor() as cursor:
+            for _ in range(calls):
+                start = time.perf_counter()
+                statement.execute(cursor, params())
+                cursor.fetchall()
+                timings.append((time.perf_counter() - start) * 1000)
+        return timings
+
+    def report(self, name, mode, timings):
+        timings.sort()
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        self.stdout.write(
+            f"{name:>16} {mode:>9} {statistics.median(timings):>9.3f} "
+            f"{p99:>9.3f} {statistics.mean(timings):>9.3f}"
+        )
+
+    def seed(self, size, rng):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO station (type, zone, location)
+                VALUES ('POLICE', %s, ST_GeomFromText(%s, 4326))
+            """,
+                [BENCH_ZONE, f"POINT({CENTER_LNG} {CENTER_LAT})"],
+            )
+            station_id = cursor.lastrowid
+            cursor.executemany(
+                """
+                INSERT INTO vehicle (location, capacity, station_id, status)
+                VALUES (ST_GeomFromText(%s, 4326), 2, %s, 'AVAILABLE')
+            """,
+                [
+                    [f"POINT({CENTER_LNG:.6f} {CENTER_LAT:.6f})", station_id]
+                    for _ in range(size)
+                ],
+            )
+            cursor.execute("SELECT vehicle_id FROM vehicle WHERE station_id = %s", [station_id])
+            return [row[0] for row in cursor.fetchall()]
+
+    def cleanup(self):
+        # vehicles cascade with their station
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM station WHERE zone = %s", [BENCH_ZONE])
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app import jwt_utils
+from app.jwt_utils import decode_token, generate_access_token
+from app.token_cache import TokenCache
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare verifying a bearer token on every request with the "
+        "verified-token cache, for a set of clients polling with their own "
+        "tokens. No database needed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=500)
+        parser.add_argument("--requests", type=int, default=100000)
+
+    def handle(self, *args, **options):
+        tokens = [
+            generate_access_token({"user_id": i, "role": "DISPATCHER"})
+            for i in range(options["clients"])
+        ]
+        requests = [tokens[i % len(tokens)] for i in range(options["requests"])]
+
+        self.stdout.write(f"{len(requests)} requests from {len(tokens)} tokens")
+        self.stdout.write(f"{'decode':>10} {'requests/s':>12} {'us/request':>12}")
+        cache = TokenCache(len(tokens))
+        for label, get_cache in (("verify", lambda: None), ("cached", lambda: cache)):
+            original = jwt_utils.get_token_cache
+            jwt_utils.get_token_cache = get_cache
+            try:
+                start = time.perf_counter()
+                for token in requests:
+                    decode_token(token)
+                seconds = time.perf_counter() - start
+            finally:
+                jwt_utils.get_token_cache = original
+            self.stdout.write(
+                f"{label:>10} {len(requests) / seconds:>12,.0f} "
+                f"{seconds / len(requests) * 1e6:>12.1f}"
+            )
+        self.stdout.write(f"cache: {cache.metrics()}")
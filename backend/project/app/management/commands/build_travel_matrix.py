@@ -0,0 +1,84 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app.repo import get_all_stations
+from app.routing import SNAP_SPEED_MPS, RoadNetwork
+from app.travel_matrix import MatrixGrid, write_matrix
+
+
+class Command(BaseCommand):
+    help = (
+        "Precompute travel times from every grid cell and station to every grid "
+        "cell. Running workers pick up the new file without a restart."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--graph", default=settings.ROAD_GRAPH_PATH)
+        parser.add_argument("--out", default=settings.TRAVEL_MATRIX_PATH)
+        parser.add_argument("--cell-m", type=float, default=200)
+        parser.add_argument(
+            "--bbox",
+            nargs=4,
+            type=float,
+            metavar=("MIN_LNG", "MIN_LAT", "MAX_LNG", "MAX_LAT"),
+            help="service area, defaults to the extent of the road graph",
+        )
+
+    def handle(self, *args, **options):
+        if not options["graph"] or not options["out"]:
+            raise CommandError(
+                "Set ROAD_GRAPH_PATH and TRAVEL_MATRIX_PATH or pass --graph and --out"
+            )
+
+        start = time.perf_counter()
+        network = RoadNetwork.from_geojson(options["graph"])
+        bbox = options["bbox"] or (
+            min(network.lngs),
+            min(network.lats),
+            max(network.lngs),
+            max(network.lats),
+        )
+        grid = MatrixGrid(options["cell_m"], *bbox)
+        stations = get_all_stations()
+        self.stdout.write(
+            f"{len(network)} road nodes, {len(grid)} cells "
+            f"({grid.columns}x{grid.rows}), {len(stations)} stations, "
+            f"~{(len(grid) + len(stations)) * len(grid) * 2 / 1e6:.0f} MB"
+        )
+
+        # a cell with no road within one cell width is off the network
+        targets = []
+        for cell in range(len(grid)):
+            node, offset = network.nearest_node(*grid.center(cell))
+            targets.append((node, offset) if offset <= grid.cell_m else None)
+
+        origins = [grid.center(cell) for cell in range(len(grid))]
+        origins += [(station["lng"], station["lat"]) for station in stations]
+
+        def rows():
+            for i, (lng, lat) in enumerate(origins):
+                if i < len(grid) and targets[i] is None:
+                    yield [None] * len(grid)
+                    continue
+                settled = network.times_from(lng, lat)
+                row = []
+                for target in targets:
+                    if target is None or target[0] not in settled:
+                        row.append(None)
+                    else:
+                        row.append(settled[target[0]] + target[1] / SNAP_SPEED_MPS)
+                yield row
+                if i % 500 == 0:
+                    self.stdout.write(f"  {i}/{len(origins)} origins")
+
+        write_matrix(
+            options["out"],
+            grid,
+            [station["station_id"] for station in stations],
+            rows(),
+        )
+        self.stdout.write(
+            f"wrote {options['out']} in {time.perf_counter() - start:.1f}s"
+        )
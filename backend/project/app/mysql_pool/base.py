@@ -0,0 +1,74 @@
+from django.conf import settings
+from django.db.backends.mysql import base as mysql
+
+from ..db_pool import ConnectionPool, get_pool
+from ..statements import clear_variables_sql
+
+# ENGINE 'app.mysql_pool': Django's MySQL backend, except that opening a
+# connection checks one out of the process-wide pool and closing it, at the
+# end of every request, hands it back still connected.
+
+
+class DatabaseWrapper(mysql.DatabaseWrapper):
+    @property
+    def pool(self):
+        conn_params = self.get_connection_params()
+        return get_pool(self.alias, lambda: create_pool(conn_params))
+
+    def get_new_connection(self, conn_params):
+        return self.pool.acquire()
+
+    def init_connection_state(self):
+        # session settings survive the trip back to the pool
+        if getattr(self.connection, "pool_initialized", False):
+            return
+        super().init_connection_state()
+        self.connection.pool_initialized = True
+
+    def _set_autocommit(self, autocommit):
+        # a pooled connection usually has the mode already, skip the round trip
+        if self.connection.get_autocommit() != autocommit:
+            super()._set_autocommit(autocommit)
+
+    def _close(self):
+        if self.connection is not None:
+            # a connection that raised is only kept when it still answers
+            broken = self.errors_occurred and not self.is_usable()
+            with self.wrap_database_errors:
+                self.pool.release(self.connection, discard=broken)
+
+
+def create_pool(conn_params):
+    return ConnectionPool(
+        connect=lambda: open_connection(conn_params),
+        ping=lambda connection: connection.ping(),
+        reset=reset_connection,
+        close=lambda connection: connection.close(),
+        size=settings.DB_POOL_SIZE,
+        timeout=settings.DB_POOL_TIMEOUT,
+        max_lifetime=settings.DB_POOL_MAX_LIFETIME,
+        check_after=settings.DB_POOL_CHECK_AFTER,
+    )
+
+
+def open_connection(conn_params):
+    connection = mysql.Database.connect(**conn_params)
+    # the same fix-up as Django's own get_new_connection
+    if connection.encoders.get(bytes) is bytes:
+        connection.encoders.pop(bytes)
+    return connection
+
+
+def reset_connection(connection):
+    # a transaction left open would hold its locks into the next checkout
+    if not connection.get_autocommit():
+        connection.rollback()
+        connection.autocommit(True)
+    # prepared statement parameters would stay readable in the session
+    clear = clear_variables_sql(connection)
+    if clear:
+        cursor = connection.cursor()
+        try:
+            cursor.execute(clear)
+        finally:
+            cursor.close()
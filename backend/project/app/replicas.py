@@ -0,0 +1,227 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .rows import map_row
+
+# Read-only repository queries (listings, search, analytics) run on a MySQL
+# replica that is at most DB_REPLICA_MAX_LAG seconds behind; writes, locking
+# procedures and the reads of the dispatch path stay on the primary. A user
+# who wrote in the last DB_REPLICA_STICKY_SECONDS reads from the primary too,
+# so they see their own writes.
+
+REPLICA_STATUS_SQL = "SHOW REPLICA STATUS"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# (user id, whether the request writes) of the request being served
+_session = ContextVar("replica_session", default=(None, False))
+
+
+class ReplicaSet:
+    """
+    The replicas of one process and how far behind each was at its last
+    check. Reads are spread round-robin over the ones within max_lag, and
+    fall back to the primary while none is.
+    """
+
+    def __init__(self, aliases, max_lag, check_interval):
+        self.aliases = list(aliases)
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        # seconds behind the primary, None when unknown or not replicating
+        self.lag = {alias: None for alias in self.aliases}
+        self.checked_at = {alias: None for alias in self.aliases}
+        self.turn = 0
+        self.reads = {alias: 0 for alias in [DEFAULT_DB_ALIAS, *self.aliases]}
+        self.pinned = 0
+        self.stale = 0
+
+    def due(self, now=None):
+        """
+        The replicas whose lag is due for a check. They are claimed, so
+        concurrent readers go on with the last known lag instead of all
+        checking at once.
+        """
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            due = [
+                alias
+                for alias in self.aliases
+                if self.checked_at[alias] is None
+                or now - self.checked_at[alias] >= self.check_interval
+            ]
+            for alias in due:
+                self.checked_at[alias] = now
+            return due
+
+    def record(self, alias, lag):
+        with self.lock:
+            self.lag[alias] = lag
+
+    def choose(self, pinned=False):
+        """The alias for one read, the primary for a pinned session"""
+        with self.lock:
+            fresh = [
+                alias
+                for alias in self.aliases
+                if self.lag[alias] is not None and self.lag[alias] <= self.max_lag
+            ]
+            if pinned:
+                self.pinned += 1
+                alias = DEFAULT_DB_ALIAS
+            elif not fresh:
+                self.stale += 1
+                alias = DEFAULT_DB_ALIAS
+            else:
+                self.turn += 1
+                alias = fresh[self.turn % len(fresh)]
+            self.reads[alias] += 1
+            return alias
+
+    def metrics(self):
+        with self.lock:
+            return {
+                "max_lag": self.max_lag,
+                "lag": dict(self.lag),
+                "reads": dict(self.reads),
+                "pinned": self.pinned,
+                "stale": self.stale,
+            }
+
+
+_replicas = None
+_replicas_lock = threading.Lock()
+
+
+def get_replicas():
+    """The process-wide replica set, None without DB_REPLICA_HOSTS"""
+    global _replicas
+    if not settings.DB_REPLICAS:
+        return None
+    with _replicas_lock:
+        if _replicas is None:
+            # a delta-sync cursor re-reads SYNC_CURSOR_OVERLAP_MS, a replica
+            # further behind than that could make a listing skip rows for good
+            max_lag = min(
+                settings.DB_REPLICA_MAX_LAG,
+                settings.SYNC_CURSOR_OVERLAP_MS / 1000 - settings.DB_REPLICA_CHECK_INTERVAL,
+            )
+            _replicas = ReplicaSet(settings.DB_REPLICAS, max_lag, settings.DB_REPLICA_CHECK_INTERVAL)
+        return _replicas
+
+
+def replica_metrics():
+    """Lag and read counts of the replicas, None without any"""
+    replicas = get_replicas()
+    return None if replicas is None else replicas.metrics()
+
+
+def start_session(request):
+    """
+    Called by auth_user before the view: a request that writes keeps its
+    user on the primary for DB_REPLICA_STICKY_SECONDS, across workers.
+    Returns the token end_session takes once the view returns.
+    """
+    if settings.DB_REPLICAS:
+        writes = request.method not in SAFE_METHODS
+        if writes:
+            cache.set(written_key(request.user_id), True, settings.DB_REPLICA_STICKY_SECONDS)
+        return _session.set((request.user_id, writes))
+    return None
+
+
+async def start_session_async(request):
+    if settings.DB_REPLICAS:
+        writes = request.method not in SAFE_METHODS
+        if writes:
+            await cache.aset(written_key(request.user_id), True, settings.DB_REPLICA_STICKY_SECONDS)
+        return _session.set((request.user_id, writes))
+    return None
+
+
+def end_session(token):
+    """
+    Undo start_session. Sync views run on reused threads, where the next
+    request would otherwise inherit this user's session
+    """
+    if token is not None:
+        _session.reset(token)
+
+
+@contextmanager
+def on_primary():
+    """Reads inside go to the primary, for results cached longer than a replica may lag"""
+    token = _session.set((None, True))
+    try:
+        yield
+    finally:
+        _session.reset(token)
+
+
+def current_session():
+    """The session of the request being served, for reads that run after it returns"""
+    return _session.get()
+
+
+def pinned(session):
+    user_id, writes = session
+    if writes:
+        return True
+    if user_id is None:
+        return False
+    return cache.get(written_key(user_id)) is not None
+
+
+async def pinned_async(session):
+    user_id, writes = session
+    if writes:
+        return True
+    if user_id is None:
+        return False
+    return await cache.aget(written_key(user_id)) is not None
+
+
+def read_alias(session=None):
+    """The database alias a read-only query of the current request runs on"""
+    replicas = get_replicas()
+    if replicas is None:
+        return DEFAULT_DB_ALIAS
+    if pinned(current_session() if session is None else session):
+        return replicas.choose(pinned=True)
+    for alias in replicas.due():
+        replicas.record(alias, check_lag(alias))
+    return replicas.choose()
+
+
+def read_connection():
+    """Django connection for a read-only query, see read_alias"""
+    return connections[read_alias()]
+
+
+def check_lag(alias):
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute(REPLICA_STATUS_SQL)
+            return replica_lag(map_row(cursor.fetchone(), cursor.description))
+    except Exception:
+        # an unreachable replica is skipped until a later check succeeds
+        return None
+
+
+def replica_lag(status):
+    """Seconds behind the primary from a SHOW REPLICA STATUS row, None when not replicating"""
+    if status is None:
+        return None
+    if status.get("Replica_IO_Running") != "Yes" or status.get("Replica_SQL_Running") != "Yes":
+        return None
+    return status.get("Seconds_Behind_Source")
+
+
+def written_key(user_id):
+    return f"replicas:written:{user_id}"
@@ -1,5 +1,27 @@
-from django.db import connection
-from datetime import datetime
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from datetime import datetime, timedelta
+from decimal import Decimal
+import base64
+import json
+import logging
+import math
+import struct
+
+from .events import (
+    publish,
+    publish_incident,
+    publish_locations,
+    publish_responder_vehicle,
+    publish_vehicle,
+)
+from .replicas import read_alias, read_connection
+from .routing import EARTH_RADIUS_M, get_router
+from .rows import map_row, map_rows, record_type
+from .sketch import DDSketch
+from .statements import prepared
+
+logger = logging.getLogger(__name__)
 
 
 def update_user_password(user_id, new_hashed_password):
@@ -11,17 +33,22 @@ def update_user_password(user_id, new_hashed_password):
             )
             if cursor.rowcount == 0:
                 raise Exception("User not found")
+
+        from .user_cache import invalidate_user
+
+        invalidate_user(user_id)
     except Exception:
         raise
 
 
+USER_BY_ID = prepared("user_by_id", "SELECT * FROM user WHERE user_id = %s")
+USER_BY_EMAIL = prepared("user_by_email", "SELECT * FROM user WHERE email = %s")
+
+
 def get_user_by_user_id(user_id):
     try:
         with connection.cursor() as cursor:
-            cursor.execute(
-                "SELECT * FROM user WHERE user_id = %s",
-                [user_id],
-            )
+            USER_BY_ID.execute(cursor, [user_id])
             row = cursor.fetchone()
             user = zip_user(row, cursor.description)
             if user is None:
@@ -34,10 +61,7 @@ def get_user_by_user_id(user_id):
 def get_user_by_email(email):
     try:
         with connection.cursor() as cursor:
-            cursor.execute(
-                "SELECT * FROM user WHERE email = %s",
-                [email],
-            )
+            USER_BY_EMAIL.execute(cursor, [email])
             row = cursor.fetchone()
             user = zip_user(row, cursor.description)
             if user is None:
@@ -52,109 +76,489 @@ def get_user_by_email(email):
 def create_incident(
     incident_type, location_lat, location_lng, severity, description=None
 ):
+    if settings.DISPATCH_BATCH_WINDOW_MS > 0:
+        from .assignment import get_assignment_engine
+
+        try:
+            return get_assignment_engine().submit(
+                incident_type, location_lat, location_lng, severity
+            )
+        except Exception as e:
+            raise Exception(f"Incident created but not assigned: {str(e)}")
+
     try:
-        with connection.cursor() as cursor:
+        preferred_vehicle_ids = None
+        router = get_router()
+        if router is not None:
+            candidates = get_vehicle_candidates(
+                incident_type, location_lat, location_lng, settings.ROUTING_CANDIDATES
+            )
+            preferred_vehicle_ids = rank_preferred_vehicles(
+                router, location_lat, location_lng, candidates
+            )
 
-            # Call stored procedure with real geometry expression
+        with connection.cursor() as cursor:
             cursor.execute(
-                """
-                CALL handle_new_incident(
-                    ST_GeomFromText(%s, 4326),
-                    %s,
-                    %s,
-                    @vehicle_id
+                *new_incident_call(
+                    incident_type, location_lat, location_lng, severity, preferred_vehicle_ids
                 )
-                """,
-                (f"POINT({location_lng} {location_lat})", severity, incident_type),
             )
 
-            # Get OUT param
-            cursor.execute("SELECT @vehicle_id")
-            vehicle_id = cursor.fetchone()[0]
+            row, description = fetch_call_result(cursor)
+            incident = map_row(row, description)
+
+        # dashboards render the listing shape, not the procedure's row
+        publish_incidents("incident.created", [incident["incident_id"]])
+        publish_vehicles([incident["vehicle_id"]])
+        return incident
+
+    except Exception as e:
+        raise Exception(f"Incident created but not assigned: {str(e)}")
+
 
-            # Get latest incident
+def rank_preferred_vehicles(router, lat, lng, candidates):
+    """The preferred_vehicle_ids argument of handle_new_incident, best ETA first"""
+    ranked = router.rank_vehicles(float(lng), float(lat), candidates)
+    if not ranked:
+        return None
+    return ",".join(str(v["vehicle_id"]) for v in ranked)
+
+
+def new_incident_call(incident_type, lat, lng, severity, preferred_vehicle_ids=None):
+    # Call stored procedure with real geometry expression, it returns
+    # the created incident as its result set
+    sql = """
+        CALL handle_new_incident(
+            ST_GeomFromText(%s, 4326),
+            %s,
+            %s,
+            %s,
+            @vehicle_id,
+            @incident_id
+        )
+    """
+    return sql, [f"POINT({lng} {lat})", severity, incident_type, preferred_vehicle_ids]
+
+
+def insert_incident(incident_type, location_lat, location_lng, severity):
+    """Insert a REPORTED incident without dispatching it"""
+    try:
+        with connection.cursor() as cursor:
             cursor.execute(
                 """
-                SELECT i.incident_id, i.time_reported, 
-                       ST_X(i.location) as lng, ST_Y(i.location) as lat,
-                       i.type, i.status, i.severity_level,
-                       d.vehicle_id, v.status as vehicle_status,
-                       s.zone as station_zone
-                FROM incident i
-                LEFT JOIN dispatch d ON i.incident_id = d.incident_id
-                LEFT JOIN vehicle v ON d.vehicle_id = v.vehicle_id
-                LEFT JOIN station s ON v.station_id = s.station_id
-                ORDER BY i.incident_id DESC
-                LIMIT 1
-            """
+                INSERT INTO incident (location, severity_level, type)
+                VALUES (ST_GeomFromText(%s, 4326), %s, %s)
+            """,
+                [f"POINT({location_lng} {location_lat})", severity, incident_type],
             )
+            return cursor.lastrowid
+    except Exception as e:
+        raise Exception(f"Failed to create incident: {str(e)}")
 
-            row = cursor.fetchone()
-            return zip_incident(row, cursor.description)
 
-    except Exception as e:
-        raise Exception(f"Incident created but not assigned: {str(e)}")
+# the candidate search widens its circle like select_nearest_vehicle, so
+# the spatial index answers it; only an empty 64 km circle scans every unit
+CANDIDATE_RADIUS_M = 1000
+CANDIDATE_MAX_RADIUS_M = 64000
 
 
-def get_all_incidents(status=None):
-    """Get all incidents, optionally filtered by status"""
+def get_vehicle_candidates(incident_type, lat, lng, limit):
+    """Get the nearest AVAILABLE vehicles of a type by straight-line distance"""
     try:
         with connection.cursor() as cursor:
-            if status:
+            for radius in candidate_radii():
                 cursor.execute(
-                    """
-                    SELECT i.incident_id, i.time_reported, i.time_resolved,
-                           ST_X(i.location) as lng, ST_Y(i.location) as lat,
-                           i.type, i.status, i.severity_level,
-                           GROUP_CONCAT(DISTINCT v.vehicle_id) as vehicle_ids,
-                           GROUP_CONCAT(DISTINCT s.zone) as station_zones,
-                           TIMESTAMPDIFF(MINUTE, i.time_reported, 
-                                        COALESCE(i.time_resolved, NOW())) as response_time
-                    FROM incident i
-                    LEFT JOIN dispatch d ON i.incident_id = d.incident_id
-                    LEFT JOIN vehicle v ON d.vehicle_id = v.vehicle_id
-                    LEFT JOIN station s ON v.station_id = s.station_id
-                    WHERE i.status = %s
-                    GROUP BY i.incident_id
-                    ORDER BY 
-                        FIELD(i.severity_level, 'CRITICAL', 'HIGH', 'MEDIUM', 'LOW'),
-                        i.time_reported DESC
-                """,
-                    [status],
+                    *vehicle_candidates_query(incident_type, lat, lng, limit, radius)
                 )
-            else:
-                cursor.execute(
-                    """
-                    SELECT i.incident_id, i.time_reported, i.time_resolved,
-                           ST_X(i.location) as lng, ST_Y(i.location) as lat,
-                           i.type, i.status, i.severity_level,
-                           GROUP_CONCAT(DISTINCT v.vehicle_id) as vehicle_ids,
-                           GROUP_CONCAT(DISTINCT s.zone) as station_zones,
-                           TIMESTAMPDIFF(MINUTE, i.time_reported, 
-                                        COALESCE(i.time_resolved, NOW())) as response_time
-                    FROM incident i
-                    LEFT JOIN dispatch d ON i.incident_id = d.incident_id
-                    LEFT JOIN vehicle v ON d.vehicle_id = v.vehicle_id
-                    LEFT JOIN station s ON v.station_id = s.station_id
-                    GROUP BY i.incident_id
-                    ORDER BY 
-                        FIELD(i.severity_level, 'CRITICAL', 'HIGH', 'MEDIUM', 'LOW'),
-                        i.time_reported DESC
+                rows = cursor.fetchall()
+                if enough_candidates(rows, limit, radius):
+                    break
+            return map_rows(rows, cursor.description)
+    except Exception as e:
+        raise Exception(f"Failed to fetch vehicle candidates: {str(e)}")
+
+
+def candidate_radii():
+    """Search radii of the candidate lookup in meters, None for the unbounded last resort"""
+    radius = CANDIDATE_RADIUS_M
+    while radius <= CANDIDATE_MAX_RADIUS_M:
+        yield radius
+        radius *= 2
+    yield None
+
+
+def enough_candidates(rows, limit, radius):
+    # every unit inside the circle was considered, so its nearest are the
+    # nearest overall; at the widest circle take whatever it holds
+    if radius is None or len(rows) >= limit:
+        return True
+    return bool(rows) and radius >= CANDIDATE_MAX_RADIUS_M
+
+
+def vehicle_candidates_query(incident_type, lat, lng, limit, radius=None):
+    point = f"POINT({lng} {lat})"
+    params = [point, incident_type]
+    bounded = ""
+    if radius is not None:
+        bounded = "AND MBRContains(ST_GeomFromText(%s, 4326), v.location)"
+        params.append(search_box(lat, lng, radius))
+    sql = f"""
+        SELECT v.vehicle_id, v.status,
+               ST_X(v.location) as lng, ST_Y(v.location) as lat,
+               v.capacity, v.station_id, s.zone,
+               ST_Distance_Sphere(v.location, ST_GeomFromText(%s, 4326)) as distance_m
+        FROM vehicle v
+        JOIN station s ON s.station_id = v.station_id
+        WHERE v.status = 'AVAILABLE'
+          AND s.type = %s
+          {bounded}
+        {"HAVING distance_m <= %s" if radius is not None else ""}
+        ORDER BY distance_m
+        LIMIT %s
+    """
+    if radius is not None:
+        params.append(radius)
+    return sql, params + [limit]
+
+
+def search_box(lat, lng, radius_m):
+    """WKT rectangle reaching radius_m from a point in every direction"""
+    lat, lng = float(lat), float(lng)
+    # SRID 4326 reads the first WKT coordinate as latitude, so POINT(lng lat)
+    # puts lng on the axis ST_Distance_Sphere and ST_Latitude treat as
+    # latitude; as in select_nearest_vehicle, the second axis is the one
+    # that widens with the cosine of the first
+    lng_delta = math.degrees(radius_m / EARTH_RADIUS_M)
+    lat_delta = lng_delta / max(math.cos(math.radians(lng)), 0.01)
+    min_lng, max_lng = max(lng - lng_delta, -90), min(lng + lng_delta, 90)
+    min_lat, max_lat = max(lat - lat_delta, -180), min(lat + lat_delta, 180)
+    return (
+        f"POLYGON(({min_lng} {min_lat}, {max_lng} {min_lat}, "
+        f"{max_lng} {max_lat}, {min_lng} {max_lat}, {min_lng} {min_lat}))"
+    )
+
+
+def lock_available_vehicles(vehicle_ids):
+    """Lock the given vehicles that are still AVAILABLE, skipping rows locked elsewhere"""
+    if not vehicle_ids:
+        return set()
+    try:
+        with connection.cursor() as cursor:
+            placeholders = ", ".join(["%s"] * len(vehicle_ids))
+            cursor.execute(
+                f"""
+                SELECT vehicle_id
+                FROM vehicle
+                WHERE vehicle_id IN ({placeholders})
+                  AND status = 'AVAILABLE'
+                FOR UPDATE SKIP LOCKED
+            """,
+                list(vehicle_ids),
+            )
+            return {row[0] for row in cursor.fetchall()}
+    except Exception as e:
+        raise Exception(f"Failed to lock vehicles: {str(e)}")
+
+
+def assign_vehicles_batch(assignments):
+    """Dispatch (incident_id, vehicle_id) pairs, mirroring handle_new_incident"""
+    if not assignments:
+        return
+    try:
+        with connection.cursor() as cursor:
+            vehicle_ids = [vehicle_id for _, vehicle_id in assignments]
+            placeholders = ", ".join(["%s"] * len(vehicle_ids))
+            cursor.execute(
+                f"UPDATE vehicle SET status = 'PENDING' WHERE vehicle_id IN ({placeholders})",
+                vehicle_ids,
+            )
+            cursor.executemany(
+                "INSERT INTO dispatch (incident_id, vehicle_id) VALUES (%s, %s)",
+                assignments,
+            )
+    except Exception as e:
+        raise Exception(f"Failed to dispatch vehicles: {str(e)}")
+
+
+def notify_no_available_vehicle(incident_id, incident_type, severity):
+    """Raise the same admin notification handle_new_incident writes when nothing is free"""
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
                 """
-                )
+                INSERT INTO admin_notification (title, body)
+                VALUES (%s, %s)
+            """,
+                [
+                    "No available vehicles",
+                    f"No available {incident_type} vehicles for incident {incident_id} "
+                    f"with severity level {severity}",
+                ],
+            )
+    except Exception as e:
+        raise Exception(f"Failed to notify admins: {str(e)}")
+
+
+def enqueue_incident_backlog(incident_id):
+    """Queue an undispatched incident for the next free vehicle of its type"""
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO incident_backlog (incident_id, type, severity_level, time_reported)
+                SELECT incident_id, type, severity_level, time_reported
+                FROM incident
+                WHERE incident_id = %s
+            """,
+                [incident_id],
+            )
+    except Exception as e:
+        raise Exception(f"Failed to queue incident: {str(e)}")
+
+
+def get_incident_backlog(incident_type=None):
+    """Get queued incidents in the order they will be assigned"""
+    try:
+        with connection.cursor() as cursor:
+            query = """
+                SELECT b.incident_id, b.type, b.severity_level, b.time_reported,
+                       ST_X(i.location) as lng, ST_Y(i.location) as lat,
+                       TIMESTAMPDIFF(MINUTE, b.time_reported, NOW()) as waiting_time
+                FROM incident_backlog b
+                JOIN incident i ON i.incident_id = b.incident_id
+            """
+            params = []
+            if incident_type:
+                query += " WHERE b.type = %s"
+                params.append(incident_type)
+            query += " ORDER BY b.severity_level DESC, b.time_reported"
+            cursor.execute(query, params)
 
             rows = cursor.fetchall()
-            return [zip_incident(row, cursor.description) for row in rows]
+            return map_rows(rows, cursor.description)
+    except Exception as e:
+        raise Exception(f"Failed to fetch incident backlog: {str(e)}")
+
+
+def get_dispatched_incidents(incident_ids):
+    """Get the create_incident view of several incidents, keyed by incident_id"""
+    if not incident_ids:
+        return {}
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(*dispatched_incidents_query(incident_ids))
+            rows = cursor.fetchall()
+            incidents = map_rows(rows, cursor.description)
+            return {incident["incident_id"]: incident for incident in incidents}
     except Exception as e:
         raise Exception(f"Failed to fetch incidents: {str(e)}")
 
 
-def get_incident_by_id(incident_id):
-    """Get incident by ID with all related details"""
+def get_incident_summaries(incident_ids):
+    """Incidents in the get_all_incidents shape, for events dashboards merge into the listing"""
+    if not incident_ids:
+        return []
     try:
         with connection.cursor() as cursor:
+            cursor.execute(*incident_summaries_query(incident_ids))
+            return map_rows(cursor.fetchall(), cursor.description)
+    except Exception as e:
+        raise Exception(f"Failed to fetch incidents: {str(e)}")
+
+
+def incident_summaries_query(incident_ids):
+    placeholders = ", ".join(["%s"] * len(incident_ids))
+    sql = f"""
+        SELECT i.incident_id, i.time_reported, i.time_resolved,
+               ST_X(i.location) as lng, ST_Y(i.location) as lat,
+               i.type, i.status, i.severity_level,
+               GROUP_CONCAT(DISTINCT v.vehicle_id) as vehicle_ids,
+               GROUP_CONCAT(DISTINCT s.zone) as station_zones,
+               TIMESTAMPDIFF(MINUTE, i.time_reported,
+                            COALESCE(i.time_resolved, NOW())) as response_time
+        FROM incident i
+        LEFT JOIN dispatch d ON i.incident_id = d.incident_id
+        LEFT JOIN vehicle v ON d.vehicle_id = v.vehicle_id
+        LEFT JOIN station s ON v.station_id = s.station_id
+        WHERE i.incident_id IN ({placeholders})
+        GROUP BY i.incident_id
+    """
+    return sql, list(incident_ids)
+
+
+def dispatched_incidents_query(incident_ids):
+    placeholders = ", ".join(["%s"] * len(incident_ids))
+    sql = f"""
+        SELECT i.incident_id, i.time_reported,
+               ST_X(i.location) as lng, ST_Y(i.location) as lat,
+               i.type, i.status, i.severity_level,
+               d.vehicle_id, v.status as vehicle_status,
+               s.zone as station_zone
+        FROM incident i
+        LEFT JOIN dispatch d ON i.incident_id = d.incident_id
+        LEFT JOIN vehicle v ON d.vehicle_id = v.vehicle_id
+        LEFT JOIN station s ON v.station_id = s.station_id
+        WHERE i.incident_id IN ({placeholders})
+    """
+    return sql, list(incident_ids)
+
+
+def get_all_incidents(status=None, since=None):
+    """
+    Get all incidents, optionally filtered by status. With a delta-sync
+    cursor only incidents whose row or dispatches changed after it.
+    """
+    try:
+        with read_connection().cursor() as cursor:
+            cursor.execute(*all_incidents_query(status, since))
+            rows = cursor.fetchall()
+            return map_rows(rows, cursor.description)
+    except Exception as e:
+        raise Exception(f"Failed to fetch incidents: {str(e)}")
+
+
+def iter_all_incidents(status=None, since=None):
+    """get_all_incidents streamed from a server-side cursor"""
+    return stream_query(*all_incidents_query(status, since), alias=read_alias())
+
+
+def all_incidents_query(status=None, since=None):
+    conditions, params = [], []
+    if status:
+        conditions.append("i.status = %s")
+        params.append(status)
+    if since is not None:
+        conditions.append(CHANGED_INCIDENTS)
+        params.extend([sync_lower_bound(since)] * 2)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    sql = f"""
+        SELECT i.incident_id, i.time_reported, i.time_resolved,
+               ST_X(i.location) as lng, ST_Y(i.location) as lat,
+               i.type, i.status, i.severity_level,
+               GROUP_CONCAT(DISTINCT v.vehicle_id) as vehicle_ids,
+               GROUP_CONCAT(DISTINCT s.zone) as station_zones,
+               TIMESTAMPDIFF(MINUTE, i.time_reported, 
+                            COALESCE(i.time_resolved, NOW())) as response_time
+        FROM incident i
+        LEFT JOIN dispatch d ON i.incident_id = d.incident_id
+        LEFT JOIN vehicle v ON d.vehicle_id = v.vehicle_id
+        LEFT JOIN station s ON v.station_id = s.station_id
+        {where}
+        GROUP BY i.incident_id
+        ORDER BY 
+            FIELD(i.severity_level, 'CRITICAL', 'HIGH', 'MEDIUM', 'LOW'),
+            i.time_reported DESC
+    """
+    return sql, params
+
+
+# incidents whose row or dispatches changed after a sync_lower_bound
+CHANGED_INCIDENTS = """i.incident_id IN (
+    SELECT incident_id FROM incident WHERE updated_at > FROM_UNIXTIME(%s)
+    UNION
+    SELECT incident_id FROM dispatch WHERE updated_at > FROM_UNIXTIME(%s)
+)"""
+
+
+def get_removed_incident_ids(status, since):
+    """
+    Ids of incidents that changed after a delta-sync cursor and no longer
+    have the status a listing filters on, so the client drops them
+    """
+    try:
+        with read_connection().cursor() as cursor:
+            cursor.execute(*removed_incident_ids_query(status, since))
+            return [row[0] for row in cursor.fetchall()]
+    except Exception as e:
+        raise Exception(f"Failed to fetch removed incidents: {str(e)}")
+
+
+def removed_incident_ids_query(status, since):
+    sql = f"""
+        SELECT i.incident_id FROM incident i
+        WHERE i.status <> %s
+          AND {CHANGED_INCIDENTS}
+        ORDER BY i.incident_id
+    """
+    return sql, [status] + [sync_lower_bound(since)] * 2
+
+
+SEVERITY_ORDER = {"LOW": 1, "MEDIUM": 2, "HIGH": 3, "CRITICAL": 4}
+
+# keyset columns of each search order, all descending
+SEARCH_ORDERS = {
+    "priority": ("i.severity_level", "i.time_reported", "i.incident_id"),
+    "recent": ("i.time_reported", "i.incident_id"),
+}
+
+
+def search_incidents(
+    incident_type=None,
+    status=None,
+    severity=None,
+    reported_from=None,
+    reported_to=None,
+    bbox=None,
+    sort="priority",
+    after=None,
+    limit=50,
+):
+    """
+    One page of incidents matching the filters, most urgent (priority) or
+    newest (recent) first.
+
+    Args:
+        bbox: (min_lng, min_lat, max_lng, max_lat)
+        after: keyset cursor from the previous page
+
+    Returns:
+        (incidents, next_cursor), next_cursor is None on the last page
+    """
+    try:
+        columns = SEARCH_ORDERS[sort]
+        conditions, params = [], []
+        if incident_type:
+            conditions.append("i.type = %s")
+            params.append(incident_type)
+        if status:
+            conditions.append("i.status = %s")
+            params.append(status)
+        if severity:
+            conditions.append("i.severity_level = %s")
+            params.append(severity)
+        if reported_from:
+            conditions.append("i.time_reported >= %s")
+            params.append(reported_from)
+        if reported_to:
+            conditions.append("i.time_reported < %s")
+            params.append(reported_to)
+        if bbox:
+            min_lng, min_lat, max_lng, max_lat = bbox
+            conditions.append("MBRContains(ST_GeomFromText(%s, 4326), i.location)")
+            params.append(
+                f"POLYGON(({min_lng} {min_lat}, {max_lng} {min_lat}, "
+                f"{max_lng} {max_lat}, {min_lng} {max_lat}, {min_lng} {min_lat}))"
+            )
+        if after is not None:
+            values = decode_page_cursor(after, sort, len(columns))
+            # (a, b, c) < (x, y, z) spelled out, so the range optimizer can
+            # seek into the composite index
+            clause = f"{columns[-1]} < %s"
+            clause_params = [values[-1]]
+            for column, value in zip(columns[-2::-1], values[-2::-1]):
+                clause = f"{column} < %s OR ({column} = %s AND ({clause}))"
+                clause_params = [value, value] + clause_params
+            conditions.append(f"({clause})")
+            params.extend(clause_params)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        order = ", ".join(f"{column} DESC" for column in columns)
+
+        with read_connection().cursor() as cursor:
+            # page the bare keys first, then join dispatches for that page only
             cursor.execute(
-                """
+                f"""
                 SELECT i.incident_id, i.time_reported, i.time_resolved,
                        ST_X(i.location) as lng, ST_Y(i.location) as lat,
                        i.type, i.status, i.severity_level,
@@ -162,20 +566,70 @@ def get_incident_by_id(incident_id):
                        GROUP_CONCAT(DISTINCT s.zone) as station_zones,
                        TIMESTAMPDIFF(MINUTE, i.time_reported, 
                                     COALESCE(i.time_resolved, NOW())) as response_time
-                FROM incident i
+                FROM (
+                    SELECT i.incident_id
+                    FROM incident i
+                    {where}
+                    ORDER BY {order}
+                    LIMIT %s
+                ) page
+                JOIN incident i ON i.incident_id = page.incident_id
                 LEFT JOIN dispatch d ON i.incident_id = d.incident_id
                 LEFT JOIN vehicle v ON d.vehicle_id = v.vehicle_id
                 LEFT JOIN station s ON v.station_id = s.station_id
-                WHERE i.incident_id = %s
                 GROUP BY i.incident_id
+                ORDER BY {order}
             """,
-                [incident_id],
+                params + [limit + 1],
             )
+            incidents = map_rows(cursor.fetchall(), cursor.description)
+
+        next_cursor = None
+        if len(incidents) > limit:
+            incidents = incidents[:limit]
+            last = incidents[-1]
+            keys = {
+                "i.severity_level": SEVERITY_ORDER[last["severity_level"]],
+                "i.time_reported": last["time_reported"].isoformat(sep=" "),
+                "i.incident_id": last["incident_id"],
+            }
+            next_cursor = encode_page_cursor(sort, [keys[c] for c in columns])
+        return incidents, next_cursor
+    except ValueError:
+        raise
+    except Exception as e:
+        raise Exception(f"Failed to search incidents: {str(e)}")
+
 
+INCIDENT_BY_ID = prepared(
+    "incident_by_id",
+    """
+    SELECT i.incident_id, i.time_reported, i.time_resolved,
+           ST_X(i.location) as lng, ST_Y(i.location) as lat,
+           i.type, i.status, i.severity_level,
+           GROUP_CONCAT(DISTINCT v.vehicle_id) as vehicle_ids,
+           GROUP_CONCAT(DISTINCT s.zone) as station_zones,
+           TIMESTAMPDIFF(MINUTE, i.time_reported, 
+                        COALESCE(i.time_resolved, NOW())) as response_time
+    FROM incident i
+    LEFT JOIN dispatch d ON i.incident_id = d.incident_id
+    LEFT JOIN vehicle v ON d.vehicle_id = v.vehicle_id
+    LEFT JOIN station s ON v.station_id = s.station_id
+    WHERE i.incident_id = %s
+    GROUP BY i.incident_id
+""",
+)
+
+
+def get_incident_by_id(incident_id):
+    """Get incident by ID with all related details"""
+    try:
+        with connection.cursor() as cursor:
+            INCIDENT_BY_ID.execute(cursor, [incident_id])
             row = cursor.fetchone()
             if not row:
                 raise Exception("Incident not found")
-            return zip_incident(row, cursor.description)
+            return map_row(row, cursor.description)
     except Exception as e:
         raise Exception(f"Failed to fetch incident: {str(e)}")
 
@@ -184,107 +638,306 @@ def resolve_incident(incident_id):
     """Resolve incident using stored procedure"""
     try:
         with connection.cursor() as cursor:
-            cursor.callproc("resolve_incident", [incident_id])
-            return get_incident_by_id(incident_id)
+            cursor.execute("CALL resolve_incident(%s)", [incident_id])
+            row, description = fetch_call_result(cursor)
+            if not row:
+                raise Exception("Incident not found")
+            incident = map_row(row, description)
+
+        publish_incident("incident.updated", incident)
+        publish_freed_vehicles(split_ids(incident["vehicle_ids"]), incident_id)
+        record_resolution(incident_id)
+        return incident
     except Exception as e:
         raise Exception(f"Failed to resolve incident: {str(e)}")
 
 
+def record_resolution(incident_id):
+    """
+    Analytics bookkeeping after resolve_incident. The incident is resolved
+    by now, so a failure here is logged, not raised; resolving it again
+    records whatever was missed
+    """
+    from .analytics import invalidate_analytics
+
+    try:
+        invalidate_analytics()
+        record_response_time(incident_id)
+    except Exception:
+        logger.exception("Analytics bookkeeping failed for incident %s", incident_id)
+
+
 # ============= VEHICLE MANAGEMENT =============
 
 
-def get_all_vehicles(status=None):
-    """Get all vehicles with their station info"""
+def get_all_vehicles(status=None, since=None):
+    """
+    Get all vehicles with their station info. With a delta-sync cursor only
+    vehicles changed after it.
+    """
     try:
-        with connection.cursor() as cursor:
-            if status:
-                cursor.execute(
-                    """
-                    SELECT v.vehicle_id, v.status, 
-                           ST_X(v.location) as lng, ST_Y(v.location) as lat,
-                           v.capacity, v.station_id,
-                           s.type as vehicle_type, s.zone,
-                           COUNT(rv.responder_id) as responder_count
-                    FROM vehicle v
-                    JOIN station s ON v.station_id = s.station_id
-                    LEFT JOIN responder_vehicle rv ON v.vehicle_id = rv.vehicle_id
-                    WHERE v.status = %s
-                    GROUP BY v.vehicle_id
-                    ORDER BY v.vehicle_id
-                """,
-                    [status],
-                )
-            else:
-                cursor.execute(
-                    """
-                    SELECT v.vehicle_id, v.status, 
-                           ST_X(v.location) as lng, ST_Y(v.location) as lat,
-                           v.capacity, v.station_id,
-                           s.type as vehicle_type, s.zone,
-                           COUNT(rv.responder_id) as responder_count
-                    FROM vehicle v
-                    JOIN station s ON v.station_id = s.station_id
-                    LEFT JOIN responder_vehicle rv ON v.vehicle_id = rv.vehicle_id
-                    GROUP BY v.vehicle_id
-                    ORDER BY v.vehicle_id
-                """
-                )
-
+        with read_connection().cursor() as cursor:
+            cursor.execute(*all_vehicles_query(status, since))
             rows = cursor.fetchall()
-            return [zip_vehicle(row, cursor.description) for row in rows]
+            return map_rows(rows, cursor.description)
     except Exception as e:
         raise Exception(f"Failed to fetch vehicles: {str(e)}")
 
 
+def iter_all_vehicles(status=None, since=None):
+    """get_all_vehicles streamed from a server-side cursor"""
+    return stream_query(*all_vehicles_query(status, since), alias=read_alias())
+
+
+def all_vehicles_query(status=None, since=None):
+    conditions, params = [], []
+    if status:
+        conditions.append("v.status = %s")
+        params.append(status)
+    if since is not None:
+        conditions.append("v.updated_at > FROM_UNIXTIME(%s)")
+        params.append(sync_lower_bound(since))
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    sql = f"""
+        SELECT v.vehicle_id, v.status, 
+               ST_X(v.location) as lng, ST_Y(v.location) as lat,
+               v.capacity, v.station_id,
+               s.type as vehicle_type, s.zone,
+               COUNT(rv.responder_id) as responder_count
+        FROM vehicle v
+        JOIN station s ON v.station_id = s.station_id
+        LEFT JOIN responder_vehicle rv ON v.vehicle_id = rv.vehicle_id
+        {where}
+        GROUP BY v.vehicle_id
+        ORDER BY v.vehicle_id
+    """
+    return sql, params
+
+
+def get_removed_vehicle_ids(status, since):
+    """Ids of vehicles that changed after a delta-sync cursor out of a listing's status"""
+    try:
+        with read_connection().cursor() as cursor:
+            cursor.execute(*removed_vehicle_ids_query(status, since))
+            return [row[0] for row in cursor.fetchall()]
+    except Exception as e:
+        raise Exception(f"Failed to fetch removed vehicles: {str(e)}")
+
+
+def removed_vehicle_ids_query(status, since):
+    sql = """
+        SELECT vehicle_id FROM vehicle
+        WHERE status <> %s
+          AND updated_at > FROM_UNIXTIME(%s)
+        ORDER BY vehicle_id
+    """
+    return sql, [status, sync_lower_bound(since)]
+
+
+def get_deleted_vehicle_ids(since):
+    """Ids of vehicles deleted after a delta-sync cursor"""
+    try:
+        with read_connection().cursor() as cursor:
+            cursor.execute(*deleted_vehicle_ids_query(since))
+            return [row[0] for row in cursor.fetchall()]
+    except Exception as e:
+        raise Exception(f"Failed to fetch deleted vehicles: {str(e)}")
+
+
+def deleted_vehicle_ids_query(since):
+    sql = """
+        SELECT vehicle_id FROM vehicle_tombstone
+        WHERE deleted_at > FROM_UNIXTIME(%s)
+        ORDER BY vehicle_id
+    """
+    return sql, [sync_lower_bound(since)]
+
+
+VEHICLE_BY_ID = prepared(
+    "vehicle_by_id",
+    """
+    SELECT v.vehicle_id, v.status, 
+           ST_X(v.location) as lng, ST_Y(v.location) as lat,
+           v.capacity, v.station_id,
+           s.type as vehicle_type, s.zone,
+           COUNT(rv.responder_id) as responder_count
+    FROM vehicle v
+    JOIN station s ON v.station_id = s.station_id
+    LEFT JOIN responder_vehicle rv ON v.vehicle_id = rv.vehicle_id
+    WHERE v.vehicle_id = %s
+    GROUP BY v.vehicle_id
+""",
+)
+VEHICLE_BY_RESPONDER = prepared(
+    "vehicle_by_responder",
+    "SELECT vehicle_id FROM responder_vehicle WHERE responder_id = %s",
+)
+VEHICLE_EXISTS = prepared(
+    "vehicle_exists",
+    "SELECT 1 FROM vehicle WHERE vehicle_id = %s",
+)
+
+
 def get_vehicle_by_id(vehicle_id):
     """Get vehicle by ID"""
     try:
         with connection.cursor() as cursor:
-            cursor.execute(
-                """
-                SELECT v.vehicle_id, v.status, 
-                       ST_X(v.location) as lng, ST_Y(v.location) as lat,
-                       v.capacity, v.station_id,
-                       s.type as vehicle_type, s.zone,
-                       COUNT(rv.responder_id) as responder_count
-                FROM vehicle v
-                JOIN station s ON v.station_id = s.station_id
-                LEFT JOIN responder_vehicle rv ON v.vehicle_id = rv.vehicle_id
-                WHERE v.vehicle_id = %s
-                GROUP BY v.vehicle_id
-            """,
-                [vehicle_id],
-            )
-
+            VEHICLE_BY_ID.execute(cursor, [vehicle_id])
             row = cursor.fetchone()
             if not row:
                 raise Exception("Vehicle not found")
-            return zip_vehicle(row, cursor.description)
+            return map_row(row, cursor.description)
     except Exception as e:
         raise Exception(f"Failed to fetch vehicle: {str(e)}")
 
 
+def vehicle_exists(vehicle_id):
+    """Whether a vehicle id is known, for writes that are deferred and cannot report it"""
+    try:
+        with connection.cursor() as cursor:
+            VEHICLE_EXISTS.execute(cursor, [vehicle_id])
+            return cursor.fetchone() is not None
+    except Exception as e:
+        raise Exception(f"Failed to fetch vehicle: {str(e)}")
+
+
+def get_vehicle_id_by_responder(responder_id):
+    """Get the vehicle a responder is assigned to, None when unassigned"""
+    try:
+        with connection.cursor() as cursor:
+            VEHICLE_BY_RESPONDER.execute(cursor, [responder_id])
+            row = cursor.fetchone()
+            return row[0] if row else None
+    except Exception as e:
+        raise Exception(f"Failed to fetch responder vehicle: {str(e)}")
+
+
+def get_vehicles_by_ids(vehicle_ids):
+    """Get several vehicles with their station info"""
+    if not vehicle_ids:
+        return []
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(*vehicles_by_ids_query(vehicle_ids))
+            rows = cursor.fetchall()
+            return map_rows(rows, cursor.description)
+    except Exception as e:
+        raise Exception(f"Failed to fetch vehicles: {str(e)}")
+
+
+def vehicles_by_ids_query(vehicle_ids):
+    placeholders = ", ".join(["%s"] * len(vehicle_ids))
+    sql = f"""
+        SELECT v.vehicle_id, v.status, 
+               ST_X(v.location) as lng, ST_Y(v.location) as lat,
+               v.capacity, v.station_id,
+               s.type as vehicle_type, s.zone,
+               COUNT(rv.responder_id) as responder_count
+        FROM vehicle v
+        JOIN station s ON v.station_id = s.station_id
+        LEFT JOIN responder_vehicle rv ON v.vehicle_id = rv.vehicle_id
+        WHERE v.vehicle_id IN ({placeholders})
+        GROUP BY v.vehicle_id
+    """
+    return sql, list(vehicle_ids)
+
+
 def update_vehicle_location(vehicle_id, lat, lng):
     """Update vehicle location"""
     try:
         with connection.cursor() as cursor:
-            cursor.execute(
-                """
-                UPDATE vehicle 
-                SET location = ST_GeomFromText(%s, 4326)
-                WHERE vehicle_id = %s
-            """,
-                [f"POINT({lng} {lat})", vehicle_id],
-            )
+            VEHICLE_LOCATION.execute(cursor, vehicle_location_params(vehicle_id, lat, lng))
 
             if cursor.rowcount == 0:
                 raise Exception("Vehicle not found")
 
-            return get_vehicle_by_id(vehicle_id)
+            vehicle = get_vehicle_by_id(vehicle_id)
+            publish_vehicle("vehicle.updated", vehicle)
+            return vehicle
     except Exception as e:
         raise Exception(f"Failed to update vehicle location: {str(e)}")
 
 
+VEHICLE_LOCATION = prepared(
+    "vehicle_location",
+    """
+    UPDATE vehicle 
+    SET location = ST_GeomFromWKB(_binary %s, 4326)
+    WHERE vehicle_id = %s
+""",
+)
+
+
+def vehicle_location_params(vehicle_id, lat, lng):
+    return [point_wkb(lng, lat), vehicle_id]
+
+
+def update_vehicle_locations_batch(positions, chunk_size=500):
+    """
+    Write many vehicle locations with one multi-row UPDATE per chunk
+
+    Args:
+        positions: dict of vehicle_id -> (lng, lat)
+
+    Returns:
+        int: Number of vehicles updated
+    """
+    try:
+        updated = 0
+        items = list(positions.items())
+        with connection.cursor() as cursor:
+            for start in range(0, len(items), chunk_size):
+                chunk = items[start : start + chunk_size]
+                rows = " UNION ALL ".join(
+                    ["SELECT %s AS vehicle_id, _binary %s AS wkb"] * len(chunk)
+                )
+                params = []
+                for vehicle_id, (lng, lat) in chunk:
+                    params.extend([vehicle_id, point_wkb(lng, lat)])
+                cursor.execute(
+                    f"""
+                    UPDATE vehicle v
+                    JOIN ({rows}) p ON p.vehicle_id = v.vehicle_id
+                    SET v.location = ST_GeomFromWKB(p.wkb, 4326)
+                """,
+                    params,
+                )
+                updated += cursor.rowcount
+
+            # zone of each vehicle, so zone-scoped dashboards get their share
+            zones = {}
+            for start in range(0, len(items), chunk_size):
+                ids = [vehicle_id for vehicle_id, _ in items[start : start + chunk_size]]
+                placeholders = ", ".join(["%s"] * len(ids))
+                cursor.execute(
+                    f"""
+                    SELECT v.vehicle_id, s.zone
+                    FROM vehicle v
+                    JOIN station s ON v.station_id = s.station_id
+                    WHERE v.vehicle_id IN ({placeholders})
+                """,
+                    ids,
+                )
+                zones.update(cursor.fetchall())
+
+        publish_locations(
+            [
+                {
+                    "vehicle_id": vehicle_id,
+                    "lng": lng,
+                    "lat": lat,
+                    "zone": zones.get(vehicle_id),
+                }
+                for vehicle_id, (lng, lat) in items
+                if vehicle_id in zones
+            ]
+        )
+        return updated
+    except Exception as e:
+        raise Exception(f"Failed to update vehicle locations: {str(e)}")
+
+
 def create_vehicle(station_id, capacity, lat, lng):
     """Create new vehicle"""
     try:
@@ -298,7 +951,9 @@ def create_vehicle(station_id, capacity, lat, lng):
             )
 
             vehicle_id = cursor.lastrowid
-            return get_vehicle_by_id(vehicle_id)
+            vehicle = get_vehicle_by_id(vehicle_id)
+            publish_vehicle("vehicle.updated", vehicle)
+            return vehicle
     except Exception as e:
         raise Exception(f"Failed to create vehicle: {str(e)}")
 
@@ -321,11 +976,20 @@ def delete_vehicle(vehicle_id):
             if count > 0:
                 raise Exception("Cannot delete vehicle with active assignments")
 
+            cursor.execute(
+                "SELECT responder_id FROM responder_vehicle WHERE vehicle_id = %s",
+                [vehicle_id],
+            )
+            responder_ids = [row[0] for row in cursor.fetchall()]
+
             cursor.execute("DELETE FROM vehicle WHERE vehicle_id = %s", [vehicle_id])
 
             if cursor.rowcount == 0:
                 raise Exception("Vehicle not found")
 
+            publish("vehicle.deleted", {"vehicle_id": vehicle_id})
+            for responder_id in responder_ids:
+                publish_responder_vehicle(responder_id, None)
             return True
     except Exception as e:
         raise Exception(f"Failed to delete vehicle: {str(e)}")
@@ -338,20 +1002,23 @@ def reassign_dispatch(incident_id, vehicle_id, dispatcher_id):
     """Assign vehicle to incident using stored procedure"""
     try:
         with connection.cursor() as cursor:
-            cursor.callproc(
-                "reassign_incident_vehicle",
-                [
-                    incident_id,
-                    vehicle_id,
-                    dispatcher_id,
-                ],
+            cursor.execute(
+                "SELECT vehicle_id FROM dispatch WHERE incident_id = %s",
+                [incident_id],
             )
+            old_vehicle_ids = [r[0] for r in cursor.fetchall()]
 
-            # Fetch result
-            cursor.execute("SELECT @_reassign_incident_vehicle_3")
-            result = cursor.fetchone()
+            cursor.execute(
+                "CALL reassign_incident_vehicle(%s, %s, %s)",
+                [incident_id, vehicle_id, dispatcher_id],
+            )
+            row, description = fetch_call_result(cursor)
+            incident = map_row(row, description)
 
-            return get_incident_by_id(incident_id)
+        publish_incident("incident.updated", incident)
+        publish_vehicles([vehicle_id])
+        publish_freed_vehicles(old_vehicle_ids, incident_id)
+        return incident
     except Exception as e:
         raise Exception(f"Failed to assign vehicle: {str(e)}")
 
@@ -360,37 +1027,20 @@ def modify_dispatch(dispatch_id, new_vehicle_id, dispatcher_id):
     """Modify dispatch using stored procedure"""
     try:
         with connection.cursor() as cursor:
-            cursor.callproc(
-                "modify_dispatch",
-                [
-                    dispatch_id,
-                    new_vehicle_id,
-                    dispatcher_id,
-                    0,  # OUT parameter placeholder
-                ],
-            )
-
-            # Fetch result
-            cursor.execute("SELECT @_modify_dispatch_3")
-            result = cursor.fetchone()
-            is_modified = result[0] if result else False
-
-            if not is_modified:
-                raise Exception("Failed to modify dispatch")
-
-            # Get incident info
+            # the procedure signals on every failure and returns the incident
+            # row on success
             cursor.execute(
-                """
-                SELECT incident_id FROM dispatch WHERE dispatch_id = %s
-            """,
-                [dispatch_id],
+                "CALL modify_dispatch(%s, %s, %s, @is_modified)",
+                [dispatch_id, new_vehicle_id, dispatcher_id],
             )
+            row, description = fetch_call_result(cursor)
+            if not row:
+                raise Exception("Failed to modify dispatch")
+            incident = map_row(row, description)
 
-            row = cursor.fetchone()
-            if row:
-                return get_incident_by_id(row[0])
-
-            return None
+        publish_incident("incident.updated", incident)
+        publish_vehicles(split_ids(incident["vehicle_ids"]))
+        return incident
     except Exception as e:
         raise Exception(f"Failed to modify dispatch: {str(e)}")
 
@@ -411,7 +1061,7 @@ def get_dispatch_by_incident(incident_id):
             )
 
             rows = cursor.fetchall()
-            return [zip_dispatch(row, cursor.description) for row in rows]
+            return map_rows(rows, cursor.description)
     except Exception as e:
         raise Exception(f"Failed to fetch dispatch: {str(e)}")
 
@@ -422,7 +1072,7 @@ def get_dispatch_by_incident(incident_id):
 def get_all_stations():
     """Get all stations"""
     try:
-        with connection.cursor() as cursor:
+        with read_connection().cursor() as cursor:
             cursor.execute(
                 """
                 SELECT station_id, type, zone,
@@ -434,7 +1084,7 @@ def get_all_stations():
             )
 
             rows = cursor.fetchall()
-            return [zip_station(row, cursor.description) for row in rows]
+            return map_rows(rows, cursor.description)
     except Exception as e:
         raise Exception(f"Failed to fetch stations: {str(e)}")
 
@@ -463,7 +1113,7 @@ def create_station(station_type, zone, lat, lng):
             )
 
             row = cursor.fetchone()
-            return zip_station(row, cursor.description)
+            return map_row(row, cursor.description)
     except Exception as e:
         raise Exception(f"Failed to create station: {str(e)}")
 
@@ -492,7 +1142,7 @@ def create_admin_user(email, password_hash, name, role="ADMIN"):
 def get_all_admin_users():
     """Get all admin and dispatcher users"""
     try:
-        with connection.cursor() as cursor:
+        with read_connection().cursor() as cursor:
             cursor.execute(
                 """
                 SELECT user_id, email, name, role
@@ -508,146 +1158,104 @@ def get_all_admin_users():
         raise Exception(f"Failed to fetch admin users: {str(e)}")
 
 
-def get_average_response_time():
-    try:
-        with connection.cursor() as cursor:
-            cursor.execute(
-                """
-                SELECT 
-                    AVG(TIMESTAMPDIFF(MINUTE, time_reported, time_resolved)) AS avg_response_time
-                FROM incident
-                WHERE status = 'RESOLVED'
-            """
-            )
-
-            row = cursor.fetchone()
-
-            return row[0] if row else None
-    except Exception as e:
-        raise Exception(f"Failed to fetch average response time: {str(e)}")
-
-
-def get_max_response_time():
-    try:
-        with connection.cursor() as cursor:
-            cursor.execute(
-                """
-                SELECT 
-                    MAX(TIMESTAMPDIFF(MINUTE, time_reported, time_resolved)) AS avg_response_time
-                FROM incident
-                WHERE status = 'RESOLVED'
-            """
-            )
-
-            row = cursor.fetchone()
-
-            return row[0] if row else None
-    except Exception as e:
-        raise Exception(f"Failed to fetch average response time: {str(e)}")
-
+def get_incident_type_summary():
+    """
+    Incident counts and resolution times per type, plus the same over all
+    types, in one scan
 
-def get_min_response_time():
+    Returns:
+        (list of per-type dicts, dict of totals)
+    """
     try:
-        with connection.cursor() as cursor:
-            cursor.execute(
+        with read_connection().cursor() as crs:
+            # the ROLLUP row (type NULL) carries the totals
+            crs.execute(
                 """
                 SELECT 
-                    MIN(TIMESTAMPDIFF(MINUTE, time_reported, time_resolved)) AS avg_response_time
+                    type,
+                    COUNT(CASE WHEN status = 'RESOLVED' THEN 1 END) AS resolved_count,
+                    COUNT(CASE WHEN status = 'ASSIGNED' THEN 1 END) AS assigned_count,
+                    COUNT(CASE WHEN status = 'REPORTED' THEN 1 END) AS reported_count,
+                    COUNT(*) AS total_count,
+                    AVG(CASE WHEN status = 'RESOLVED' THEN TIMESTAMPDIFF(SECOND, time_reported, time_resolved) END) AS avg_resolution_time_seconds,
+                    AVG(CASE WHEN status = 'RESOLVED' THEN TIMESTAMPDIFF(MINUTE, time_reported, time_resolved) END) AS avg_response_time,
+                    MAX(CASE WHEN status = 'RESOLVED' THEN TIMESTAMPDIFF(MINUTE, time_reported, time_resolved) END) AS max_response_time,
+                    MIN(CASE WHEN status = 'RESOLVED' THEN TIMESTAMPDIFF(MINUTE, time_reported, time_resolved) END) AS min_response_time
                 FROM incident
-                WHERE status = 'RESOLVED'
+                GROUP BY type WITH ROLLUP
             """
             )
 
-            row = cursor.fetchone()
-
-            return row[0] if row else None
-    except Exception as e:
-        raise Exception(f"Failed to fetch average response time: {str(e)}")
-
-
-def get_best_station():
-    try:
-        with connection.cursor() as crs:
-            crs.execute(
-                """
-                        SELECT 
-                            s.station_id,
-                            s.type AS station_type,
-                            AVG(TIMESTAMPDIFF(SECOND, i.time_reported, i.time_resolved)) AS avg_response_time_seconds,
-                            COUNT(DISTINCT i.incident_id) AS total_incidents_resolved
-                        FROM station s
-                        INNER JOIN vehicle v ON s.station_id = v.station_id
-                        INNER JOIN dispatch d ON v.vehicle_id = d.vehicle_id
-                        INNER JOIN incident i ON d.incident_id = i.incident_id
-                        WHERE i.time_resolved IS NOT NULL
-                        GROUP BY s.station_id, s.type, s.zone
-                        ORDER BY avg_response_time_seconds ASC
-                        LIMIT 1;
-                        """
-            )
-            row = crs.fetchone()
-            if row:
-                res = {
-                    "station_id": row[0],
-                    "station_type": row[1],
-                    "average_response_time": row[2],
-                    "resolved_count": row[3],
-                }
-                return res
-            return row if row else None
+            per_type = []
+            totals = {
+                "average_response_time": None,
+                "max_response_time": None,
+                "min_response_time": None,
+            }
+            for row in crs.fetchall():
+                if row[0] is None:
+                    totals = {
+                        "average_response_time": row[6],
+                        "max_response_time": row[7],
+                        "min_response_time": row[8],
+                    }
+                    continue
+                avg_time = float(row[5]) if row[5] else 0
+                per_type.append(
+                    {
+                        "type": row[0],
+                        "resolved_count": row[1],
+                        "assigned_count": row[2],
+                        "reported_count": row[3],
+                        "total_count": row[4],
+                        "resolution_rate_percentage": round(row[1] * 100.0 / row[4], 2),
+                        "avg_resolution_time_seconds": round(avg_time, 2),
+                        "avg_resolution_time_minutes": round(avg_time / 60, 2),
+                    }
+                )
+            per_type.sort(key=lambda t: t["resolved_count"], reverse=True)
+            return per_type, totals
+
     except Exception as e:
-        raise Exception(f"Failed to fetch average response time: {str(e)}")
+        raise Exception(f"Failed to fetch incidents by type: {str(e)}")
 
 
-def get_worst_station():
+def get_station_response_times():
+    """Average response time of every station with resolved incidents"""
     try:
-        with connection.cursor() as crs:
+        with read_connection().cursor() as crs:
             crs.execute(
                 """
-                        SELECT 
-                            s.station_id,
-                            s.type AS station_type,
-                            AVG(TIMESTAMPDIFF(SECOND, i.time_reported, i.time_resolved)) AS avg_response_time_seconds,
-                            COUNT(DISTINCT i.incident_id) AS total_incidents_resolved
-                        FROM station s
-                        INNER JOIN vehicle v ON s.station_id = v.station_id
-                        INNER JOIN dispatch d ON v.vehicle_id = d.vehicle_id
-                        INNER JOIN incident i ON d.incident_id = i.incident_id
-                        WHERE i.time_resolved IS NOT NULL
-                        GROUP BY s.station_id, s.type, s.zone
-                        ORDER BY avg_response_time_seconds DESC
-                        LIMIT 1;
-                        """
-            )
-            row = crs.fetchone()
-            if row:
-                res = {
+                SELECT 
+                    s.station_id,
+                    s.type AS station_type,
+                    AVG(TIMESTAMPDIFF(SECOND, i.time_reported, i.time_resolved)) AS average_response_time,
+                    COUNT(DISTINCT i.incident_id) AS resolved_count
+                FROM station s
+                INNER JOIN vehicle v ON s.station_id = v.station_id
+                INNER JOIN dispatch d ON v.vehicle_id = d.vehicle_id
+                INNER JOIN incident i ON d.incident_id = i.incident_id
+                WHERE i.time_resolved IS NOT NULL
+                GROUP BY s.station_id, s.type, s.zone
+            """
+            )
+            return [
+                {
                     "station_id": row[0],
                     "station_type": row[1],
                     "average_response_time": row[2],
                     "resolved_count": row[3],
                 }
-                return res
-            return row if row else None
+                for row in crs.fetchall()
+            ]
     except Exception as e:
-        raise Exception(f"Failed to fetch average response time: {str(e)}")
-
-
-def get_best_responder():
-    """
-    Get the responder with minimum average response time
+        raise Exception(f"Failed to fetch station response times: {str(e)}")
 
-    Args:
-        connection: Active database connection
-
-    Returns:
-        dict: Responder details with response time metrics, or None if no data
 
-    Raises:
-        Exception: If database query fails
-    """
+def get_responder_response_times():
+    """Average response time of every responder with resolved incidents"""
     try:
-        with connection.cursor() as crs:
+        with read_connection().cursor() as crs:
             crs.execute(
                 """
                 SELECT 
@@ -664,172 +1272,490 @@ def get_best_responder():
                 WHERE u.role = 'RESPONDER'
                 AND i.time_resolved IS NOT NULL
                 GROUP BY u.user_id, u.name, u.email
-                ORDER BY avg_response_time_seconds ASC
-                LIMIT 1
             """
             )
-
-            row = crs.fetchone()
-
-            if row:
-                return {
+            return [
+                {
                     "responder_id": row[0],
                     "responder_name": row[1],
                     "email": row[2],
+                    "avg_response_time_seconds": float(row[3]),
                     "avg_response_time_minutes": round(float(row[3]) / 60, 2),
                     "total_incidents_resolved": row[4],
                 }
-            return None
-
+                for row in crs.fetchall()
+            ]
     except Exception as e:
-        raise Exception(f"Failed to fetch best responder: {str(e)}")
+        raise Exception(f"Failed to fetch responder response times: {str(e)}")
 
 
-def get_worst_responder():
+def get_vehicle_count_by_type():
     """
-    Get the responder with minimum average response time
+    Get the count of vehicles for each station type
 
     Args:
         connection: Active database connection
 
     Returns:
-        dict: Responder details with response time metrics, or None if no data
+        list: List of dictionaries with station type and vehicle count
 
     Raises:
         Exception: If database query fails
     """
     try:
-        with connection.cursor() as crs:
+        with read_connection().cursor() as crs:
             crs.execute(
                 """
                 SELECT 
-                    u.user_id AS responder_id,
-                    u.name AS responder_name,
-                    u.email,
-                    AVG(TIMESTAMPDIFF(SECOND, i.time_reported, i.time_resolved)) AS avg_response_time_seconds,
-                    COUNT(DISTINCT i.incident_id) AS total_incidents_resolved
-                FROM user u
-                INNER JOIN responder_vehicle rv ON u.user_id = rv.responder_id
-                INNER JOIN vehicle v ON rv.vehicle_id = v.vehicle_id
-                INNER JOIN dispatch d ON v.vehicle_id = d.vehicle_id
-                INNER JOIN incident i ON d.incident_id = i.incident_id
-                WHERE u.role = 'RESPONDER'
-                AND i.time_resolved IS NOT NULL
-                GROUP BY u.user_id, u.name, u.email
-                ORDER BY avg_response_time_seconds DESC
-                LIMIT 1
+                    s.type AS station_type,
+                    COUNT(v.vehicle_id) AS vehicle_count
+                FROM station s
+                LEFT JOIN vehicle v ON s.station_id = v.station_id
+                GROUP BY s.type
+                ORDER BY vehicle_count DESC
             """
             )
 
-            row = crs.fetchone()
+            rows = crs.fetchall()
 
-            if row:
-                return {
-                    "responder_id": row[0],
-                    "responder_name": row[1],
-                    "email": row[2],
-                    "avg_response_time_seconds": float(row[3]),
-                    "avg_response_time_minutes": round(float(row[3]) / 60, 2),
-                    "total_incidents_resolved": row[4],
-                }
-            return None
+            results = []
+            for row in rows:
+                results.append({"station_type": row[0], "vehicle_count": row[1]})
+
+            return results
 
     except Exception as e:
-        raise Exception(f"Failed to fetch best responder: {str(e)}")
+        raise Exception(f"Failed to fetch vehicle count by type: {str(e)}")
 
 
-def get_incidents_by_type_detailed():
+# bucket start per granularity, from the hourly rollups
+ROLLUP_GRANULARITIES = {
+    "hour": "r.hour",
+    "day": "CAST(DATE_FORMAT(r.hour, '%%Y-%%m-%%d') AS DATETIME)",
+    "week": "CAST(DATE_FORMAT(r.hour - INTERVAL WEEKDAY(r.hour) DAY, '%%Y-%%m-%%d') AS DATETIME)",
+    "month": "CAST(DATE_FORMAT(r.hour, '%%Y-%%m-01') AS DATETIME)",
+}
+# rollup table, key column and reported count per group_by; only incident
+# types are known when an incident is reported, zones and stations once it
+# is resolved
+ROLLUP_DIMENSIONS = {
+    "type": ("incident_hourly", "r.type", "SUM(r.reported_count)"),
+    "zone": ("zone_hourly", "r.zone", "NULL"),
+    "station": ("station_hourly", "r.station_id", "NULL"),
+}
+ROLLUP_TABLES = ("incident_hourly", "zone_hourly", "station_hourly")
+
+HOUR_OF = "DATE_FORMAT({}, '%%Y-%%m-%%d %%H:00:00')"
+RESPONSE_SECONDS = "TIMESTAMPDIFF(SECOND, i.time_reported, i.time_resolved)"
+DISPATCHED_VEHICLES = """
+        INNER JOIN dispatch d ON d.incident_id = i.incident_id
+        INNER JOIN vehicle v ON v.vehicle_id = d.vehicle_id
+"""
+
+# response time sketches: dimension, key column and joins from incident i.
+# Responders are credited through their current vehicle
+SKETCH_SOURCES = (
+    ("type", "CAST(i.type AS CHAR)", ""),
+    ("zone", "s.zone", DISPATCHED_VEHICLES + " INNER JOIN station s ON s.station_id = v.station_id"),
+    ("station", "CAST(v.station_id AS CHAR)", DISPATCHED_VEHICLES),
+    (
+        "responder",
+        "CAST(rv.responder_id AS CHAR)",
+        DISPATCHED_VEHICLES + " INNER JOIN responder_vehicle rv ON rv.vehicle_id = v.vehicle_id",
+    ),
+)
+PERCENTILES = (("p50", 0.5), ("p90", 0.9), ("p95", 0.95), ("p99", 0.99))
+
+
+def get_rollup_series(start, end, granularity="hour", group_by="type", incident_type=None):
     """
-    Get detailed statistics of incidents for each type including all statuses
-
-    Args:
-        connection: Active database connection
+    Incident counts and response times for the hours overlapping
+    [start, end), bucketed by granularity and split by group_by. Reads the
+    hourly rollups, so a year costs at most a few thousand rows per key.
 
     Returns:
-        list: List of dictionaries with comprehensive incident statistics
+        (list of bucket dicts in time order, list of per-key totals)
 
     Raises:
-        Exception: If database query fails
+        ValueError: unknown granularity or group_by
     """
+    if granularity not in ROLLUP_GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(ROLLUP_GRANULARITIES)}")
+    if group_by not in ROLLUP_DIMENSIONS:
+        raise ValueError(f"group_by must be one of {', '.join(ROLLUP_DIMENSIONS)}")
+    table, key, reported = ROLLUP_DIMENSIONS[group_by]
+    bucket = ROLLUP_GRANULARITIES[granularity]
+
+    conditions = ["r.hour >= %s", "r.hour < %s"]
+    params = [floor_hour(start), end]
+    if incident_type:
+        conditions.append("r.type = %s")
+        params.append(incident_type)
+
     try:
-        with connection.cursor() as crs:
-            crs.execute(
-                """
-                SELECT 
-                    type,
-                    COUNT(CASE WHEN status = 'RESOLVED' THEN 1 END) AS resolved_count,
-                    COUNT(CASE WHEN status = 'ASSIGNED' THEN 1 END) AS assigned_count,
-                    COUNT(CASE WHEN status = 'REPORTED' THEN 1 END) AS reported_count,
-                    COUNT(*) AS total_count,
-                    COUNT(CASE WHEN status = 'RESOLVED' THEN 1 END) * 100.0 / COUNT(*) AS resolution_rate_percentage,
-                    AVG(CASE WHEN status = 'RESOLVED' THEN TIMESTAMPDIFF(SECOND, time_reported, time_resolved) END) AS avg_resolution_time_seconds
-                FROM incident
-                GROUP BY type
-                ORDER BY resolved_count DESC
-            """
+        with read_connection().cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT
+                    {bucket} AS bucket,
+                    {key} AS rollup_key,
+                    {reported} AS reported_count,
+                    SUM(r.resolved_count) AS resolved_count,
+                    SUM(r.response_seconds_sum) AS response_seconds_sum,
+                    MIN(r.response_seconds_min) AS response_seconds_min,
+                    MAX(r.response_seconds_max) AS response_seconds_max
+                FROM {table} r
+                WHERE {" AND ".join(conditions)}
+                GROUP BY bucket, rollup_key
+                ORDER BY bucket, rollup_key
+            """,
+                params,
             )
+            return summarize_rollups(cursor.fetchall(), group_by)
+    except Exception as e:
+        raise Exception(f"Failed to fetch analytics rollups: {str(e)}")
+
+
+def summarize_rollups(rows, group_by):
+    """Bucket dicts and per-key totals from get_rollup_series rows"""
+    buckets = []
+    totals = {}
+    for bucket, key, reported, resolved, seconds_sum, seconds_min, seconds_max in rows:
+        buckets.append(
+            {
+                "bucket": bucket,
+                group_by: key,
+                **rollup_stats(reported, resolved, seconds_sum, seconds_min, seconds_max),
+            }
+        )
+        total = totals.setdefault(key, [None, 0, 0, None, None])
+        if reported is not None:
+            total[0] = (total[0] or 0) + int(reported)
+        total[1] += int(resolved)
+        total[2] += int(seconds_sum)
+        if seconds_min is not None:
+            total[3] = seconds_min if total[3] is None else min(total[3], seconds_min)
+            total[4] = seconds_max if total[4] is None else max(total[4], seconds_max)
+    return buckets, [
+        {group_by: key, **rollup_stats(*total)} for key, total in totals.items()
+    ]
+
+
+def rollup_stats(reported, resolved, seconds_sum, seconds_min, seconds_max):
+    resolved = int(resolved)
+    stats = {} if reported is None else {"reported_count": int(reported)}
+    stats.update(
+        {
+            "resolved_count": resolved,
+            "avg_response_time_seconds": (
+                round(int(seconds_sum) / resolved, 2) if resolved else None
+            ),
+            "min_response_time_seconds": seconds_min,
+            "max_response_time_seconds": seconds_max,
+        }
+    )
+    return stats
+
+
+def rebuild_hourly_rollups(start=None, end=None):
+    """
+    Recompute the hourly rollups from raw incidents, for the hours
+    overlapping [start, end) or for all time. Replaces what the triggers
+    maintained for those hours one hour per transaction, so live intake only
+    ever waits on the hour being rebuilt.
 
-            rows = crs.fetchall()
+    Returns:
+        int: Number of hours rebuilt
+    """
+    try:
+        hours = rollup_hours(start, end)
+        for hour in hours:
+            rebuild_rollup_hour(hour)
+        return len(hours)
+    except Exception as e:
+        raise Exception(f"Failed to rebuild analytics rollups: {str(e)}")
 
-            results = []
-            for row in rows:
-                avg_time = float(row[6]) if row[6] else 0
-                results.append(
-                    {
-                        "type": row[0],
-                        "resolved_count": row[1],
-                        "assigned_count": row[2],
-                        "reported_count": row[3],
-                        "total_count": row[4],
-                        "resolution_rate_percentage": round(float(row[5]), 2),
-                        "avg_resolution_time_seconds": round(avg_time, 2),
-                        "avg_resolution_time_minutes": round(avg_time / 60, 2),
-                    }
-                )
 
-            return results
+def rollup_hours(start=None, end=None):
+    """
+    The hours overlapping [start, end) that have incidents reported or
+    resolved in them, or rollup rows to clear
+    """
+    reported_range, resolved_range, hour_range, bounds = "", "", "", []
+    if start is not None:
+        bounds.append(floor_hour(start))
+        reported_range += " AND time_reported >= %s"
+        resolved_range += " AND time_resolved >= %s"
+        hour_range += " AND `hour` >= %s"
+    if end is not None:
+        # a partial last hour is rebuilt whole
+        bounds.append(ceil_hour(end))
+        reported_range += " AND time_reported < %s"
+        resolved_range += " AND time_resolved < %s"
+        hour_range += " AND `hour` < %s"
+
+    selects = [
+        f"SELECT {HOUR_OF.format('time_reported')} AS h FROM incident WHERE TRUE{reported_range}",
+        f"""SELECT {HOUR_OF.format('time_resolved')} FROM incident
+            WHERE time_resolved IS NOT NULL{resolved_range}""",
+    ] + [
+        f"SELECT `hour` FROM {table} WHERE TRUE{hour_range}"
+        for table in ROLLUP_TABLES + ("response_time_sketch",)
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT DISTINCT CAST(h AS DATETIME) FROM ({' UNION '.join(selects)}) x ORDER BY 1",
+            bounds * len(selects),
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def rebuild_rollup_hour(hour):
+    """Replace the rollups and sketches of one clock hour in one transaction"""
+    params = [hour, hour + timedelta(hours=1)]
+    resolved = f"""
+        SELECT DISTINCT i.incident_id, {HOUR_OF.format("i.time_resolved")} AS h,
+            i.type, {RESPONSE_SECONDS} AS seconds{{columns}}
+        FROM incident i{{joins}}
+        WHERE i.status = 'RESOLVED' AND i.time_resolved IS NOT NULL
+          AND i.time_resolved >= %s AND i.time_resolved < %s
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        for table in ROLLUP_TABLES + ("response_time_sketch",):
+            cursor.execute(f"DELETE FROM {table} WHERE `hour` = %s", [hour])
+
+        # rebuilt counts all go to slot 0, readers sum the slots anyway
+        cursor.execute(
+            f"""
+            INSERT INTO incident_hourly (`hour`, `type`, reported_count)
+            SELECT {HOUR_OF.format("i.time_reported")} AS h, i.type, COUNT(*)
+            FROM incident i
+            WHERE i.time_reported >= %s AND i.time_reported < %s
+            GROUP BY h, i.type
+        """,
+            params,
+        )
+        cursor.execute(
+            f"""
+            INSERT INTO incident_hourly (`hour`, `type`, resolved_count,
+                response_seconds_sum, response_seconds_min, response_seconds_max)
+            SELECT * FROM (
+                SELECT x.h, x.type, COUNT(*) AS n, SUM(x.seconds) AS total,
+                    MIN(x.seconds) AS fastest, MAX(x.seconds) AS slowest
+                FROM ({resolved.format(columns="", joins="")}) x
+                GROUP BY x.h, x.type
+            ) r
+            ON DUPLICATE KEY UPDATE
+                resolved_count = r.n,
+                response_seconds_sum = r.total,
+                response_seconds_min = r.fastest,
+                response_seconds_max = r.slowest
+        """,
+            params,
+        )
+        cursor.execute(
+            f"""
+            INSERT INTO station_hourly (`hour`, station_id, `type`, resolved_count,
+                response_seconds_sum, response_seconds_min, response_seconds_max)
+            SELECT x.h, x.station_id, x.type, COUNT(*), SUM(x.seconds),
+                MIN(x.seconds), MAX(x.seconds)
+            FROM ({resolved.format(columns=", v.station_id", joins=DISPATCHED_VEHICLES)}) x
+            GROUP BY x.h, x.station_id, x.type
+        """,
+            params,
+        )
+        cursor.execute(
+            f"""
+            INSERT INTO zone_hourly (`hour`, zone, `type`, resolved_count,
+                response_seconds_sum, response_seconds_min, response_seconds_max)
+            SELECT x.h, x.zone, x.type, COUNT(*), SUM(x.seconds),
+                MIN(x.seconds), MAX(x.seconds)
+            FROM ({resolved.format(
+                columns=", s.zone",
+                joins=DISPATCHED_VEHICLES + " INNER JOIN station s ON s.station_id = v.station_id",
+            )}) x
+            WHERE x.zone IS NOT NULL
+            GROUP BY x.h, x.zone, x.type
+        """,
+            params,
+        )
+
+        # one hour's resolutions fit in memory
+        cursor.execute(
+            *sketch_rows_query(" AND i.time_resolved >= %s AND i.time_resolved < %s", params)
+        )
+        sketches = sketches_from_rows(cursor.fetchall())
+        cursor.executemany(
+            """
+            INSERT INTO response_time_sketch (dimension, `hour`, dimension_key, sketch)
+            VALUES (%s, %s, %s, %s)
+        """,
+            [(*key, sketch.to_bytes()) for key, sketch in sketches.items()],
+        )
+        # the hour's resolutions are in the sketches now, record_response_time
+        # must not add them again
+        cursor.execute(
+            """
+            INSERT IGNORE INTO response_time_recorded (incident_id)
+            SELECT incident_id FROM incident
+            WHERE status = 'RESOLVED' AND time_resolved >= %s AND time_resolved < %s
+        """,
+            params,
+        )
 
+
+def record_response_time(incident_id):
+    """
+    Add a resolved incident's response time to this hour's sketches of its
+    type and of every zone, station and responder that responded, while the
+    dispatch rows still exist. Idempotent: response_time_recorded notes the
+    incident in the same transaction, so a repeat or a concurrent call is a
+    no-op.
+    """
+    try:
+        with transaction.atomic(), connection.cursor() as cursor:
+            # a second caller waits on this row and then finds it taken
+            cursor.execute(
+                """
+                INSERT IGNORE INTO response_time_recorded (incident_id)
+                SELECT incident_id FROM incident
+                WHERE incident_id = %s AND status = 'RESOLVED'
+            """,
+                [incident_id],
+            )
+            if cursor.rowcount == 0:
+                return
+
+            cursor.execute(*sketch_rows_query(" AND i.incident_id = %s", [incident_id]))
+            sketches = sketches_from_rows(cursor.fetchall())
+            if not sketches:
+                return
+
+            # lock the rows in key order, creating missing ones empty, so
+            # concurrent resolutions merge one after the other
+            keys = sorted(sketches)
+            empty = DDSketch().to_bytes()
+            cursor.executemany(
+                """
+                INSERT INTO response_time_sketch (dimension, `hour`, dimension_key, sketch)
+                VALUES (%s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE sketch = sketch
+            """,
+                [(*key, empty) for key in keys],
+            )
+            for key in keys:
+                cursor.execute(
+                    """
+                    SELECT sketch FROM response_time_sketch
+                    WHERE dimension = %s AND `hour` = %s AND dimension_key = %s
+                    FOR UPDATE
+                """,
+                    list(key),
+                )
+                merged = DDSketch.from_bytes(cursor.fetchone()[0]).merge(sketches[key])
+                cursor.execute(
+                    """
+                    UPDATE response_time_sketch SET sketch = %s
+                    WHERE dimension = %s AND `hour` = %s AND dimension_key = %s
+                """,
+                    [merged.to_bytes(), *key],
+                )
     except Exception as e:
-        raise Exception(f"Failed to fetch incidents by type: {str(e)}")
+        raise Exception(f"Failed to record response time: {str(e)}")
 
 
-def get_vehicle_count_by_type():
+def get_response_percentiles(start, end, group_by="type"):
     """
-    Get the count of vehicles for each station type
-
-    Args:
-        connection: Active database connection
+    p50/p90/p95/p99 response times per type, zone, station or responder for
+    the hours overlapping [start, end), merged from the hourly sketches.
+    Each percentile is within 1% of the exact value.
 
     Returns:
-        list: List of dictionaries with station type and vehicle count
+        (list of per-key dicts, dict over all keys or None), the overall
+        entry only for group_by type, where every incident counts once
 
     Raises:
-        Exception: If database query fails
+        ValueError: unknown group_by
     """
+    if group_by not in [source[0] for source in SKETCH_SOURCES]:
+        raise ValueError(
+            f"group_by must be one of {', '.join(source[0] for source in SKETCH_SOURCES)}"
+        )
     try:
-        with connection.cursor() as crs:
-            crs.execute(
+        with read_connection().cursor() as cursor:
+            cursor.execute(
                 """
-                SELECT 
-                    s.type AS station_type,
-                    COUNT(v.vehicle_id) AS vehicle_count
-                FROM station s
-                LEFT JOIN vehicle v ON s.station_id = v.station_id
-                GROUP BY s.type
-                ORDER BY vehicle_count DESC
-            """
+                SELECT dimension_key, sketch
+                FROM response_time_sketch
+                WHERE dimension = %s AND `hour` >= %s AND `hour` < %s
+            """,
+                [group_by, floor_hour(start), end],
             )
+            merged = {}
+            for key, data in cursor.fetchall():
+                sketch = DDSketch.from_bytes(data)
+                if key in merged:
+                    merged[key].merge(sketch)
+                else:
+                    merged[key] = sketch
+    except Exception as e:
+        raise Exception(f"Failed to fetch response percentiles: {str(e)}")
 
-            rows = crs.fetchall()
+    percentiles = [
+        {group_by: key, **percentile_stats(sketch)} for key, sketch in sorted(merged.items())
+    ]
+    overall = None
+    if group_by == "type":
+        overall = DDSketch()
+        for sketch in merged.values():
+            overall.merge(sketch)
+        overall = percentile_stats(overall)
+    return percentiles, overall
 
-            results = []
-            for row in rows:
-                results.append({"station_type": row[0], "vehicle_count": row[1]})
 
-            return results
+def percentile_stats(sketch):
+    stats = {"resolved_count": sketch.count}
+    for name, q in PERCENTILES:
+        value = sketch.quantile(q)
+        stats[f"{name}_response_time_seconds"] = None if value is None else round(value, 1)
+    return stats
 
-    except Exception as e:
-        raise Exception(f"Failed to fetch vehicle count by type: {str(e)}")
+
+def sketch_rows_query(where, params):
+    """
+    (incident_id, dimension, key, hour, seconds) once per resolved incident
+    and key, UNION dropping the duplicates the joins produce
+    """
+    selects = [
+        f"""
+        SELECT i.incident_id, '{dimension}' AS dimension, {key} AS dimension_key,
+            {HOUR_OF.format("i.time_resolved")} AS h, {RESPONSE_SECONDS} AS seconds
+        FROM incident i{joins}
+        WHERE i.status = 'RESOLVED' AND i.time_resolved IS NOT NULL
+        AND {key} IS NOT NULL{where}
+    """
+        for dimension, key, joins in SKETCH_SOURCES
+    ]
+    return " UNION ".join(selects), list(params) * len(SKETCH_SOURCES)
+
+
+def sketches_from_rows(rows):
+    sketches = {}
+    for _, dimension, key, hour, seconds in rows:
+        sketch = sketches.get((dimension, hour, key))
+        if sketch is None:
+            sketch = sketches[(dimension, hour, key)] = DDSketch()
+        sketch.add(seconds)
+    return sketches
+
+
+def floor_hour(value):
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def ceil_hour(value):
+    hour = floor_hour(value)
+    return hour if hour == value else hour + timedelta(hours=1)
 
 
 def assign_responder_to_vehicle(responder_id, new_vehicle_id):
@@ -849,9 +1775,20 @@ def assign_responder_to_vehicle(responder_id, new_vehicle_id):
     """
     try:
         with connection.cursor() as crs:
+            # the procedure takes the vehicle from whoever had it
+            crs.execute(
+                "SELECT responder_id FROM responder_vehicle WHERE vehicle_id = %s",
+                [new_vehicle_id],
+            )
+            displaced = [row[0] for row in crs.fetchall() if row[0] != int(responder_id)]
             crs.callproc("assign_responder_to_vehicle", [responder_id, new_vehicle_id])
             connection.commit()
-            return True
+
+        # open uplinks would keep writing the old vehicle's location
+        publish_responder_vehicle(responder_id, new_vehicle_id)
+        for other in displaced:
+            publish_responder_vehicle(other, None)
+        return True
 
     except Exception as e:
         connection.rollback()
@@ -882,6 +1819,8 @@ def update_vehicles_to_on_route_by_incident(vehicle_id):
             )
 
             connection.commit()
+            if crs.rowcount:
+                publish_vehicles([vehicle_id])
             return crs.rowcount
 
     except Exception as e:
@@ -889,38 +1828,287 @@ def update_vehicles_to_on_route_by_incident(vehicle_id):
         raise Exception(f"Failed to update vehicles: {str(e)}")
 
 
+# ============= NOTIFICATIONS =============
+
+# notifications sent to a whole role are stored once, each user's
+# notification_watermark says how far they have read:
+# feed -> (table, id column, columns, conditions)
+NOTIFICATION_FEEDS = {
+    "DISPATCHER": (
+        "user_notification",
+        "user_notification_id",
+        "incident_id, title",
+        ["audience = 'DISPATCHER'"],
+    ),
+    "ADMIN": ("admin_notification", "admin_notification_id", "title, body", []),
+}
+
+
+def notification_feed(role):
+    """The watermark feed a role reads, None for responders' own status rows"""
+    return role if role in NOTIFICATION_FEEDS else None
+
+
+def get_notifications(user_id, role, limit=50):
+    """
+    A user's newest notifications, each flagged seen or not, and their
+    unread count
+
+    Returns:
+        (list of notification dicts, unread count)
+    """
+    try:
+        feed = notification_feed(role)
+        with connection.cursor() as cursor:
+            if feed is None:
+                cursor.execute(*responder_notifications_query(user_id, limit))
+                notifications = map_rows(cursor.fetchall(), cursor.description)
+                cursor.execute(
+                    """
+                    SELECT COUNT(*) FROM user_notification_status
+                    WHERE user_id = %s AND `status` = 'DELIVERED'
+                """,
+                    [user_id],
+                )
+                return notifications, cursor.fetchone()[0]
+
+            cursor.execute(
+                """
+                SELECT last_seen_id FROM notification_watermark
+                WHERE user_id = %s AND feed = %s
+            """,
+                [user_id, feed],
+            )
+            row = cursor.fetchone()
+            watermark = row[0] if row else 0
+            cursor.execute(*feed_notifications_query(feed, watermark, limit))
+            notifications = map_rows(cursor.fetchall(), cursor.description)
+            cursor.execute(*feed_unread_query(feed, watermark))
+            return notifications, cursor.fetchone()[0]
+    except Exception as e:
+        raise Exception(f"Failed to fetch notifications: {str(e)}")
+
+
+def feed_notifications_query(feed, watermark, limit):
+    table, key, columns, conditions = NOTIFICATION_FEEDS[feed]
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    sql = f"""
+        SELECT {key} AS notification_id, {columns}, created_at,
+               {key} <= %s AS seen
+        FROM {table}
+        {where}
+        ORDER BY {key} DESC
+        LIMIT %s
+    """
+    return sql, [watermark, limit]
+
+
+def feed_unread_query(feed, watermark):
+    table, key, _, conditions = NOTIFICATION_FEEDS[feed]
+    where = " AND ".join(conditions + [f"{key} > %s"])
+    return f"SELECT COUNT(*) FROM {table} WHERE {where}", [watermark]
+
+
+def responder_notifications_query(user_id, limit):
+    sql = """
+        SELECT n.user_notification_id AS notification_id, n.incident_id, n.title,
+               n.created_at, s.status = 'SEEN' AS seen
+        FROM user_notification_status s
+        JOIN user_notification n ON n.user_notification_id = s.user_notification_id
+        WHERE s.user_id = %s
+        ORDER BY n.user_notification_id DESC
+        LIMIT %s
+    """
+    return sql, [user_id, limit]
+
+
+def mark_notifications_seen(user_id, role, last_seen_id):
+    """Mark a user's notifications up to and including last_seen_id as seen"""
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(*mark_seen_query(user_id, role, last_seen_id))
+    except Exception as e:
+        raise Exception(f"Failed to mark notifications seen: {str(e)}")
+
+
+def mark_seen_query(user_id, role, last_seen_id):
+    feed = notification_feed(role)
+    if feed is None:
+        sql = """
+            UPDATE user_notification_status
+            SET `status` = 'SEEN'
+            WHERE user_id = %s AND user_notification_id <= %s AND `status` = 'DELIVERED'
+        """
+        return sql, [user_id, last_seen_id]
+
+    table, key, _, conditions = NOTIFICATION_FEEDS[feed]
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    # capped at the newest notification, so nothing sent later starts out
+    # seen; a stale tab can never move the watermark back
+    sql = f"""
+        INSERT INTO notification_watermark (user_id, feed, last_seen_id)
+        SELECT %s, %s, LEAST(%s, COALESCE(MAX({key}), 0))
+        FROM {table}
+        {where}
+        ON DUPLICATE KEY UPDATE
+            last_seen_id = GREATEST(notification_watermark.last_seen_id, VALUES(last_seen_id))
+    """
+    return sql, [user_id, feed, last_seen_id]
+
+
 # ============= HELPER FUNCTIONS =============
 
 
-def zip_incident(row, description):
-    if row is None:
-        return None
-    columns = [col[0] for col in description]
-    return dict(zip(columns, row))
+def publish_vehicles(vehicle_ids):
+    """Publish the current row of each vehicle after its status changed"""
+    ids = sorted({int(v) for v in vehicle_ids if v is not None})
+    for vehicle in get_vehicles_by_ids(ids):
+        publish_vehicle("vehicle.updated", vehicle)
 
 
-def zip_vehicle(row, description):
-    if row is None:
-        return None
-    columns = [col[0] for col in description]
-    return dict(zip(columns, row))
+def publish_freed_vehicles(vehicle_ids, incident_id):
+    """
+    Publish vehicles released from an incident, along with any queued
+    incident assign_backlog_to_vehicle handed them to
+    """
+    ids = sorted({int(v) for v in vehicle_ids if v is not None})
+    if not ids:
+        return
+    publish_vehicles(ids)
+    with connection.cursor() as cursor:
+        cursor.execute(*picked_up_incidents_query(ids, incident_id))
+        picked_up = [row[0] for row in cursor.fetchall()]
+    publish_incidents("incident.updated", picked_up)
+
+
+def publish_incidents(event, incident_ids):
+    """Publish incidents re-read in the listing shape the dashboards render"""
+    for incident in get_incident_summaries(incident_ids):
+        publish_incident(event, incident)
+
+
+def picked_up_incidents_query(vehicle_ids, incident_id):
+    """Open incidents other than incident_id that the vehicles now serve"""
+    placeholders = ", ".join(["%s"] * len(vehicle_ids))
+    sql = f"""
+        SELECT d.incident_id
+        FROM dispatch d
+        JOIN incident i ON i.incident_id = d.incident_id
+        WHERE d.vehicle_id IN ({placeholders})
+          AND d.incident_id != %s
+          AND i.status != 'RESOLVED'
+    """
+    return sql, list(vehicle_ids) + [incident_id]
 
 
-def zip_dispatch(row, description):
-    if row is None:
-        return None
-    columns = [col[0] for col in description]
-    return dict(zip(columns, row))
+def stream_query(sql, params, chunk_size=500, alias=DEFAULT_DB_ALIAS):
+    """
+    Yield the rows of a query as records from an unbuffered server-side
+    cursor, holding one chunk in memory at a time. Nothing else may run on
+    the connection until the generator is exhausted or closed.
+    """
+    from MySQLdb.cursors import SSCursor
+
+    db = connections[alias]
+    db.ensure_connection()
+    cursor = db.connection.cursor(SSCursor)
+    try:
+        cursor.execute(sql, params)
+        record = record_type(cursor.description)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            for row in rows:
+                yield record(row)
+    finally:
+        # also discards unread rows when the client went away early
+        cursor.close()
 
 
-def zip_station(row, description):
-    if row is None:
-        return None
-    columns = [col[0] for col in description]
-    return dict(zip(columns, row))
+def get_sync_cursor():
+    """
+    Delta-sync cursor for a listing about to be read: the database clock in
+    microseconds. Take it before the rows, so nothing committed in between
+    is missed.
+    """
+    with connection.cursor() as cursor:
+        SYNC_CURSOR.execute(cursor)
+        return sync_cursor_value(cursor.fetchone()[0])
+
+
+SYNC_CURSOR = prepared("sync_cursor", "SELECT UNIX_TIMESTAMP(NOW(6))")
+
+
+def sync_cursor_value(seconds):
+    return str(int(seconds * 1000000))
+
+
+def parse_sync_cursor(value):
+    """The microseconds in a cursor from get_sync_cursor, ValueError when malformed"""
+    micros = int(value)
+    if micros < 0:
+        raise ValueError("Invalid cursor")
+    return micros
+
+
+def sync_lower_bound(since):
+    """
+    FROM_UNIXTIME argument for rows changed after a cursor. updated_at is
+    stamped when a statement runs, not when it commits, so the window
+    reaches SYNC_CURSOR_OVERLAP_MS back for transactions still open when the
+    cursor was taken. Clients may see a row twice. A write whose transaction
+    stays open longer than the overlap is missed by the next delta and only
+    shows up in a full listing.
+    """
+    micros = max(0, since - settings.SYNC_CURSOR_OVERLAP_MS * 1000)
+    return Decimal(micros).scaleb(-6)
+
+
+def encode_page_cursor(sort, values):
+    """Opaque keyset cursor for the row a page ended on"""
+    payload = json.dumps([sort] + list(values), separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_page_cursor(token, sort, size):
+    """Keyset values from encode_page_cursor, ValueError when malformed"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(payload, list) or len(payload) != size + 1:
+        raise ValueError("Invalid cursor")
+    if payload[0] != sort:
+        raise ValueError("Cursor belongs to a different sort order")
+    return payload[1:]
+
+
+def split_ids(group_concat):
+    """Ids from a GROUP_CONCAT column, e.g. vehicle_ids"""
+    if not group_concat:
+        return []
+    return [int(i) for i in str(group_concat).split(",")]
+
+
+
+def point_wkb(lng, lat):
+    """Little-endian WKB point, same axis order as the POINT(lng lat) WKT used elsewhere"""
+    return struct.pack("<BIdd", 1, 1, float(lng), float(lat))
+
+
+def fetch_call_result(cursor):
+    """Read the row a stored procedure returns and drain its remaining result sets"""
+    row = cursor.fetchone()
+    description = cursor.description
+    while cursor.nextset():
+        pass
+    return row, description
 
 
 def zip_user(row, description):
+    # users stay plain dicts, views drop the password key from them
     if row is None:
         return None
     columns = [col[0] for col in description]
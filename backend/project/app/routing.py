@@ -0,0 +1,322 @@
+import heapq
+import json
+import math
+import threading
+
+from django.conf import settings
+
+from .travel_matrix import get_travel_matrix
+
+EARTH_RADIUS_M = 6370986
+
+# km/h by OSM highway class when the way has no usable maxspeed
+DEFAULT_SPEEDS = {
+    "motorway": 100,
+    "motorway_link": 60,
+    "trunk": 80,
+    "trunk_link": 50,
+    "primary": 60,
+    "primary_link": 45,
+    "secondary": 50,
+    "secondary_link": 40,
+    "tertiary": 40,
+    "tertiary_link": 35,
+    "unclassified": 40,
+    "residential": 30,
+    "service": 20,
+    "living_street": 10,
+}
+FALLBACK_SPEED = 30
+
+# speed assumed between a point and the road node it snaps to
+SNAP_SPEED_MPS = FALLBACK_SPEED / 3.6
+
+GRID_CELL_DEG = 0.01
+# a point further than this from every road node is off the graph
+MAX_SNAP_M = 5000
+
+
+def distance_m(lng1, lat1, lng2, lat2):
+    """Great-circle distance in meters"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = (
+        math.sin(d_phi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def ring_cells(cx, cy, ring):
+    """The grid cells on the square ring `ring` cells out from (cx, cy)"""
+    if ring == 0:
+        yield cx, cy
+        return
+    for x in range(cx - ring, cx + ring + 1):
+        yield x, cy - ring
+        yield x, cy + ring
+    for y in range(cy - ring + 1, cy + ring):
+        yield cx - ring, y
+        yield cx + ring, y
+
+
+def parse_speed(properties):
+    maxspeed = properties.get("maxspeed")
+    if maxspeed:
+        try:
+            value = float(str(maxspeed).split()[0])
+            if "mph" in str(maxspeed):
+                value *= 1.609
+            if value > 0:
+                return value
+        except ValueError:
+            pass
+    return DEFAULT_SPEEDS.get(properties.get("highway"), FALLBACK_SPEED)
+
+
+def parse_oneway(properties):
+    """Returns 1 for forward only, -1 for backward only, 0 for both directions"""
+    oneway = str(properties.get("oneway", "no")).lower()
+    if oneway in ("yes", "true", "1"):
+        return 1
+    if oneway == "-1":
+        return -1
+    return 0
+
+
+class RoadNetwork:
+    """
+    Directed road graph with travel times in seconds on its edges.
+
+    Points are snapped to the nearest graph node, the straight line to that
+    node is charged at SNAP_SPEED_MPS.
+    """
+
+    def __init__(self):
+        self.lngs = []
+        self.lats = []
+        self.adjacency = []
+        self.reverse = []
+        self.node_index = {}
+        self.grid = {}
+        self.max_speed_mps = FALLBACK_SPEED / 3.6
+
+    @classmethod
+    def from_geojson(cls, path):
+        """
+        Load LineString/MultiLineString features, e.g. an OSM extract exported
+        with `osmium export city.osm.pbf -o city.geojson`
+        """
+        with open(path) as f:
+            data = json.load(f)
+
+        network = cls()
+        for feature in data.get("features", []):
+            geometry = feature.get("geometry") or {}
+            properties = feature.get("properties") or {}
+            if geometry.get("type") == "LineString":
+                lines = [geometry["coordinates"]]
+            elif geometry.get("type") == "MultiLineString":
+                lines = geometry["coordinates"]
+            else:
+                continue
+            speed = parse_speed(properties)
+            oneway = parse_oneway(properties)
+            for line in lines:
+                network.add_way(line, speed, oneway)
+        return network
+
+    def __len__(self):
+        return len(self.lngs)
+
+    def add_node(self, lng, lat):
+        key = (round(lng, 7), round(lat, 7))
+        node = self.node_index.get(key)
+        if node is None:
+            node = len(self.lngs)
+            self.node_index[key] = node
+            self.lngs.append(lng)
+            self.lats.append(lat)
+            self.adjacency.append([])
+            self.reverse.append([])
+            cell = (int(lng // GRID_CELL_DEG), int(lat // GRID_CELL_DEG))
+            self.grid.setdefault(cell, []).append(node)
+        return node
+
+    def add_edge(self, a, b, seconds):
+        self.adjacency[a].append((b, seconds))
+        self.reverse[b].append((a, seconds))
+
+    def add_way(self, coordinates, speed_kmh, oneway=0):
+        speed_mps = speed_kmh / 3.6
+        self.max_speed_mps = max(self.max_speed_mps, speed_mps)
+        nodes = [self.add_node(lng, lat) for lng, lat, *_ in coordinates]
+        for a, b in zip(nodes, nodes[1:]):
+            if a == b:
+                continue
+            seconds = self.node_distance(a, b) / speed_mps
+            if oneway >= 0:
+                self.add_edge(a, b, seconds)
+            if oneway <= 0:
+                self.add_edge(b, a, seconds)
+
+    def node_distance(self, a, b):
+        return distance_m(self.lngs[a], self.lats[a], self.lngs[b], self.lats[b])
+
+    def nearest_node(self, lng, lat):
+        """
+        Nearest graph node and the straight-line distance to it in meters,
+        (None, inf) when no node is within MAX_SNAP_M
+        """
+        if not self.lngs:
+            raise Exception("Road network is empty")
+
+        cx, cy = int(lng // GRID_CELL_DEG), int(lat // GRID_CELL_DEG)
+        # cells are narrowest east-west, enough rings to cover MAX_SNAP_M that way
+        cell_m = 111320 * GRID_CELL_DEG * max(math.cos(math.radians(lat)), 0.01)
+        max_ring = math.ceil(MAX_SNAP_M / cell_m)
+        best, best_distance = None, math.inf
+        ring = 0
+        # one extra ring after the first hit, a closer node may sit in a
+        # neighbouring cell
+        found_at = None
+        while ring <= max_ring and (found_at is None or ring <= found_at + 1):
+            for cell in ring_cells(cx, cy, ring):
+                for node in self.grid.get(cell, ()):
+                    d = distance_m(lng, lat, self.lngs[node], self.lats[node])
+                    if d < best_distance:
+                        best, best_distance = node, d
+            if best is not None and found_at is None:
+                found_at = ring
+            ring += 1
+        if best_distance > MAX_SNAP_M:
+            return None, math.inf
+        return best, best_distance
+
+    def travel_time(self, from_lng, from_lat, to_lng, to_lat):
+        """Seconds from one point to another with A*, None when unreachable"""
+        source, source_offset = self.nearest_node(from_lng, from_lat)
+        target, target_offset = self.nearest_node(to_lng, to_lat)
+        if source is None or target is None:
+            return None
+        offset = (source_offset + target_offset) / SNAP_SPEED_MPS
+
+        target_lng, target_lat = self.lngs[target], self.lats[target]
+
+        def heuristic(node):
+            return (
+                distance_m(self.lngs[node], self.lats[node], target_lng, target_lat)
+                / self.max_speed_mps
+            )
+
+        best = {source: 0.0}
+        heap = [(heuristic(source), 0.0, source)]
+        while heap:
+            _, seconds, node = heapq.heappop(heap)
+            if node == target:
+                return seconds + offset
+            if seconds > best.get(node, math.inf):
+                continue
+            for neighbour, edge_seconds in self.adjacency[node]:
+                candidate = seconds + edge_seconds
+                if candidate < best.get(neighbour, math.inf):
+                    best[neighbour] = candidate
+                    heapq.heappush(
+                        heap, (candidate + heuristic(neighbour), candidate, neighbour)
+                    )
+        return None
+
+    def travel_times_to(self, to_lng, to_lat, sources):
+        """
+        Seconds from each (lng, lat) source to one target, None when unreachable.
+        One Dijkstra over the reversed graph, stopped once every source is settled.
+        """
+        target, target_offset = self.nearest_node(to_lng, to_lat)
+        if target is None:
+            return [None] * len(sources)
+        snapped = [self.nearest_node(lng, lat) for lng, lat in sources]
+        remaining = {node for node, _ in snapped if node is not None}
+
+        settled = {}
+        best = {target: 0.0}
+        heap = [(0.0, target)]
+        while heap and remaining:
+            seconds, node = heapq.heappop(heap)
+            if node in settled:
+                continue
+            settled[node] = seconds
+            remaining.discard(node)
+            for neighbour, edge_seconds in self.reverse[node]:
+                candidate = seconds + edge_seconds
+                if candidate < best.get(neighbour, math.inf):
+                    best[neighbour] = candidate
+                    heapq.heappush(heap, (candidate, neighbour))
+
+        times = []
+        for node, source_offset in snapped:
+            if node in settled:
+                times.append(
+                    settled[node] + (source_offset + target_offset) / SNAP_SPEED_MPS
+                )
+            else:
+                times.append(None)
+        return times
+
+    def times_from(self, lng, lat):
+        """Seconds from a point to every reachable node, keyed by node"""
+        source, source_offset = self.nearest_node(lng, lat)
+        if source is None:
+            return {}
+        settled = {}
+        best = {source: source_offset / SNAP_SPEED_MPS}
+        heap = [(best[source], source)]
+        while heap:
+            seconds, node = heapq.heappop(heap)
+            if node in settled:
+                continue
+            settled[node] = seconds
+            for neighbour, edge_seconds in self.adjacency[node]:
+                candidate = seconds + edge_seconds
+                if candidate < best.get(neighbour, math.inf):
+                    best[neighbour] = candidate
+                    heapq.heappush(heap, (candidate, neighbour))
+        return settled
+
+    def rank_vehicles(self, to_lng, to_lat, vehicles):
+        """
+        Order vehicle dicts with lng/lat keys by travel time to a point,
+        adding an eta_seconds key. Unreachable vehicles are dropped.
+        """
+        times = self.travel_times_to(
+            to_lng, to_lat, [(v["lng"], v["lat"]) for v in vehicles]
+        )
+        ranked = []
+        for vehicle, seconds in zip(vehicles, times):
+            if seconds is not None:
+                ranked.append({**vehicle, "eta_seconds": round(seconds, 1)})
+        ranked.sort(key=lambda v: v["eta_seconds"])
+        return ranked
+
+
+_network = None
+_network_lock = threading.Lock()
+
+
+def get_road_network():
+    """The process-wide road network, or None when ROAD_GRAPH_PATH is not set"""
+    global _network
+    if not settings.ROAD_GRAPH_PATH:
+        return None
+    with _network_lock:
+        if _network is None:
+            _network = RoadNetwork.from_geojson(settings.ROAD_GRAPH_PATH)
+        return _network
+
+
+def get_router():
+    """
+    Where dispatch ranking gets travel times from: the precomputed matrix when
+    one is built, the road network when configured, otherwise None
+    """
+    return get_travel_matrix() or get_road_network()
@@ -0,0 +1,94 @@
+from collections.abc import Mapping
+from functools import lru_cache
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse as DjangoJsonResponse
+
+
+class Record(Mapping):
+    """
+    A result row backed by the driver's own tuple. The column names and
+    their positions live on the class, compiled once per result shape, so a
+    row costs one small object instead of a dict. Reads like a read-only dict.
+    """
+
+    __slots__ = ("_values",)
+    _fields = ()
+    _index = {}
+
+    def __init__(self, values):
+        self._values = values
+
+    def __getitem__(self, key):
+        return self._values[self._index[key]]
+
+    def get(self, key, default=None):
+        i = self._index.get(key)
+        return default if i is None else self._values[i]
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def keys(self):
+        return self._fields
+
+    def values(self):
+        return self._values
+
+    def items(self):
+        return zip(self._fields, self._values)
+
+    def as_dict(self):
+        return dict(zip(self._fields, self._values))
+
+    def __repr__(self):
+        return f"Record({self.as_dict()!r})"
+
+
+@lru_cache(maxsize=512)
+def record_type(description):
+    """Record class for a cursor.description, built once per result shape"""
+    fields = tuple(column[0] for column in description)
+    return type(
+        "Record",
+        (Record,),
+        {
+            "__slots__": (),
+            "_fields": fields,
+            "_index": {name: i for i, name in enumerate(fields)},
+        },
+    )
+
+
+def map_row(row, description):
+    if row is None:
+        return None
+    return record_type(description)(row)
+
+
+def map_rows(rows, description):
+    record = record_type(description)
+    return [record(row) for row in rows]
+
+
+class RecordJSONEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        if isinstance(o, Record):
+            return o.as_dict()
+        return super().default(o)
+
+
+class JsonResponse(DjangoJsonResponse):
+    """django.http.JsonResponse that also serializes records"""
+
+    def __init__(self, data, encoder=RecordJSONEncoder, **kwargs):
+        if isinstance(data, Record):
+            # safe mode only lets dicts through at the top level
+            data = data.as_dict()
+        super().__init__(data, encoder=encoder, **kwargs)
@@ -0,0 +1,132 @@
+import math
+import struct
+
+# every stored sketch uses this, sketches of different accuracy can't merge
+RELATIVE_ACCURACY = 0.01
+
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<BdQdd")
+
+
+class DDSketch:
+    """
+    Mergeable quantile sketch (DDSketch). Values fall into logarithmic
+    buckets, so every quantile it answers is within relative_accuracy of
+    the true value, and merging two sketches adds their bucket counts. Its
+    size depends on the spread of the values, not on how many were added.
+    """
+
+    def __init__(self, relative_accuracy=RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.bins = {}
+        # values <= 0, e.g. an incident resolved the second it was reported
+        self.zero_count = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value, count=1):
+        if value <= 0:
+            self.zero_count += count
+        else:
+            index = math.ceil(math.log(value) / self.log_gamma)
+            self.bins[index] = self.bins.get(index, 0) + count
+        self.count += count
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches of different accuracy")
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def quantile(self, q):
+        """Value at quantile q in [0, 1], None for an empty sketch"""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if seen > rank:
+            return max(self.min, 0)
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen > rank:
+                value = 2 * self.gamma**index / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def to_bytes(self):
+        """
+        Header, then the bucket indexes delta-encoded and the counts, both
+        as varints
+        """
+        out = bytearray(
+            HEADER.pack(
+                FORMAT_VERSION,
+                self.relative_accuracy,
+                self.zero_count,
+                self.min if self.count else 0.0,
+                self.max if self.count else 0.0,
+            )
+        )
+        write_varint(out, len(self.bins))
+        previous = 0
+        for index in sorted(self.bins):
+            write_varint(out, zigzag(index - previous))
+            write_varint(out, self.bins[index])
+            previous = index
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data):
+        version, accuracy, zero_count, low, high = HEADER.unpack_from(data)
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unknown sketch format {version}")
+        sketch = cls(accuracy)
+        sketch.zero_count = zero_count
+        pos = HEADER.size
+        size, pos = read_varint(data, pos)
+        index = 0
+        for _ in range(size):
+            delta, pos = read_varint(data, pos)
+            count, pos = read_varint(data, pos)
+            index += unzigzag(delta)
+            sketch.bins[index] = count
+        sketch.count = zero_count + sum(sketch.bins.values())
+        if sketch.count:
+            sketch.min, sketch.max = low, high
+        return sketch
+
+
+def zigzag(n):
+    return n * 2 if n >= 0 else -n * 2 - 1
+
+
+def unzigzag(n):
+    return n // 2 if n % 2 == 0 else -(n + 1) // 2
+
+
+def write_varint(out, n):
+    while n >= 0x80:
+        out.append(n & 0x7F | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def read_varint(data, pos):
+    n = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        n |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return n, pos
+        shift += 7
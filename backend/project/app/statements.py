@@ -0,0 +1,201 @@
+import threading
+import time
+
+from django.conf import settings
+
+from .sketch import DDSketch
+
+# MySQL's "Unknown prepared statement handler", the connection lost it
+UNKNOWN_STATEMENT = 1243
+
+
+class Statement:
+    """
+    A named query that pooled connections prepare once on the server and
+    then run with EXECUTE, so MySQL parses it once per connection instead
+    of once per call. The SQL uses the usual %s placeholders, written
+    `_binary %s` for a bytes parameter.
+
+    mysqlclient and PyMySQL have no binary protocol API, so this is MySQL's
+    SQL-level PREPARE: parameters travel as user variables, set in the same
+    round trip as the EXECUTE. The variables outlive the call on the
+    session, so the pools clear them with clear_variables_sql on release.
+    """
+
+    def __init__(self, name, sql):
+        self.name = name
+        self.sql = sql
+        self.handle = f"stmt_{name}"
+        self.prepare_sql = f"PREPARE {self.handle} FROM %s"
+        # the introducer moves to the SET, ? placeholders take no prefix
+        binary = [part.endswith("_binary ") for part in sql.split("%s")[:-1]]
+        # PREPARE gets the SQL as a string value, with ? placeholders
+        self.prepare_params = [
+            sql.replace("_binary %s", "?").replace("%s", "?").replace("%%", "%")
+        ]
+        variables = self.variables = [f"@{self.handle}_{i}" for i in range(len(binary))]
+        if variables:
+            assignments = [
+                f"{v} = _binary %s" if is_binary else f"{v} = %s"
+                for v, is_binary in zip(variables, binary)
+            ]
+            self.execute_sql = (
+                "SET " + ", ".join(assignments) + "; "
+                f"EXECUTE {self.handle} USING {', '.join(variables)}"
+            )
+        else:
+            self.execute_sql = f"EXECUTE {self.handle}"
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.prepares = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.ms = DDSketch()
+
+    def record(self, started, failed=False):
+        elapsed = (time.perf_counter() - started) * 1000
+        with self.lock:
+            self.calls += 1
+            if failed:
+                self.errors += 1
+            self.total_ms += elapsed
+            self.ms.add(elapsed)
+
+    def execute(self, cursor, params=()):
+        """
+        Run on a Django cursor, leaving it on the statement's result.
+        Connections from app.mysql_pool prepare it; any other connection
+        lives for one request, so it gets the plain SQL.
+        """
+        started = time.perf_counter()
+        try:
+            connection = cursor.db.connection
+            if not (settings.PREPARED_STATEMENTS and getattr(connection, "pool_initialized", False)):
+                cursor.execute(self.sql, params or None)
+            else:
+                try:
+                    self.execute_prepared(cursor, connection, params)
+                except Exception as e:
+                    if error_code(e) != UNKNOWN_STATEMENT:
+                        raise
+                    connection.prepared_statements.discard(self.name)
+                    self.execute_prepared(cursor, connection, params)
+        except Exception:
+            self.record(started, failed=True)
+            raise
+        self.record(started)
+
+    def execute_prepared(self, cursor, connection, params):
+        prepared = prepared_on(connection)
+        if self.name not in prepared:
+            cursor.execute(self.prepare_sql, self.prepare_params)
+            prepared.add(self.name)
+            with self.lock:
+                self.prepares += 1
+        # before the SET, a failed EXECUTE still leaves the values behind
+        variables_on(connection).update(self.variables)
+        cursor.execute(self.execute_sql, params or None)
+        if params:
+            # past the SET to the EXECUTE's result
+            cursor.nextset()
+
+    async def execute_async(self, cursor, params=()):
+        """execute on an aiomysql cursor, whose connections are always pooled"""
+        started = time.perf_counter()
+        try:
+            if not settings.PREPARED_STATEMENTS:
+                await cursor.execute(self.sql, params or None)
+            else:
+                try:
+                    await self.execute_prepared_async(cursor, params)
+                except Exception as e:
+                    if error_code(e) != UNKNOWN_STATEMENT:
+                        raise
+                    cursor.connection.prepared_statements.discard(self.name)
+                    await self.execute_prepared_async(cursor, params)
+        except Exception:
+            self.record(started, failed=True)
+            raise
+        self.record(started)
+
+    async def execute_prepared_async(self, cursor, params):
+        prepared = prepared_on(cursor.connection)
+        if self.name not in prepared:
+            await cursor.execute(self.prepare_sql, self.prepare_params)
+            prepared.add(self.name)
+            with self.lock:
+                self.prepares += 1
+        variables_on(cursor.connection).update(self.variables)
+        await cursor.execute(self.execute_sql, params or None)
+        if params:
+            await cursor.nextset()
+
+    def metrics(self):
+        with self.lock:
+            return {
+                "calls": self.calls,
+                "prepares": self.prepares,
+                "errors": self.errors,
+                "mean_ms": round(self.total_ms / self.calls, 3) if self.calls else None,
+                "p50_ms": round_ms(self.ms.quantile(0.5)),
+                "p99_ms": round_ms(self.ms.quantile(0.99)),
+            }
+
+
+_statements = {}
+_statements_lock = threading.Lock()
+
+
+def prepared(name, sql):
+    """Register a named statement, names are unique per process"""
+    with _statements_lock:
+        if name in _statements:
+            raise ValueError(f"Statement {name} is already registered")
+        statement = _statements[name] = Statement(name, sql)
+        return statement
+
+
+def statement_metrics():
+    """Call counts and timings of every registered statement, by name"""
+    with _statements_lock:
+        statements = dict(_statements)
+    return {name: statement.metrics() for name, statement in sorted(statements.items())}
+
+
+def prepared_on(connection):
+    # kept on the driver connection, which the pool keeps open between requests
+    try:
+        return connection.prepared_statements
+    except AttributeError:
+        connection.prepared_statements = set()
+        return connection.prepared_statements
+
+
+def variables_on(connection):
+    # parameter variables set on the connection since the pool last cleared them
+    try:
+        return connection.statement_variables
+    except AttributeError:
+        connection.statement_variables = set()
+        return connection.statement_variables
+
+
+def clear_variables_sql(connection):
+    """
+    SQL that clears the parameter values statements left in the session's
+    user variables, None when there are none. The pools run it when a
+    connection comes back, so the next checkout can't read them.
+    """
+    variables = getattr(connection, "statement_variables", None)
+    if not variables:
+        return None
+    connection.statement_variables = set()
+    return "SET " + ", ".join(f"{v} = NULL" for v in sorted(variables))
+
+
+def error_code(e):
+    return e.args[0] if e.args and isinstance(e.args[0], int) else None
+
+
+def round_ms(value):
+    return None if value is None else round(value, 3)
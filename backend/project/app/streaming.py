@@ -0,0 +1,103 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+from .rows import RecordJSONEncoder
+
+# rows serialized per chunk written to the socket
+CHUNK_ROWS = 500
+
+
+def json_stream(key, rows, extra=None):
+    """
+    Incrementally write {key: [rows...], "count": n, **extra} as bytes. The
+    opening bracket goes out before the first row is fetched. A failure half
+    way can no longer change the status code, so it closes the document with
+    an "error" key instead.
+    """
+    encoder = RecordJSONEncoder()
+    yield ("{" + json.dumps(key) + ":[").encode()
+
+    count = 0
+    parts = []
+    try:
+        for row in rows:
+            parts.append(encoder.encode(row))
+            count += 1
+            if len(parts) == CHUNK_ROWS:
+                yield chunk(parts, count).encode()
+                parts = []
+        if parts:
+            yield chunk(parts, count).encode()
+        tail = {"count": count, **(extra or {})}
+    except Exception as e:
+        if parts:
+            yield chunk(parts, count).encode()
+        tail = {"count": count, "error": str(e)}
+
+    yield ("]," + encoder.encode(tail)[1:]).encode()
+
+
+async def json_stream_async(key, rows, extra=None):
+    """json_stream over an async iterator of rows, e.g. from async_repo"""
+    encoder = RecordJSONEncoder()
+    yield ("{" + json.dumps(key) + ":[").encode()
+
+    count = 0
+    parts = []
+    try:
+        async for row in rows:
+            parts.append(encoder.encode(row))
+            count += 1
+            if len(parts) == CHUNK_ROWS:
+                yield chunk(parts, count).encode()
+                parts = []
+        if parts:
+            yield chunk(parts, count).encode()
+        tail = {"count": count, **(extra or {})}
+    except Exception as e:
+        if parts:
+            yield chunk(parts, count).encode()
+        tail = {"count": count, "error": str(e)}
+
+    yield ("]," + encoder.encode(tail)[1:]).encode()
+
+
+def chunk(parts, count):
+    # every chunk after the first continues the array
+    separator = "," if count > len(parts) else ""
+    return separator + ",".join(parts)
+
+
+def streaming_json_response(request, key, rows, extra=None):
+    """StreamingHttpResponse of json_stream that streams under WSGI and ASGI"""
+    chunks = json_stream(key, rows, extra)
+    if isinstance(request, ASGIRequest):
+        # Django would buffer a sync iterator in full under ASGI
+        chunks = iterate_in_thread(chunks)
+    return StreamingHttpResponse(chunks, content_type="application/json")
+
+
+async def iterate_in_thread(iterator):
+    """
+    Drive a sync iterator from async code, one chunk at a time, on the
+    request's sync thread, where its database connection lives
+    """
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    try:
+        while True:
+            part = await next_chunk(iterator, None)
+            if part is None:
+                break
+            yield part
+    finally:
+        await sync_to_async(iterator.close, thread_sensitive=True)()
+
+
+def async_streaming_json_response(key, rows, extra=None):
+    """streaming_json_response for async views, rows an async iterator"""
+    return StreamingHttpResponse(
+        json_stream_async(key, rows, extra), content_type="application/json"
+    )
@@ -1,3 +1,1342 @@
-from django.test import TestCase
+import contextvars
+import json
+import math
+import os
+import queue
+import random
+import threading
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from importlib.util import find_spec
+from unittest import skipUnless
+from unittest.mock import AsyncMock, MagicMock, patch
 
-# Create your tests here.
+from decimal import Decimal
+
+import bcrypt
+import jwt
+
+from django.http import JsonResponse as DjangoJsonResponse
+from asgiref.sync import async_to_sync
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from app import analytics, async_repo, async_views, repo
+from app.assignment import (
+    MAX_MATCH_ATTEMPTS,
+    AssignmentEngine,
+    PendingReport,
+    min_cost_assignment,
+)
+from app.db_pool import AsyncConnectionPool, ConnectionPool, PoolTimeout
+from app import views
+from app.auth import STAFF, auth_user
+from app.hasher import hash_password, needs_rehash
+from app.jwt_utils import decode_token, generate_access_token, generate_refresh_token
+from app.token_cache import TokenCache
+from app.location_buffer import LocationBuffer, check_position
+from app.repo import (
+    CANDIDATE_MAX_RADIUS_M,
+    candidate_radii,
+    ceil_hour,
+    decode_page_cursor,
+    encode_page_cursor,
+    enough_candidates,
+    feed_notifications_query,
+    feed_unread_query,
+    mark_seen_query,
+    notification_feed,
+    parse_sync_cursor,
+    rebuild_hourly_rollups,
+    record_resolution,
+    record_response_time,
+    removed_incident_ids_query,
+    removed_vehicle_ids_query,
+    search_box,
+    summarize_rollups,
+    sync_lower_bound,
+    vehicle_candidates_query,
+)
+from app import replicas
+from app.replicas import ReplicaSet, replica_lag
+from app.routing import EARTH_RADIUS_M, RoadNetwork, distance_m, ring_cells
+from app.rows import RecordJSONEncoder, map_row, map_rows
+from app.sketch import DDSketch
+from app.statements import Statement, clear_variables_sql
+from app.streaming import json_stream, json_stream_async
+from app import travel_matrix
+from app.travel_matrix import (
+    RELOAD_CHECK_SECONDS,
+    RETIRE_SECONDS,
+    MatrixGrid,
+    TravelTimeMatrix,
+    get_travel_matrix,
+    write_matrix,
+)
+from app.user_cache import UserCache
+
+
+class MinCostAssignmentTests(SimpleTestCase):
+    def test_prefers_lower_total_over_greedy(self):
+        # greedy would give row 0 its nearest column and push row 1 to 100
+        cost = [
+            [1, 2],
+            [3, 100],
+        ]
+        self.assertEqual(min_cost_assignment(cost), [(0, 1), (1, 0)])
+
+    def test_more_columns_than_rows(self):
+        cost = [[5, 1, 9]]
+        self.assertEqual(min_cost_assignment(cost), [(0, 1)])
+
+    def test_more_rows_than_columns(self):
+        cost = [[4], [2], [7]]
+        self.assertEqual(min_cost_assignment(cost), [(1, 0)])
+
+    def test_empty(self):
+        self.assertEqual(min_cost_assignment([]), [])
+
+
+class AssignmentEngineTests(SimpleTestCase):
+    # process() runs in a transaction with a savepoint per report
+    databases = {"default"}
+
+    def setUp(self):
+        # process() directly, without the batching thread
+        self.engine = AssignmentEngine.__new__(AssignmentEngine)
+        self.engine.pending = queue.Queue()
+        self.reports = [
+            PendingReport("POLICE", 31.20, 29.90, "HIGH"),
+            PendingReport("POLICE", 31.21, 29.91, "LOW"),
+        ]
+        self.vehicle = {"vehicle_id": 7, "lng": 29.91, "lat": 31.21}
+
+    def process(self, insert, candidates, router=None, lock=lambda ids: set(ids)):
+        with patch("app.assignment.insert_incident", side_effect=insert), patch(
+            "app.assignment.get_vehicle_candidates", return_value=candidates
+        ) as fetch, patch("app.assignment.get_router", return_value=router), patch(
+            "app.assignment.lock_available_vehicles", side_effect=lock
+        ), patch("app.assignment.assign_vehicles_batch"), patch(
+            "app.assignment.enqueue_incident_backlog"
+        ) as self.backlog, patch("app.assignment.notify_no_available_vehicle"), patch(
+            "app.assignment.get_dispatched_incidents",
+            side_effect=lambda ids: {i: {"incident_id": i} for i in ids},
+        ), patch("app.assignment.publish_incidents"), patch(
+            "app.assignment.publish_vehicles"
+        ):
+            self.engine.process(self.reports)
+        return fetch
+
+    def test_failed_insert_fails_only_its_report(self):
+        def insert(incident_type, lat, lng, severity):
+            if severity == "HIGH":
+                raise Exception("Failed to create incident: bad location")
+            return 11
+
+        self.process(insert, [self.vehicle])
+        with self.assertRaises(Exception):
+            self.reports[0].future.result(timeout=0)
+        self.assertEqual(self.reports[1].future.result(timeout=0), {"incident_id": 11})
+
+    def test_candidates_come_from_the_nearest_search(self):
+        ids = iter([11, 12])
+        fetch = self.process(lambda *args: next(ids), [self.vehicle])
+        self.assertEqual(
+            [c.args for c in fetch.call_args_list],
+            [("POLICE", 31.20, 29.90, 2), ("POLICE", 31.21, 29.91, 2)],
+        )
+        # one unit between two reports goes to the more severe one
+        self.assertEqual(self.reports[0].future.result(timeout=0), {"incident_id": 11})
+        with self.assertRaises(Exception):
+            self.reports[1].future.result(timeout=0)
+
+    def test_report_behind_locked_units_waits_for_the_next_tick(self):
+        self.reports = self.reports[:1]
+        inserts = iter([11])
+        self.process(lambda *args: next(inserts), [self.vehicle], lock=lambda ids: set())
+        self.assertFalse(self.reports[0].future.done())
+        self.backlog.assert_not_called()
+        self.assertIs(self.engine.pending.get_nowait(), self.reports[0])
+
+        # the retry matches the already inserted incident
+        self.process(lambda *args: next(inserts), [self.vehicle])
+        self.assertEqual(self.reports[0].future.result(timeout=0), {"incident_id": 11})
+
+    def test_report_is_backlogged_after_its_retries(self):
+        self.reports = self.reports[:1]
+        self.reports[0].incident_id = 11
+        self.reports[0].attempts = MAX_MATCH_ATTEMPTS
+        self.process(None, [self.vehicle], lock=lambda ids: set())
+        self.backlog.assert_called_once_with(11)
+        with self.assertRaises(Exception):
+            self.reports[0].future.result(timeout=0)
+        self.assertTrue(self.engine.pending.empty())
+
+    def test_unreachable_unit_falls_back_to_straight_line(self):
+        router = RoadNetwork()
+        router.add_way([(40.0, 10.0), (40.01, 10.0)], 50)
+        self.reports = self.reports[:1]
+        self.process(lambda *args: 11, [self.vehicle], router)
+        self.assertEqual(self.reports[0].future.result(timeout=0), {"incident_id": 11})
+
+
+@override_settings(DISPATCH_BATCH_WINDOW_MS=0)
+class IncidentEventTests(SimpleTestCase):
+    # handle_new_incident returns one dispatch row, the dashboards render the
+    # get_all_incidents shape
+    proc_row = {"incident_id": 11, "vehicle_id": 7, "station_zone": "Z1"}
+    summary = {
+        "incident_id": 11,
+        "lng": 29.9,
+        "lat": 31.2,
+        "status": "DISPATCHED",
+        "vehicle_ids": "7",
+        "station_zones": "Z1",
+        "response_time": 0,
+    }
+    listing_keys = {"vehicle_ids", "station_zones", "response_time"}
+
+    def test_created_event_carries_the_listing_row(self):
+        columns = tuple((key,) for key in self.summary)
+        with patch("app.repo.connection") as connection, patch(
+            "app.repo.get_router", return_value=None
+        ), patch(
+            "app.repo.fetch_call_result",
+            return_value=(tuple(self.proc_row.values()), tuple((k,) for k in self.proc_row)),
+        ), patch("app.repo.publish_incident") as publish, patch(
+            "app.repo.publish_vehicles"
+        ):
+            cursor = connection.cursor.return_value.__enter__.return_value
+            cursor.fetchall.return_value = [tuple(self.summary.values())]
+            cursor.description = columns
+            incident = repo.create_incident("FIRE", 31.2, 29.9, "HIGH")
+
+        self.assertEqual(incident, self.proc_row)
+        event, payload = publish.call_args.args
+        self.assertEqual(event, "incident.created")
+        self.assertLessEqual(self.listing_keys, set(payload))
+        sql, params = cursor.execute.call_args.args
+        self.assertIn("GROUP BY i.incident_id", sql)
+        self.assertEqual(params, [11])
+
+    def test_async_created_event_carries_the_listing_row(self):
+        send = AsyncMock()
+        with patch("app.async_repo.get_router", return_value=None), patch(
+            "app.async_repo.call_procedure", AsyncMock(return_value=self.proc_row)
+        ), patch(
+            "app.async_repo.fetch_all", AsyncMock(return_value=[self.summary])
+        ) as fetch, patch("app.async_repo.send_event_async", send), patch(
+            "app.async_repo.publish_vehicles", AsyncMock()
+        ):
+            incident = async_to_sync(async_repo.create_incident)("FIRE", 31.2, 29.9, "HIGH")
+
+        self.assertEqual(incident, self.proc_row)
+        event, payload = send.call_args.args[:2]
+        self.assertEqual(event, "incident.created")
+        self.assertLessEqual(self.listing_keys, set(payload))
+        self.assertEqual(fetch.call_args.args[1], [11])
+
+
+class RoadNetworkTests(SimpleTestCase):
+    def setUp(self):
+        # a - b - c along a 50 km/h road, plus a one-way shortcut a -> c
+        # at 10 km/h that is slower than going round
+        self.network = RoadNetwork()
+        self.network.add_way([(29.90, 31.20), (29.91, 31.20), (29.92, 31.20)], 50)
+        self.network.add_way([(29.90, 31.20), (29.92, 31.20)], 10, oneway=1)
+
+    def test_travel_time_follows_fastest_road(self):
+        seconds = self.network.travel_time(29.90, 31.20, 29.92, 31.20)
+        expected = distance_m(29.90, 31.20, 29.92, 31.20) / (50 / 3.6)
+        self.assertAlmostEqual(seconds, expected, delta=1)
+
+    def test_oneway_is_not_used_backwards(self):
+        network = RoadNetwork()
+        network.add_way([(29.90, 31.20), (29.92, 31.20)], 50, oneway=1)
+        self.assertIsNotNone(network.travel_time(29.90, 31.20, 29.92, 31.20))
+        self.assertIsNone(network.travel_time(29.92, 31.20, 29.90, 31.20))
+
+    def test_rank_vehicles_orders_by_eta(self):
+        vehicles = [
+            {"vehicle_id": 1, "lng": 29.90, "lat": 31.20},
+            {"vehicle_id": 2, "lng": 29.91, "lat": 31.20},
+        ]
+        ranked = self.network.rank_vehicles(29.92, 31.20, vehicles)
+        self.assertEqual([v["vehicle_id"] for v in ranked], [2, 1])
+        self.assertLess(ranked[0]["eta_seconds"], ranked[1]["eta_seconds"])
+
+    def test_ring_cells_walk_the_perimeter_only(self):
+        cells = list(ring_cells(0, 0, 2))
+        self.assertEqual(len(cells), len(set(cells)))
+        self.assertEqual(len(cells), 16)
+        self.assertTrue(all(max(abs(x), abs(y)) == 2 for x, y in cells))
+
+    def test_point_far_from_the_roads_does_not_snap(self):
+        node, offset = self.network.nearest_node(30.50, 31.20)
+        self.assertIsNone(node)
+        self.assertEqual(offset, float("inf"))
+        self.assertIsNone(self.network.travel_time(30.50, 31.20, 29.92, 31.20))
+        self.assertIsNotNone(self.network.nearest_node(29.905, 31.201)[0])
+
+
+class VehicleCandidateQueryTests(SimpleTestCase):
+    def test_bounded_search_uses_the_spatial_index(self):
+        sql, params = vehicle_candidates_query("POLICE", 31.2, 29.9, 5, 1000)
+        self.assertIn("MBRContains", sql)
+        self.assertIn("HAVING distance_m <= %s", sql)
+        self.assertEqual(params[-2:], [1000, 5])
+        self.assertTrue(params[2].startswith("POLYGON(("))
+
+    def test_last_resort_is_unbounded(self):
+        sql, params = vehicle_candidates_query("POLICE", 31.2, 29.9, 5)
+        self.assertNotIn("MBRContains", sql)
+        self.assertEqual(len(params), 3)
+        self.assertEqual(list(candidate_radii())[-1], None)
+
+    def test_search_widens_until_enough_candidates(self):
+        self.assertFalse(enough_candidates([{}], 5, 1000))
+        self.assertTrue(enough_candidates([{}] * 5, 5, 1000))
+        self.assertTrue(enough_candidates([{}], 5, CANDIDATE_MAX_RADIUS_M))
+        self.assertFalse(enough_candidates([], 5, CANDIDATE_MAX_RADIUS_M))
+        self.assertTrue(enough_candidates([], 5, None))
+
+    def test_search_box_covers_the_radius(self):
+        lat, lng, radius = 31.2, 29.9, 1000
+        box = search_box(lat, lng, radius)
+        corners = box[len("POLYGON(("):-2].split(", ")
+        min_lng, min_lat = map(float, corners[0].split())
+        max_lng, max_lat = map(float, corners[2].split())
+
+        def sphere_distance(point_lng, point_lat):
+            # ST_Distance_Sphere on SRID 4326 takes POINT(lng lat)'s first
+            # coordinate as the latitude
+            return distance_m(lat, lng, point_lat, point_lng)
+
+        # a unit just inside the circle on each axis, in both directions
+        lng_step = math.degrees(radius * 0.999 / EARTH_RADIUS_M)
+        lat_step = lng_step / math.cos(math.radians(lng))
+        for point_lng, point_lat in [
+            (lng + lng_step, lat),
+            (lng - lng_step, lat),
+            (lng, lat + lat_step),
+            (lng, lat - lat_step),
+        ]:
+            self.assertLessEqual(sphere_distance(point_lng, point_lat), radius)
+            self.assertTrue(min_lng <= point_lng <= max_lng)
+            self.assertTrue(min_lat <= point_lat <= max_lat)
+
+
+class TravelTimeMatrixTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "matrix.bin")
+        self.grid = MatrixGrid(1000, 29.90, 31.20, 29.92, 31.21)
+        cells = len(self.grid)
+        rows = [
+            [origin * 10 + target for target in range(cells)]
+            for origin in range(cells)
+        ]
+        rows.append([None] * cells)  # station 7 reaches nothing
+        write_matrix(self.path, self.grid, [7], rows)
+        self.matrix = TravelTimeMatrix(self.path)
+
+    def tearDown(self):
+        self.matrix.close()
+        self.dir.cleanup()
+
+    def test_lookup_between_cells(self):
+        origin = self.grid.cell(29.901, 31.201)
+        target = self.grid.cell(29.919, 31.209)
+        self.assertEqual(
+            self.matrix.travel_time(29.901, 31.201, 29.919, 31.209),
+            origin * 10 + target,
+        )
+
+    def test_unreachable_and_out_of_area(self):
+        self.assertIsNone(self.matrix.travel_time_from_station(7, 29.91, 31.205))
+        self.assertIsNone(self.matrix.travel_time(29.901, 31.201, 30.5, 31.5))
+
+    def test_reload_unmaps_the_old_matrix_later(self):
+        with override_settings(TRAVEL_MATRIX_PATH=self.path), patch.object(
+            travel_matrix, "_matrix", None
+        ), patch.object(travel_matrix, "_retired", []), patch(
+            "app.travel_matrix.time.monotonic", return_value=1000.0
+        ) as clock:
+            old = get_travel_matrix()
+            stat = os.stat(self.path)
+            os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+            clock.return_value += RELOAD_CHECK_SECONDS
+            current = get_travel_matrix()
+            self.assertIsNot(current, old)
+            # still mapped for requests that picked it up before the reload
+            self.assertFalse(old.mm.closed)
+
+            clock.return_value += RETIRE_SECONDS
+            self.assertIs(get_travel_matrix(), current)
+            self.assertTrue(old.mm.closed)
+            current.close()
+
+
+class LocationBufferTests(SimpleTestCase):
+    @patch("app.location_buffer.update_vehicle_locations_batch")
+    def test_keeps_latest_position_per_vehicle(self, mock_update):
+        # interval long enough that only the explicit flush runs
+        buffer = LocationBuffer(flush_ms=3_600_000)
+        buffer.submit(1, 31.20, 29.90)
+        buffer.submit(1, 31.21, 29.91)
+        buffer.submit(2, 31.22, 29.92)
+
+        self.assertEqual(buffer.flush(), 2)
+        mock_update.assert_called_once_with({1: (29.91, 31.21), 2: (29.92, 31.22)})
+        metrics = buffer.metrics()
+        self.assertEqual(metrics["coalescing_ratio"], 1.5)
+        self.assertEqual(metrics["pending"], 0)
+
+    @patch("app.location_buffer.update_vehicle_locations_batch")
+    def test_failed_flush_retries_row_by_row(self, mock_update):
+        # the bulk UPDATE fails, then only vehicle 2's row on its own
+        def update(positions):
+            if len(positions) > 1 or 2 in positions:
+                raise Exception("db error")
+
+        mock_update.side_effect = update
+        buffer = LocationBuffer(flush_ms=3_600_000)
+        buffer.submit(1, 31.20, 29.90)
+        buffer.submit(2, 31.21, 29.91)
+
+        with self.assertLogs("app.location_buffer", "ERROR"):
+            self.assertEqual(buffer.flush(), 1)
+        metrics = buffer.metrics()
+        self.assertEqual(metrics["pending"], 0)
+        self.assertEqual(metrics["failed_flushes"], 1)
+        self.assertEqual(metrics["dropped"], 1)
+        self.assertEqual(metrics["written"], 1)
+
+    def test_rejects_positions_off_the_globe(self):
+        for lat, lng in [(91, 0), (0, -180.5), (float("nan"), 0), ("inf", 0), (None, 0)]:
+            with self.assertRaises(ValueError):
+                check_position(lat, lng)
+        self.assertEqual(check_position("31.2", -180), (31.2, -180.0))
+
+
+class SyncCursorTests(SimpleTestCase):
+    def test_parse_rejects_malformed(self):
+        self.assertEqual(parse_sync_cursor("1700000000123456"), 1700000000123456)
+        for value in ("abc", "-5", ""):
+            with self.assertRaises(ValueError):
+                parse_sync_cursor(value)
+
+    @override_settings(SYNC_CURSOR_OVERLAP_MS=5000)
+    def test_lower_bound_reaches_back_by_overlap(self):
+        self.assertEqual(
+            sync_lower_bound(1700000000123456), Decimal("1699999995.123456")
+        )
+
+    @override_settings(SYNC_CURSOR_OVERLAP_MS=5000)
+    def test_lower_bound_never_negative(self):
+        self.assertEqual(sync_lower_bound(1000), 0)
+
+    @override_settings(SYNC_CURSOR_OVERLAP_MS=5000)
+    def test_removed_rows_are_the_changed_ones_outside_the_status(self):
+        sql, params = removed_incident_ids_query("REPORTED", 1700000000123456)
+        self.assertIn("i.status <> %s", sql)
+        self.assertEqual(params, ["REPORTED"] + [Decimal("1699999995.123456")] * 2)
+        sql, params = removed_vehicle_ids_query("AVAILABLE", 1700000000123456)
+        self.assertIn("status <> %s", sql)
+        self.assertEqual(params, ["AVAILABLE", Decimal("1699999995.123456")])
+
+
+class PageCursorTests(SimpleTestCase):
+    def test_round_trip(self):
+        values = [4, "2025-01-02 03:04:05", 917]
+        cursor = encode_page_cursor("priority", values)
+        self.assertEqual(decode_page_cursor(cursor, "priority", 3), values)
+
+    def test_rejects_other_sort_order(self):
+        cursor = encode_page_cursor("recent", ["2025-01-02 03:04:05", 917])
+        with self.assertRaises(ValueError):
+            decode_page_cursor(cursor, "priority", 3)
+
+    def test_rejects_garbage(self):
+        for cursor in ("not a cursor", encode_page_cursor("priority", [1])):
+            with self.assertRaises(ValueError):
+                decode_page_cursor(cursor, "priority", 3)
+
+
+class JsonStreamTests(SimpleTestCase):
+    def test_matches_buffered_document(self):
+        rows = [{"incident_id": i, "time_reported": datetime(2025, 1, 1)} for i in range(1201)]
+        body = b"".join(json_stream("incidents", iter(rows), {"cursor": "42"}))
+        document = json.loads(body)
+        self.assertEqual(document["count"], 1201)
+        self.assertEqual(document["cursor"], "42")
+        self.assertEqual(document["incidents"][1200]["incident_id"], 1200)
+        self.assertEqual(document["incidents"][0]["time_reported"], "2025-01-01T00:00:00")
+
+    def test_empty(self):
+        body = b"".join(json_stream("vehicles", iter([])))
+        self.assertEqual(json.loads(body), {"vehicles": [], "count": 0})
+
+    def test_first_byte_before_first_row(self):
+        def rows():
+            raise AssertionError("rows read too early")
+            yield
+
+        self.assertEqual(next(json_stream("incidents", rows())), b'{"incidents":[')
+
+    def test_failure_mid_stream_stays_valid_json(self):
+        def rows():
+            yield {"incident_id": 1}
+            raise Exception("connection lost")
+
+        document = json.loads(b"".join(json_stream("incidents", rows())))
+        self.assertEqual(document["incidents"], [{"incident_id": 1}])
+        self.assertEqual(document["error"], "connection lost")
+
+    def test_async_stream_matches_sync(self):
+        rows = [{"incident_id": i} for i in range(1201)]
+
+        async def arows():
+            for row in rows:
+                yield row
+
+        async def collect():
+            return b"".join([part async for part in json_stream_async("incidents", arows(), {"cursor": "42"})])
+
+        expected = b"".join(json_stream("incidents", iter(rows), {"cursor": "42"}))
+        self.assertEqual(async_to_sync(collect)(), expected)
+
+
+class RowRecordTests(SimpleTestCase):
+    description = (("vehicle_id",), ("status",), ("zone",))
+
+    def test_reads_like_a_dict(self):
+        vehicle = map_row((7, "AVAILABLE", None), self.description)
+        self.assertEqual(vehicle["vehicle_id"], 7)
+        self.assertEqual(vehicle.get("zone", "x"), None)
+        self.assertEqual(vehicle.get("missing", "x"), "x")
+        self.assertIn("status", vehicle)
+        self.assertEqual({**vehicle, "eta_seconds": 3}, {"vehicle_id": 7, "status": "AVAILABLE", "zone": None, "eta_seconds": 3})
+        self.assertEqual(vehicle, {"vehicle_id": 7, "status": "AVAILABLE", "zone": None})
+        with self.assertRaises(KeyError):
+            vehicle["missing"]
+
+    def test_one_class_per_result_shape(self):
+        first, second = map_rows([(1, "A", None), (2, "B", None)], self.description)
+        self.assertIs(type(first), type(second))
+        self.assertFalse(hasattr(first, "__dict__"))
+        self.assertIsNone(map_row(None, self.description))
+
+    def test_serializes_like_a_dict(self):
+        rows = map_rows([(1, "AVAILABLE", datetime(2025, 1, 1))], self.description)
+        self.assertEqual(
+            json.loads(RecordJSONEncoder().encode({"vehicles": rows})),
+            {"vehicles": [{"vehicle_id": 1, "status": "AVAILABLE", "zone": "2025-01-01T00:00:00"}]},
+        )
+
+
+@patch.multiple(
+    "app.analytics",
+    get_incident_type_summary=lambda: ([{"type": "FIRE", "resolved_count": 3}], {"average_response_time": 12}),
+    get_station_response_times=lambda: [
+        {"station_id": 1, "average_response_time": 300},
+        {"station_id": 2, "average_response_time": 120},
+    ],
+    get_responder_response_times=lambda: [],
+    get_vehicle_count_by_type=lambda: [{"station_type": "FIRE", "vehicle_count": 4}],
+)
+class AnalyticsSnapshotTests(SimpleTestCase):
+    # invalidation asks the connection whether a transaction is open
+    databases = {"default"}
+
+    def setUp(self):
+        analytics.cache.clear()
+
+    def test_builds_best_and_worst_from_one_scan(self):
+        snapshot = analytics.get_analytics_snapshot()
+        self.assertEqual(snapshot["average_response_time"], 12)
+        self.assertEqual(snapshot["best_station"]["station_id"], 2)
+        self.assertEqual(snapshot["worst_station"]["station_id"], 1)
+        self.assertIsNone(snapshot["best_responder"])
+        self.assertEqual(snapshot["active_vehicles_type"][0]["vehicle_count"], 4)
+
+    def test_served_from_cache_until_invalidated(self):
+        with patch("app.analytics.build_snapshot", wraps=analytics.build_snapshot) as build:
+            analytics.get_analytics_snapshot()
+            analytics.get_analytics_snapshot()
+            self.assertEqual(build.call_count, 1)
+
+            # outside a transaction on_commit runs right away
+            analytics.invalidate_analytics()
+            analytics.get_analytics_snapshot()
+            self.assertEqual(build.call_count, 2)
+
+
+class RollupSummaryTests(SimpleTestCase):
+    def test_totals_combine_buckets(self):
+        rows = [
+            (datetime(2025, 1, 1), "FIRE", Decimal(3), Decimal(2), Decimal(900), 300, 600),
+            (datetime(2025, 1, 2), "FIRE", Decimal(1), Decimal(1), Decimal(120), 120, 120),
+            (datetime(2025, 1, 2), "MEDICAL", Decimal(1), Decimal(0), Decimal(0), None, None),
+        ]
+        buckets, totals = summarize_rollups(rows, "type")
+        self.assertEqual(buckets[0]["avg_response_time_seconds"], 450)
+        self.assertIsNone(buckets[2]["avg_response_time_seconds"])
+        fire, medical = totals
+        self.assertEqual(
+            fire,
+            {
+                "type": "FIRE",
+                "reported_count": 4,
+                "resolved_count": 3,
+                "avg_response_time_seconds": 340,
+                "min_response_time_seconds": 120,
+                "max_response_time_seconds": 600,
+            },
+        )
+        self.assertEqual(medical["reported_count"], 1)
+
+    def test_zones_have_no_reported_count(self):
+        rows = [(datetime(2025, 1, 1), "Smouha", None, Decimal(1), Decimal(60), 60, 60)]
+        buckets, totals = summarize_rollups(rows, "zone")
+        self.assertNotIn("reported_count", buckets[0])
+        self.assertEqual(totals[0]["zone"], "Smouha")
+
+    def test_partial_hour_rounds_up(self):
+        self.assertEqual(ceil_hour(datetime(2025, 1, 1, 10, 30)), datetime(2025, 1, 1, 11))
+        self.assertEqual(ceil_hour(datetime(2025, 1, 1, 10)), datetime(2025, 1, 1, 10))
+
+    def test_rebuild_runs_one_hour_at_a_time(self):
+        hours = [datetime(2025, 1, 1, 10), datetime(2025, 1, 1, 13)]
+        with patch("app.repo.rollup_hours", return_value=hours) as found, patch(
+            "app.repo.rebuild_rollup_hour"
+        ) as rebuild:
+            self.assertEqual(
+                rebuild_hourly_rollups(datetime(2025, 1, 1, 10, 30), datetime(2025, 1, 1, 14)), 2
+            )
+        found.assert_called_once_with(datetime(2025, 1, 1, 10, 30), datetime(2025, 1, 1, 14))
+        self.assertEqual([c.args[0] for c in rebuild.call_args_list], hours)
+
+
+class ResolutionBookkeepingTests(SimpleTestCase):
+    # record_response_time runs in a transaction
+    databases = {"default"}
+
+    def test_recorded_incident_is_not_sketched_again(self):
+        cursor = MagicMock(rowcount=0)
+        with patch("app.repo.connection") as connection:
+            connection.cursor.return_value.__enter__.return_value = cursor
+            record_response_time(7)
+        self.assertEqual(cursor.execute.call_count, 1)
+        self.assertIn("INSERT IGNORE INTO response_time_recorded", cursor.execute.call_args.args[0])
+
+    def test_failed_bookkeeping_does_not_fail_the_resolution(self):
+        with patch("app.analytics.invalidate_analytics"), patch(
+            "app.repo.record_response_time", side_effect=Exception("lock wait timeout")
+        ), self.assertLogs("app.repo", "ERROR"):
+            record_resolution(7)
+
+
+class DDSketchTests(SimpleTestCase):
+    def setUp(self):
+        rng = random.Random(7)
+        self.values = [rng.lognormvariate(6, 1) for _ in range(5000)]
+
+    def exact(self, q):
+        ordered = sorted(self.values)
+        return ordered[int(q * (len(ordered) - 1))]
+
+    def test_quantiles_within_relative_accuracy(self):
+        sketch = DDSketch()
+        for value in self.values:
+            sketch.add(value)
+        for q in (0.5, 0.9, 0.95, 0.99):
+            self.assertAlmostEqual(sketch.quantile(q) / self.exact(q), 1, delta=0.011)
+
+    def test_merged_hours_match_one_sketch(self):
+        whole, merged = DDSketch(), DDSketch()
+        for start in range(0, len(self.values), 500):
+            hour = DDSketch()
+            for value in self.values[start : start + 500]:
+                hour.add(value)
+                whole.add(value)
+            merged.merge(DDSketch.from_bytes(hour.to_bytes()))
+        self.assertEqual(merged.count, whole.count)
+        self.assertEqual(merged.quantile(0.95), whole.quantile(0.95))
+
+    def test_round_trip_is_compact(self):
+        sketch = DDSketch()
+        for value in self.values:
+            sketch.add(value)
+        sketch.add(0)
+        data = sketch.to_bytes()
+        self.assertLess(len(data), 1024)
+        restored = DDSketch.from_bytes(data)
+        self.assertEqual(restored.bins, sketch.bins)
+        self.assertEqual((restored.count, restored.min, restored.max), (sketch.count, 0, sketch.max))
+        self.assertEqual(restored.quantile(0), 0)
+
+    def test_empty(self):
+        self.assertIsNone(DDSketch.from_bytes(DDSketch().to_bytes()).quantile(0.5))
+
+
+class AuthRoleTests(SimpleTestCase):
+    def setUp(self):
+        @auth_user(roles=STAFF)
+        def staff_view(request):
+            return DjangoJsonResponse({"role": request.user_role})
+
+        self.view = staff_view
+
+    def call(self, role):
+        token = generate_access_token({"user_id": 3, "role": role})
+        request = RequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {token}")
+        return self.view(request)
+
+    @patch("app.repo.get_user_by_user_id")
+    def test_role_comes_from_the_token(self, get_user):
+        response = self.call("DISPATCHER")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), {"role": "DISPATCHER"})
+        get_user.assert_not_called()
+
+    def test_other_roles_are_rejected(self):
+        self.assertEqual(self.call("RESPONDER").status_code, 403)
+
+    def test_missing_token(self):
+        self.assertEqual(self.view(RequestFactory().get("/")).status_code, 400)
+
+    def test_refresh_token_is_not_an_access_token(self):
+        token = generate_refresh_token({"user_id": 3, "role": "DISPATCHER"})
+        request = RequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.assertEqual(self.view(request).status_code, 400)
+
+
+@patch("app.user_cache.get_user_by_user_id")
+class UserCacheTests(SimpleTestCase):
+    def test_serves_repeat_reads_from_memory(self, get_user):
+        get_user.side_effect = lambda user_id: {"user_id": user_id, "password": "h"}
+        cache = UserCache(size=10, ttl=60)
+        cache.get(1).pop("password")
+        self.assertEqual(cache.get(1)["password"], "h")
+        self.assertEqual(get_user.call_count, 1)
+
+        cache.invalidate(1)
+        cache.get(1)
+        self.assertEqual(get_user.call_count, 2)
+
+    def test_expires_and_stays_bounded(self, get_user):
+        get_user.side_effect = lambda user_id: {"user_id": user_id}
+        cache = UserCache(size=2, ttl=0)
+        cache.get(1)
+        cache.get(1)
+        self.assertEqual(get_user.call_count, 2)
+
+        cache.ttl = 60
+        for user_id in (1, 2, 3):
+            cache.get(user_id)
+        self.assertEqual(list(cache.users), [2, 3])
+
+    def test_load_racing_an_invalidation_is_not_kept(self, get_user):
+        cache = UserCache(size=10, ttl=60)
+
+        def load(user_id):
+            cache.invalidate(user_id)
+            return {"user_id": user_id, "role": "DISPATCHER"}
+
+        get_user.side_effect = load
+        cache.get(1)
+        self.assertNotIn(1, cache.users)
+
+    def test_load_racing_a_clear_is_not_kept(self, get_user):
+        cache = UserCache(size=10, ttl=60)
+
+        def load(user_id):
+            cache.clear()
+            return {"user_id": user_id, "role": "DISPATCHER"}
+
+        get_user.side_effect = load
+        cache.get(1)
+        self.assertNotIn(1, cache.users)
+
+
+class TokenCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = TokenCache(size=2)
+        patcher = patch("app.jwt_utils.get_token_cache", return_value=self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.token = generate_access_token({"user_id": 5, "role": "ADMIN"})
+
+    def test_verifies_once(self):
+        with patch("app.jwt_utils.jwt.decode", wraps=jwt.decode) as verify:
+            self.assertEqual(decode_token(self.token)["user_id"], 5)
+            self.assertEqual(decode_token(self.token)["user_role"], "ADMIN")
+            self.assertEqual(verify.call_count, 1)
+        self.assertEqual(self.cache.metrics()["hits"], 1)
+
+    def test_entry_ends_at_exp(self):
+        decode_token(self.token)
+        with patch("app.token_cache.time.time", return_value=time.time() + 3600):
+            self.assertIsNone(self.cache.get(self.token))
+        self.assertEqual(self.cache.metrics()["expired"], 1)
+
+    def test_tampered_token_is_still_rejected(self):
+        decode_token(self.token)
+        with self.assertRaises(jwt.InvalidSignatureError):
+            decode_token(self.token[:-2] + ("AA" if not self.token.endswith("AA") else "BB"))
+
+    def test_bounded(self):
+        for user_id in range(3):
+            decode_token(generate_access_token({"user_id": user_id, "role": "ADMIN"}))
+        self.assertEqual(self.cache.metrics()["size"], 2)
+
+
+@override_settings(PASSWORD_HASH_ROUNDS=5)
+class PasswordHashTests(SimpleTestCase):
+    def login(self, user):
+        request = RequestFactory().post(
+            "/login/",
+            json.dumps({"email": user["email"], "password": "secret"}),
+            content_type="application/json",
+        )
+        with patch("app.views.get_user_by_email", return_value=dict(user)), patch(
+            "app.views.update_user_password"
+        ) as update:
+            response = async_to_sync(views.login)(request)
+        return response, update
+
+    def test_needs_rehash_when_cost_changes(self):
+        self.assertFalse(needs_rehash(hash_password("secret")))
+        with override_settings(PASSWORD_HASH_ROUNDS=4):
+            self.assertFalse(needs_rehash(hash_password("secret")))
+        self.assertTrue(needs_rehash(bcrypt.hashpw(b"secret", bcrypt.gensalt(4)).decode()))
+
+    def test_login_rehashes_old_cost(self):
+        old = bcrypt.hashpw(b"secret", bcrypt.gensalt(4)).decode()
+        user = {"user_id": 9, "email": "a@b.c", "role": "DISPATCHER", "password": old}
+        response, update = self.login(user)
+        self.assertEqual(response.status_code, 200)
+        user_id, rehashed = update.call_args.args
+        self.assertEqual(user_id, 9)
+        self.assertFalse(needs_rehash(rehashed))
+        self.assertTrue(bcrypt.checkpw(b"secret", rehashed.encode()))
+
+    def test_login_keeps_current_hash(self):
+        user = {"user_id": 9, "email": "a@b.c", "role": "DISPATCHER", "password": hash_password("secret")}
+        response, update = self.login(user)
+        self.assertEqual(response.status_code, 200)
+        update.assert_not_called()
+
+    def test_async_view_behind_role_check(self):
+        @auth_user(roles=STAFF)
+        async def staff_view(request):
+            return DjangoJsonResponse({"user_id": request.user_id})
+
+        token = generate_access_token({"user_id": 3, "role": "RESPONDER"})
+        request = RequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.assertEqual(async_to_sync(staff_view)(request).status_code, 403)
+
+
+class AsyncViewTests(SimpleTestCase):
+    def post(self, body):
+        return RequestFactory().post("/", json.dumps(body), content_type="application/json")
+
+    def test_invalid_report_rejected_before_database(self):
+        with patch("app.async_repo.create_incident", new_callable=AsyncMock) as create:
+            response = async_to_sync(async_views.report_incident)(
+                self.post({"type": "FLOOD", "lat": 1, "lng": 2, "severity_level": "LOW"})
+            )
+        self.assertEqual(response.status_code, 400)
+        create.assert_not_awaited()
+
+    def test_report_awaits_async_repo(self):
+        incident = {"incident_id": 7, "vehicle_id": 3}
+        with patch("app.async_repo.create_incident", AsyncMock(return_value=incident)) as create:
+            response = async_to_sync(async_views.report_incident)(
+                self.post({"type": "fire", "lat": 1, "lng": 2, "severity_level": "high"})
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(json.loads(response.content)["incident"], incident)
+        self.assertEqual(create.await_args.kwargs["incident_type"], "FIRE")
+
+    @override_settings(DISPATCH_BATCH_WINDOW_MS=0)
+    def test_ranking_runs_off_the_event_loop(self):
+        threads = {}
+
+        def rank(router, lat, lng, candidates):
+            threads["rank"] = threading.get_ident()
+            return "4"
+
+        async def create():
+            threads["loop"] = threading.get_ident()
+            return await async_repo.create_incident("FIRE", 31.2, 29.9, "HIGH")
+
+        incident = {"incident_id": 9, "vehicle_id": 4, "lng": 29.9, "lat": 31.2}
+        with patch("app.async_repo.get_router", return_value=object()), patch(
+            "app.async_repo.fetch_all", AsyncMock(return_value=[{"vehicle_id": 4}] * 5)
+        ), patch("app.async_repo.rank_preferred_vehicles", side_effect=rank), patch(
+            "app.async_repo.call_procedure", AsyncMock(return_value=incident)
+        ) as call, patch("app.async_repo.publish_incidents", AsyncMock()), patch(
+            "app.async_repo.publish_vehicles", AsyncMock()
+        ):
+            self.assertEqual(async_to_sync(create)(), incident)
+        self.assertNotEqual(threads["rank"], threads["loop"])
+        self.assertEqual(call.await_args.args[1][-1], "4")
+
+    def test_location_off_the_globe_rejected(self):
+        with patch("app.async_repo.update_vehicle_location", new_callable=AsyncMock) as update:
+            response = async_to_sync(async_views.update_unit_location)(
+                self.post({"vehicle_id": 3, "lat": 95, "lng": 29.9})
+            )
+        self.assertEqual(response.status_code, 400)
+        update.assert_not_awaited()
+
+    def test_buffered_location_of_unknown_vehicle_rejected(self):
+        buffer = LocationBuffer(flush_ms=3_600_000)
+        with patch("app.async_views.get_location_buffer", return_value=buffer), patch(
+            "app.async_repo.vehicle_exists", AsyncMock(return_value=False)
+        ):
+            response = async_to_sync(async_views.update_unit_location)(
+                self.post({"vehicle_id": 999, "lat": 31.2, "lng": 29.9})
+            )
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(buffer.metrics()["received"], 0)
+
+    def test_listing_streams_async_rows(self):
+        async def rows(status, since):
+            yield {"vehicle_id": 1}
+
+        token = generate_access_token({"user_id": 3, "role": "DISPATCHER"})
+        request = RequestFactory().get("/", {"since": "10"}, HTTP_AUTHORIZATION=f"Bearer {token}")
+
+        async def call():
+            response = await async_views.list_vehicles(request)
+            return b"".join([part async for part in response])
+
+        with patch("app.async_repo.get_sync_cursor", AsyncMock(return_value="42")), patch(
+            "app.async_repo.get_deleted_vehicle_ids", AsyncMock(return_value=[5])
+        ), patch("app.async_repo.iter_all_vehicles", rows):
+            document = json.loads(async_to_sync(call)())
+        self.assertEqual(
+            document, {"vehicles": [{"vehicle_id": 1}], "count": 1, "cursor": "42", "deleted": [5]}
+        )
+
+    def test_filtered_delta_lists_rows_that_left_the_filter(self):
+        async def rows(status, since):
+            yield {"vehicle_id": 1, "status": "AVAILABLE"}
+
+        token = generate_access_token({"user_id": 3, "role": "DISPATCHER"})
+        request = RequestFactory().get(
+            "/", {"since": "10", "status": "available"}, HTTP_AUTHORIZATION=f"Bearer {token}"
+        )
+
+        async def call():
+            response = await async_views.list_vehicles(request)
+            return b"".join([part async for part in response])
+
+        removed = AsyncMock(return_value=[2])
+        with patch("app.async_repo.get_sync_cursor", AsyncMock(return_value="42")), patch(
+            "app.async_repo.get_deleted_vehicle_ids", AsyncMock(return_value=[])
+        ), patch("app.async_repo.get_removed_vehicle_ids", removed), patch(
+            "app.async_repo.iter_all_vehicles", rows
+        ):
+            document = json.loads(async_to_sync(call)())
+        self.assertEqual(document["removed"], [2])
+        removed.assert_awaited_once_with("AVAILABLE", 10)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.alive = True
+        self.closed = False
+
+
+class FakeMySQL:
+    """A server connection that counts rows the way its client_flag asks"""
+
+    def __init__(self, client_flag, locations):
+        from pymysql.constants import CLIENT
+
+        self.found_rows = bool(client_flag & CLIENT.FOUND_ROWS)
+        self.locations = locations
+
+    def cursor(self):
+        connection = self
+
+        class Cursor:
+            rowcount = 0
+
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            async def execute(self, sql, params=None):
+                location, vehicle_id = params
+                changed = connection.locations.get(vehicle_id) != location
+                found = vehicle_id in connection.locations
+                connection.locations[vehicle_id] = location
+                self.rowcount = int(found and (changed or connection.found_rows))
+
+        return Cursor()
+
+
+@skipUnless(find_spec("aiomysql") and find_spec("pymysql"), "aiomysql is not installed")
+@override_settings(PREPARED_STATEMENTS=False)
+class AsyncConnectionTests(SimpleTestCase):
+    def test_repeated_identical_ping_finds_the_vehicle(self):
+        locations = {3: None}
+
+        async def fake_connect(**options):
+            return FakeMySQL(options["client_flag"], locations)
+
+        class Pool:
+            @asynccontextmanager
+            async def connection(self):
+                yield await async_repo.connect()
+
+        vehicle = {"vehicle_id": 3, "lng": 29.9, "lat": 31.2}
+        with patch("aiomysql.connect", fake_connect), patch(
+            "app.async_repo.get_pool", return_value=Pool()
+        ), patch(
+            "app.async_repo.get_vehicle_by_id", AsyncMock(return_value=vehicle)
+        ), patch("app.async_repo.send_event_async", AsyncMock()):
+            for _ in range(2):
+                self.assertEqual(
+                    async_to_sync(async_repo.update_vehicle_location)(3, 31.2, 29.9), vehicle
+                )
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def pool(self, cls=ConnectionPool, **options):
+        def ping(connection):
+            if not connection.alive:
+                raise Exception("server has gone away")
+
+        def close(connection):
+            connection.closed = True
+
+        settings = {"size": 2, "timeout": 1, "max_lifetime": 60, "check_after": 60, **options}
+        if cls is AsyncConnectionPool:
+            async def connect():
+                return FakeConnection()
+
+            async def aping(connection):
+                ping(connection)
+
+            async def reset(connection):
+                pass
+
+            return cls(connect, aping, reset, close, **settings)
+        return cls(FakeConnection, ping, lambda connection: None, close, **settings)
+
+    def test_reuses_returned_connections(self):
+        pool = self.pool()
+        with pool.connection() as first:
+            pass
+        with pool.connection() as second:
+            self.assertIs(second, first)
+        metrics = pool.metrics()
+        self.assertEqual((metrics["opened"], metrics["acquired"], metrics["idle"]), (1, 2, 1))
+
+    def test_bounded_checkout_waits_then_times_out(self):
+        pool = self.pool(size=1, timeout=0.05)
+        held = pool.acquire()
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+
+        pool.timeout = 5
+        threading.Timer(0.05, pool.release, [held]).start()
+        self.assertIs(pool.acquire(), held)
+        metrics = pool.metrics()
+        self.assertEqual((metrics["timeouts"], metrics["waited"]), (1, 1))
+        self.assertGreater(metrics["wait_max_ms"], 40)
+
+    def test_recycles_old_and_dead_connections(self):
+        pool = self.pool(max_lifetime=0)
+        with pool.connection() as old:
+            pass
+        with pool.connection() as new:
+            self.assertIsNot(new, old)
+        self.assertTrue(old.closed)
+        self.assertEqual(pool.metrics()["recycled"], 2)
+
+        pool = self.pool(check_after=0)
+        with pool.connection() as dead:
+            dead.alive = False
+        with pool.connection() as replacement:
+            self.assertIsNot(replacement, dead)
+        self.assertEqual(pool.metrics()["failed_health_checks"], 1)
+
+    def test_interrupted_checkout_is_not_reused(self):
+        pool = self.pool()
+        with self.assertRaises(KeyboardInterrupt):
+            with pool.connection() as interrupted:
+                raise KeyboardInterrupt
+        self.assertTrue(interrupted.closed)
+        self.assertEqual(pool.metrics()["in_use"], 0)
+
+    def test_async_pool(self):
+        pool = self.pool(AsyncConnectionPool, size=1, timeout=0.05)
+
+        async def run():
+            async with pool.connection() as first:
+                with self.assertRaises(PoolTimeout):
+                    await pool.acquire()
+            async with pool.connection() as second:
+                return first, second
+
+        first, second = async_to_sync(run)()
+        self.assertIs(second, first)
+        self.assertEqual(pool.metrics()["timeouts"], 1)
+
+
+class FakeCursor:
+    def __init__(self, pooled):
+        self.db = type("Wrapper", (), {})()
+        self.db.connection = type("Connection", (), {"pool_initialized": pooled})()
+        self.executed = []
+        self.fail_with = None
+
+    def execute(self, sql, params=None):
+        if self.fail_with and sql.startswith("SET"):
+            error, self.fail_with = self.fail_with, None
+            raise error
+        self.executed.append((sql, params))
+
+    def nextset(self):
+        self.executed.append("nextset")
+
+
+class StatementTests(SimpleTestCase):
+    def statement(self):
+        return Statement("vehicle_by_id", "SELECT * FROM vehicle WHERE vehicle_id = %s AND status LIKE 'A%%'")
+
+    def test_pooled_connection_prepares_once(self):
+        statement = self.statement()
+        cursor = FakeCursor(pooled=True)
+        statement.execute(cursor, [7])
+        statement.execute(cursor, [8])
+        self.assertEqual(
+            cursor.executed[0],
+            (
+                "PREPARE stmt_vehicle_by_id FROM %s",
+                ["SELECT * FROM vehicle WHERE vehicle_id = ? AND status LIKE 'A%'"],
+            ),
+        )
+        self.assertEqual(
+            cursor.executed[1:3],
+            [
+                (
+                    "SET @stmt_vehicle_by_id_0 = %s; "
+                    "EXECUTE stmt_vehicle_by_id USING @stmt_vehicle_by_id_0",
+                    [7],
+                ),
+                "nextset",
+            ],
+        )
+        self.assertEqual(len(cursor.executed), 5)
+        metrics = statement.metrics()
+        self.assertEqual((metrics["calls"], metrics["prepares"], metrics["errors"]), (2, 1, 0))
+
+    def test_unpooled_connection_gets_plain_sql(self):
+        statement = self.statement()
+        cursor = FakeCursor(pooled=False)
+        statement.execute(cursor, [7])
+        self.assertEqual(cursor.executed, [(statement.sql, [7])])
+
+        cursor = FakeCursor(pooled=True)
+        with override_settings(PREPARED_STATEMENTS=False):
+            statement.execute(cursor, [7])
+        self.assertEqual(cursor.executed, [(statement.sql, [7])])
+
+    def test_reprepares_a_lost_statement(self):
+        statement = self.statement()
+        cursor = FakeCursor(pooled=True)
+        statement.execute(cursor, [7])
+        cursor.fail_with = Exception(1243, "Unknown prepared statement handler")
+        statement.execute(cursor, [8])
+        prepares = [
+            entry for entry in cursor.executed
+            if entry != "nextset" and entry[0].startswith("PREPARE")
+        ]
+        self.assertEqual(len(prepares), 2)
+        self.assertEqual(statement.metrics()["errors"], 0)
+
+        cursor.fail_with = Exception(1146, "Table doesn't exist")
+        with self.assertRaises(Exception):
+            statement.execute(cursor, [9])
+        self.assertEqual(statement.metrics()["errors"], 1)
+
+    def test_pool_clears_parameter_variables_on_release(self):
+        statement = self.statement()
+        cursor = MagicMock()
+        cursor.execute = AsyncMock()
+        cursor.nextset = AsyncMock()
+        cursor.connection.get_autocommit.return_value = True
+        cursor.connection.cursor.return_value.__aenter__.return_value = cursor
+        del cursor.connection.prepared_statements
+        del cursor.connection.statement_variables
+        async_to_sync(statement.execute_async)(cursor, [7])
+
+        async_to_sync(async_repo.reset_connection)(cursor.connection)
+        cursor.execute.assert_awaited_with("SET @stmt_vehicle_by_id_0 = NULL")
+        # nothing set since, nothing to clear
+        self.assertIsNone(clear_variables_sql(cursor.connection))
+
+    def test_binary_parameter_keeps_its_introducer(self):
+        statement = Statement(
+            "vehicle_location", "UPDATE vehicle SET location = _binary %s WHERE vehicle_id = %s"
+        )
+        self.assertEqual(
+            statement.prepare_params, ["UPDATE vehicle SET location = ? WHERE vehicle_id = ?"]
+        )
+        self.assertTrue(
+            statement.execute_sql.startswith(
+                "SET @stmt_vehicle_location_0 = _binary %s, @stmt_vehicle_location_1 = %s;"
+            )
+        )
+
+
+class ReplicaSetTests(SimpleTestCase):
+    def test_reads_spread_over_fresh_replicas(self):
+        replica_set = ReplicaSet(["replica_0", "replica_1"], max_lag=2, check_interval=1)
+        self.assertEqual(replica_set.choose(), "default")
+
+        replica_set.record("replica_0", 0)
+        replica_set.record("replica_1", 1)
+        self.assertEqual(
+            {replica_set.choose() for _ in range(4)}, {"replica_0", "replica_1"}
+        )
+
+        # too far behind, or not replicating at all
+        replica_set.record("replica_0", 5)
+        replica_set.record("replica_1", None)
+        self.assertEqual(replica_set.choose(), "default")
+        self.assertEqual(replica_set.choose(pinned=True), "default")
+
+        metrics = replica_set.metrics()
+        self.assertEqual(metrics["reads"]["default"], 3)
+        self.assertEqual((metrics["pinned"], metrics["stale"]), (1, 2))
+
+    def test_lag_checks_are_claimed_once_per_interval(self):
+        replica_set = ReplicaSet(["replica_0"], max_lag=2, check_interval=1)
+        self.assertEqual(replica_set.due(now=10), ["replica_0"])
+        self.assertEqual(replica_set.due(now=10.5), [])
+        self.assertEqual(replica_set.due(now=11), ["replica_0"])
+
+    def test_lag_from_replica_status(self):
+        running = {"Replica_IO_Running": "Yes", "Replica_SQL_Running": "Yes"}
+        self.assertEqual(replica_lag({**running, "Seconds_Behind_Source": 3}), 3)
+        self.assertIsNone(
+            replica_lag({**running, "Replica_SQL_Running": "No", "Seconds_Behind_Source": None})
+        )
+        self.assertIsNone(replica_lag(None))
+
+
+@override_settings(DB_REPLICAS=["replica_0"], DB_REPLICA_STICKY_SECONDS=5)
+class ReadYourWritesTests(SimpleTestCase):
+    def setUp(self):
+        replicas.cache.clear()
+
+    def session(self, method, user_id):
+        request = getattr(RequestFactory(), method)("/")
+        request.user_id = user_id
+        # a context of its own, like every request
+        context = contextvars.copy_context()
+        context.run(replicas.start_session, request)
+        return context.run(replicas.current_session)
+
+    def test_writer_reads_from_primary_until_sticky_window_ends(self):
+        self.assertFalse(replicas.pinned(self.session("get", 3)))
+
+        self.assertTrue(replicas.pinned(self.session("post", 3)))
+        # a later request, possibly on another worker
+        self.assertTrue(replicas.pinned(self.session("get", 3)))
+        self.assertFalse(replicas.pinned(self.session("get", 4)))
+
+        replicas.cache.delete(replicas.written_key(3))
+        self.assertFalse(replicas.pinned(self.session("get", 3)))
+
+    def test_reads_outside_a_request_are_not_pinned(self):
+        self.assertFalse(replicas.pinned((None, False)))
+
+    @override_settings(DB_REPLICAS=["replica_0"])
+    def test_session_ends_with_the_request(self):
+        @auth_user
+        def view(request):
+            return DjangoJsonResponse({"session": list(replicas.current_session())})
+
+        token = generate_access_token({"user_id": 3, "role": "ADMIN"})
+        response = view(RequestFactory().post("/", HTTP_AUTHORIZATION=f"Bearer {token}"))
+        self.assertEqual(json.loads(response.content), {"session": [3, True]})
+        # the next request on this thread starts clean
+        self.assertEqual(replicas.current_session(), (None, False))
+
+    def test_snapshot_queries_read_from_the_primary(self):
+        seen = []
+        with patch("app.analytics.close_old_connections"), patch("app.analytics.connections"):
+            analytics.on_own_connection(lambda: seen.append(replicas.current_session()))
+        self.assertTrue(replicas.pinned(seen[0]))
+        self.assertEqual(replicas.current_session(), (None, False))
+
+    def test_async_session_matches_sync(self):
+        request = RequestFactory().patch("/")
+        request.user_id = 5
+
+        async def call():
+            session = await replicas.start_session_async(request)
+            try:
+                return await replicas.pinned_async(replicas.current_session())
+            finally:
+                replicas.end_session(session)
+
+        self.assertTrue(async_to_sync(call)())
+        self.assertTrue(replicas.pinned((5, False)))
+
+
+class NotificationTests(SimpleTestCase):
+    def test_roles_read_their_feed_past_the_watermark(self):
+        self.assertEqual(notification_feed("DISPATCHER"), "DISPATCHER")
+        self.assertEqual(notification_feed("ADMIN"), "ADMIN")
+        self.assertIsNone(notification_feed("RESPONDER"))
+
+        sql, params = feed_notifications_query("DISPATCHER", 16, 50)
+        self.assertIn("FROM user_notification", sql)
+        self.assertIn("audience = 'DISPATCHER'", sql)
+        self.assertEqual(params, [16, 50])
+
+        sql, params = feed_unread_query("ADMIN", 3)
+        self.assertEqual(
+            sql, "SELECT COUNT(*) FROM admin_notification WHERE admin_notification_id > %s"
+        )
+        self.assertEqual(params, [3])
+
+    def test_marking_seen_only_moves_the_watermark_forward(self):
+        sql, params = mark_seen_query(4, "DISPATCHER", 20)
+        self.assertIn("INSERT INTO notification_watermark", sql)
+        self.assertIn("GREATEST(notification_watermark.last_seen_id", sql)
+        self.assertIn("LEAST(%s, COALESCE(MAX(user_notification_id), 0))", sql)
+        self.assertEqual(params, [4, "DISPATCHER", 20])
+
+        sql, params = mark_seen_query(9, "RESPONDER", 21)
+        self.assertIn("UPDATE user_notification_status", sql)
+        self.assertEqual(params, [9, 21])
+
+    def test_listing_uses_the_token_role(self):
+        token = generate_access_token({"user_id": 4, "role": "DISPATCHER"})
+        request = RequestFactory().get(
+            "/", {"limit": "500"}, HTTP_AUTHORIZATION=f"Bearer {token}"
+        )
+        notifications = [{"notification_id": 17, "seen": 0}]
+        with patch("app.views.get_notifications", return_value=(notifications, 4)) as get:
+            response = views.list_notifications(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            json.loads(response.content), {"notifications": notifications, "unread": 4}
+        )
+        get.assert_called_once_with(4, "DISPATCHER", 200)
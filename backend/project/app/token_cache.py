@@ -0,0 +1,80 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+class TokenCache:
+    """
+    Bounded LRU of bearer tokens that already passed signature and claim
+    checks, keyed by their SHA-256 digest so the tokens themselves are not
+    kept. An entry is only served until the token's exp.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.lock = threading.Lock()
+        self.payloads = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    def get(self, token):
+        key = digest(token)
+        with self.lock:
+            payload = self.payloads.get(key)
+            if payload is None:
+                self.misses += 1
+                return None
+            if payload["exp"] <= time.time():
+                # decoding again raises ExpiredSignatureError as before
+                del self.payloads[key]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self.payloads.move_to_end(key)
+            self.hits += 1
+            return dict(payload)
+
+    def put(self, token, payload):
+        if "exp" not in payload:
+            return
+        key = digest(token)
+        with self.lock:
+            self.payloads[key] = dict(payload)
+            self.payloads.move_to_end(key)
+            while len(self.payloads) > self.size:
+                self.payloads.popitem(last=False)
+
+    def metrics(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.payloads),
+                "max_size": self.size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+            }
+
+
+def digest(token):
+    return hashlib.sha256(token.encode()).digest()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_token_cache():
+    """The process-wide cache, or None when TOKEN_CACHE_SIZE is 0"""
+    global _cache
+    if settings.TOKEN_CACHE_SIZE <= 0:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = TokenCache(settings.TOKEN_CACHE_SIZE)
+        return _cache
@@ -0,0 +1,219 @@
+import math
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+
+from django.conf import settings
+
+MAGIC = b"EDTM"
+FORMAT_VERSION = 1
+
+# magic, format version, build version, cell size in meters,
+# min_lng, min_lat, max_lng, max_lat, columns, rows, stations
+HEADER = struct.Struct("<4sHQd4dIII")
+
+UNREACHABLE = 0xFFFF
+MAX_SECONDS = UNREACHABLE - 1
+
+# how often workers look for a rebuilt file
+RELOAD_CHECK_SECONDS = 5
+# how long a replaced mapping stays open for requests still ranking with it
+RETIRE_SECONDS = 60
+
+
+class MatrixGrid:
+    """Square cells of cell_m meters over a lng/lat bounding box"""
+
+    def __init__(self, cell_m, min_lng, min_lat, max_lng, max_lat):
+        self.cell_m = cell_m
+        self.min_lng, self.min_lat = min_lng, min_lat
+        self.max_lng, self.max_lat = max_lng, max_lat
+        mid_lat = math.radians((min_lat + max_lat) / 2)
+        self.lat_step = cell_m / 111320
+        self.lng_step = cell_m / (111320 * max(math.cos(mid_lat), 0.01))
+        self.columns = max(1, math.ceil((max_lng - min_lng) / self.lng_step))
+        self.rows = max(1, math.ceil((max_lat - min_lat) / self.lat_step))
+
+    def __len__(self):
+        return self.columns * self.rows
+
+    def cell(self, lng, lat):
+        """Cell index of a point, None outside the grid"""
+        x = int((lng - self.min_lng) // self.lng_step)
+        y = int((lat - self.min_lat) // self.lat_step)
+        if 0 <= x < self.columns and 0 <= y < self.rows:
+            return y * self.columns + x
+        return None
+
+    def center(self, cell):
+        y, x = divmod(cell, self.columns)
+        return (
+            self.min_lng + (x + 0.5) * self.lng_step,
+            self.min_lat + (y + 0.5) * self.lat_step,
+        )
+
+
+def write_matrix(path, grid, station_ids, origin_rows):
+    """
+    Write a matrix file atomically. origin_rows yields one row of seconds
+    (None when unreachable) per grid cell, then one per station, in order.
+    Readers keep their old mapping until they notice the new file.
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(
+            HEADER.pack(
+                MAGIC,
+                FORMAT_VERSION,
+                int(time.time()),
+                grid.cell_m,
+                grid.min_lng,
+                grid.min_lat,
+                grid.max_lng,
+                grid.max_lat,
+                grid.columns,
+                grid.rows,
+                len(station_ids),
+            )
+        )
+        ids = array("i", station_ids)
+        if sys.byteorder == "big":
+            ids.byteswap()
+        f.write(ids.tobytes())
+
+        for row in origin_rows:
+            values = array(
+                "H",
+                (
+                    UNREACHABLE if s is None else min(int(round(s)), MAX_SECONDS)
+                    for s in row
+                ),
+            )
+            if sys.byteorder == "big":
+                values.byteswap()
+            f.write(values.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class TravelTimeMatrix:
+    """
+    Read-only, memory-mapped travel times in seconds from every grid cell and
+    station to every grid cell. Every worker maps the same file, so the pages
+    are shared through the OS page cache.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.stat = os.fstat(f.fileno())
+
+        (
+            magic,
+            format_version,
+            self.version,
+            cell_m,
+            min_lng,
+            min_lat,
+            max_lng,
+            max_lat,
+            columns,
+            rows,
+            stations,
+        ) = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            self.mm.close()
+            raise Exception(f"Unsupported travel matrix file: {path}")
+
+        self.grid = MatrixGrid(cell_m, min_lng, min_lat, max_lng, max_lat)
+        if (self.grid.columns, self.grid.rows) != (columns, rows):
+            self.mm.close()
+            raise Exception(f"Corrupt travel matrix header: {path}")
+
+        ids = struct.unpack_from(f"<{stations}i", self.mm, HEADER.size)
+        self.station_rows = {
+            station_id: len(self.grid) + i for i, station_id in enumerate(ids)
+        }
+        self.data_offset = HEADER.size + 4 * stations
+
+    def close(self):
+        self.mm.close()
+
+    def lookup(self, origin_row, to_lng, to_lat):
+        target = self.grid.cell(to_lng, to_lat)
+        if origin_row is None or target is None:
+            return None
+        offset = self.data_offset + 2 * (origin_row * len(self.grid) + target)
+        (seconds,) = struct.unpack_from("<H", self.mm, offset)
+        return None if seconds == UNREACHABLE else seconds
+
+    def travel_time(self, from_lng, from_lat, to_lng, to_lat):
+        return self.lookup(self.grid.cell(from_lng, from_lat), to_lng, to_lat)
+
+    def travel_time_from_station(self, station_id, to_lng, to_lat):
+        return self.lookup(self.station_rows.get(station_id), to_lng, to_lat)
+
+    def travel_times_to(self, to_lng, to_lat, sources):
+        return [self.travel_time(lng, lat, to_lng, to_lat) for lng, lat in sources]
+
+    def rank_vehicles(self, to_lng, to_lat, vehicles):
+        """Same contract as RoadNetwork.rank_vehicles, from matrix lookups"""
+        ranked = []
+        for vehicle in vehicles:
+            seconds = self.travel_time(vehicle["lng"], vehicle["lat"], to_lng, to_lat)
+            if seconds is not None:
+                ranked.append({**vehicle, "eta_seconds": float(seconds)})
+        ranked.sort(key=lambda v: v["eta_seconds"])
+        return ranked
+
+
+_matrix = None
+_checked_at = 0.0
+_matrix_lock = threading.Lock()
+# replaced matrices and when they were replaced
+_retired = []
+
+
+def get_travel_matrix():
+    """
+    The current matrix, or None when TRAVEL_MATRIX_PATH is not set or not
+    built yet. Picks up a rebuilt file without a restart.
+    """
+    global _matrix, _checked_at
+    path = settings.TRAVEL_MATRIX_PATH
+    if not path:
+        return None
+
+    now = time.monotonic()
+    if _matrix is not None and now - _checked_at < RELOAD_CHECK_SECONDS:
+        return _matrix
+
+    with _matrix_lock:
+        _checked_at = now
+        close_retired(now)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return _matrix
+        if _matrix is None or (stat.st_ino, stat.st_mtime_ns) != (
+            _matrix.stat.st_ino,
+            _matrix.stat.st_mtime_ns,
+        ):
+            # the old mapping stays valid for requests still holding it and
+            # is unmapped on a later check
+            if _matrix is not None:
+                _retired.append((now, _matrix))
+            _matrix = TravelTimeMatrix(path)
+        return _matrix
+
+
+def close_retired(now):
+    """Unmap matrices replaced more than RETIRE_SECONDS ago, under _matrix_lock"""
+    while _retired and now - _retired[0][0] >= RETIRE_SECONDS:
+        _retired.pop(0)[1].close()
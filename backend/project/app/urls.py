@@ -1,6 +1,10 @@
 # app/urls.py
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+# the hot endpoints run on the async repository when ASYNC_DB is set
+hot = async_views if settings.ASYNC_DB else views
 
 urlpatterns = [
     path('', views.hello_world, name='home'),  # example homepage
@@ -11,19 +15,22 @@ urlpatterns = [
     path('refresh-token/', views.refresh_token),
 
      # Reporter APIs (Public)
-    path('incidents/report/', views.report_incident, name='report_incident'),
+    path('incidents/report/', hot.report_incident, name='report_incident'),
     
     # Responder APIs
-    path('vehicles/location/', views.update_unit_location, name='update_vehicle_location'),
-    path('incidents/resolve/', views.resolve_incident_endpoint, name='resolve_incident'),
+    path('vehicles/location/', hot.update_unit_location, name='update_vehicle_location'),
+    path('incidents/resolve/', hot.resolve_incident_endpoint, name='resolve_incident'),
     
     # Admin/Dispatcher - Incident Management
-    path('admin/incidents/', views.list_incidents, name='list_incidents'),
+    path('admin/incidents/', hot.list_incidents, name='list_incidents'),
+    path('admin/incidents/search/', views.search_incidents_endpoint, name='search_incidents'),
+    path('admin/incidents/backlog/', views.list_incident_backlog, name='list_incident_backlog'),
     path('admin/incidents/dispatch/', views.dispatch_incident, name='dispatch_incident'),
+    path('admin/incidents/candidates/', views.list_incident_candidates, name='list_incident_candidates'),
     path('admin/incidents/dispatches/get-dispatch', views.get_incident_dispatches, name='get_incident_dispatches'),
     
     # Admin/Dispatcher - Vehicle Management
-    path('admin/vehicles/', views.list_vehicles, name='list_vehicles'),
+    path('admin/vehicles/', hot.list_vehicles, name='list_vehicles'),
     path('admin/vehicles/create/', views.create_vehicle_endpoint, name='create_vehicle'),
     path('admin/vehicles/delete/', views.delete_vehicle_endpoint, name='delete_vehicle'),
     
@@ -35,7 +42,16 @@ urlpatterns = [
     path('admin/users/', views.list_admins, name='list_admins'),
     path('admin/users/create/', views.create_admin_endpoint, name='create_admin'),
 
+    # Notifications, any signed-in user
+    path('notifications/', views.list_notifications, name='list_notifications'),
+    path('notifications/seen/', views.mark_notifications_seen_endpoint, name='mark_notifications_seen'),
+
     path('admin/analytics/', views.get_analytics, name='get_average_response_time'),
+    path('admin/analytics/range/', views.get_analytics_range, name='get_analytics_range'),
+    path('admin/analytics/percentiles/', views.get_response_percentiles_endpoint, name='get_response_percentiles'),
+    path('admin/metrics/locations/', views.location_buffer_metrics, name='location_buffer_metrics'),
+    path('admin/metrics/auth/', views.auth_cache_metrics, name='auth_cache_metrics'),
+    path('admin/metrics/db/', views.db_pool_metrics, name='db_pool_metrics'),
 
     path("accept-incident/", views.pendingToOnRoute, name="7amada"),
 
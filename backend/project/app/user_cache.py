@@ -0,0 +1,100 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+
+from .repo import get_user_by_user_id
+
+
+class UserCache:
+    """
+    Process-local LRU of user rows with a TTL. A password change drops
+    the entry here right away; other worker processes keep serving
+    their copy until it expires.
+    """
+
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.users = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # bumped by every invalidation, a load that raced one is not kept
+        self.generation = 0
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.users.get(user_id)
+            if entry is not None and entry[0] > now:
+                self.users.move_to_end(user_id)
+                self.hits += 1
+                return dict(entry[1])
+            self.misses += 1
+            generation = self.generation
+
+        # loaded outside the lock, two misses on one user both hit the database
+        user = get_user_by_user_id(user_id)
+        with self.lock:
+            if generation == self.generation:
+                self.users[user_id] = (now + self.ttl, user)
+                self.users.move_to_end(user_id)
+                while len(self.users) > self.size:
+                    self.users.popitem(last=False)
+        # callers may pop the password, the cached row stays whole
+        return dict(user)
+
+    def invalidate(self, user_id):
+        with self.lock:
+            self.users.pop(user_id, None)
+            self.generation += 1
+
+    def clear(self):
+        with self.lock:
+            self.users.clear()
+            self.generation += 1
+
+    def metrics(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.users),
+                "max_size": self.size,
+                "ttl_s": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_user_cache():
+    """The process-wide cache, or None when USER_CACHE_TTL is 0"""
+    global _cache
+    if settings.USER_CACHE_TTL <= 0:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = UserCache(settings.USER_CACHE_SIZE, settings.USER_CACHE_TTL)
+        return _cache
+
+
+def get_cached_user(user_id):
+    """get_user_by_user_id, served from the user cache when enabled"""
+    cache = get_user_cache()
+    if cache is None:
+        return get_user_by_user_id(user_id)
+    return cache.get(int(user_id))
+
+
+def invalidate_user(user_id):
+    """Drop a cached user once the current transaction commits"""
+    cache = get_user_cache()
+    if cache is not None:
+        transaction.on_commit(lambda: cache.invalidate(int(user_id)))
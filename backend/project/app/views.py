@@ -1,14 +1,27 @@
 from django.shortcuts import render
-from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.conf import settings
 from django.db import connection
-from .hasher import hash_password, check_password
+from datetime import datetime, timedelta
+from asgiref.sync import sync_to_async
+from .hasher import check_password_async, hash_password_async, needs_rehash
 from .jwt_utils import (
     generate_access_token,
     generate_refresh_token,
     refresh_access_token,
 )
-from .auth import auth_user
+from .auth import ADMIN_ONLY, STAFF, auth_user
+from .analytics import get_analytics_snapshot
+from .async_repo import pool_metrics as async_pool_metrics
+from .db_pool import pool_metrics
+from .replicas import replica_metrics
+from .statements import statement_metrics
+from .routing import get_router
+from .location_buffer import check_position, get_location_buffer
+from .rows import JsonResponse
+from .streaming import streaming_json_response
+from .token_cache import get_token_cache
+from .user_cache import get_cached_user, get_user_cache
 from .repo import *
 import json
 
@@ -94,7 +107,7 @@ def run_query(request):
 
 
 @csrf_exempt
-def login(request):
+async def login(request):
     err = check_request_method(request, "POST")
     if err:
         return JsonResponse({"message": str(err)})
@@ -104,14 +117,22 @@ def login(request):
     password = data.get("password")
     user = None
     try:
-        user = get_user_by_email(email)
+        user = await sync_to_async(get_user_by_email)(email)
     except Exception as e:
         return JsonResponse({"message": f"Invalid user + {str(e)}"}, status=400)
     print
     # password is not correct
-    if not check_password(password, user["password"]):
+    if not await check_password_async(password, user["password"]):
         return JsonResponse({"message": "Invalid password"}, status=400)
 
+    if needs_rehash(user["password"]):
+        try:
+            new_hashed_password = await hash_password_async(password)
+            await sync_to_async(update_user_password)(user["user_id"], new_hashed_password)
+        except Exception:
+            # the old hash still verifies, the next login tries again
+            pass
+
     access_token = generate_access_token(user)
     refresh_token = generate_refresh_token(user)
 
@@ -129,7 +150,7 @@ def login(request):
 
 @csrf_exempt
 @auth_user
-def check_old_password(request):
+async def check_old_password(request):
     err = check_request_method(request, "POST")
     if err:
         return JsonResponse({"message": str(err)})
@@ -139,11 +160,11 @@ def check_old_password(request):
     old_password = data.get("old_password")
     user = None
     try:
-        user = get_user_by_user_id(user_id)
+        user = await sync_to_async(get_cached_user)(user_id)
     except Exception as e:
         return JsonResponse({"message": f"Invalid user + {str(e)}"}, status=400)
 
-    if not check_password(old_password, user["password"]):
+    if not await check_password_async(old_password, user["password"]):
         return JsonResponse({"message": "Invalid old password"}, status=400)
 
     return JsonResponse({"message": "Old password is correct"}, status=200)
@@ -151,7 +172,7 @@ def check_old_password(request):
 
 @csrf_exempt
 @auth_user
-def change_password(request):
+async def change_password(request):
     err = check_request_method(request, "POST")
     if err:
         return JsonResponse({"message": str(err)})
@@ -159,10 +180,10 @@ def change_password(request):
     user_id = request.user_id
     data = json.loads(request.body)
     new_password = data.get("new_password")
-    new_hashed_password = hash_password(new_password)
+    new_hashed_password = await hash_password_async(new_password)
 
     try:
-        update_user_password(user_id, new_hashed_password)
+        await sync_to_async(update_user_password)(user_id, new_hashed_password)
     except Exception as e:
         return JsonResponse({"message": str(e)}, status=500)
     return JsonResponse({"message": "Password changed successfully"})
@@ -190,6 +211,75 @@ def check_request_method(request, method):
     return None
 
 
+def missing_field(data, fields):
+    """Error message for the first required field a request body lacks"""
+    for field in fields:
+        if field not in data:
+            return f"Missing required field: {field}"
+    return None
+
+
+def check_location_update(data):
+    """Error message when a location update is incomplete or off the globe"""
+    err = missing_field(data, ["vehicle_id", "lat", "lng"])
+    if err:
+        return err
+
+    try:
+        int(data["vehicle_id"])
+    except (TypeError, ValueError):
+        return "Invalid vehicle_id"
+
+    try:
+        check_position(data["lat"], data["lng"])
+    except ValueError as e:
+        return str(e)
+    return None
+
+
+def check_incident_report(data):
+    """Error message when an incident report is incomplete or invalid"""
+    err = missing_field(data, ["type", "lat", "lng", "severity_level"])
+    if err:
+        return err
+
+    # Validate type
+    valid_types = ["FIRE", "POLICE", "MEDICAL"]
+    if data["type"].upper() not in valid_types:
+        return "Invalid type. Must be FIRE, POLICE, or MEDICAL"
+
+    # Validate severity
+    valid_severity = ["LOW", "MEDIUM", "HIGH", "CRITICAL"]
+    if data["severity_level"].upper() not in valid_severity:
+        return "Invalid severity_level"
+    return None
+
+
+def parse_listing_filters(params):
+    """status and delta-sync cursor of a listing, ValueError for a bad cursor"""
+    status = params.get("status", None)
+    if status:
+        status = status.upper()
+
+    since = params.get("since", None)
+    if since is not None:
+        since = parse_sync_cursor(since)
+    return status, since
+
+
+def parse_time_range(params):
+    """from/to ISO datetimes of an analytics query, the last 24 hours by default"""
+    end = datetime.fromisoformat(params["to"]) if params.get("to") else datetime.now()
+    start = (
+        datetime.fromisoformat(params["from"])
+        if params.get("from")
+        else end - timedelta(days=1)
+    )
+    if start >= end:
+        raise ValueError("from must be before to")
+    return start, end
+
+
 @csrf_exempt
 def report_incident(request):
     """Reporter API: Report new incident (auto-assigns vehicle via stored procedure)"""
@@ -199,27 +289,9 @@ def report_incident(request):
 
     try:
         data = json.loads(request.body)
-
-        # Validate required fields
-        required_fields = ["type", "lat", "lng", "severity_level"]
-        for field in required_fields:
-            if field not in data:
-                return JsonResponse(
-                    {"message": f"Missing required field: {field}"}, status=400
-                )
-
-        # Validate type
-        valid_types = ["FIRE", "POLICE", "MEDICAL"]
-        if data["type"].upper() not in valid_types:
-            return JsonResponse(
-                {"message": "Invalid type. Must be FIRE, POLICE, or MEDICAL"},
-                status=400,
-            )
-
-        # Validate severity
-        valid_severity = ["LOW", "MEDIUM", "HIGH", "CRITICAL"]
-        if data["severity_level"].upper() not in valid_severity:
-            return JsonResponse({"message": "Invalid severity_level"}, status=400)
+        err = check_incident_report(data)
+        if err:
+            return JsonResponse({"message": err}, status=400)
 
         incident = create_incident(
             incident_type=data["type"].upper(),
@@ -253,17 +325,23 @@ def update_unit_location(request):
 
     try:
         data = json.loads(request.body)
+        err = check_location_update(data)
+        if err:
+            return JsonResponse({"message": err}, status=400)
+        lat, lng = check_position(data["lat"], data["lng"])
+
+        buffer = get_location_buffer()
+        if buffer is not None:
+            # the buffered write cannot report a missing row, so check first
+            if not vehicle_exists(data["vehicle_id"]):
+                return JsonResponse({"message": "Vehicle not found"}, status=404)
+            buffer.submit(data["vehicle_id"], lat, lng)
+            return JsonResponse(
+                {"message": "Location accepted", "vehicle_id": data["vehicle_id"]},
+                status=202,
+            )
 
-        required_fields = ["vehicle_id", "lat", "lng"]
-        for field in required_fields:
-            if field not in data:
-                return JsonResponse(
-                    {"message": f"Missing required field: {field}"}, status=400
-                )
-
-        vehicle = update_vehicle_location(
-            vehicle_id=data["vehicle_id"], lat=data["lat"], lng=data["lng"]
-        )
+        vehicle = update_vehicle_location(vehicle_id=data["vehicle_id"], lat=lat, lng=lng)
 
         return JsonResponse(
             {"message": "Location updated successfully", "vehicle": vehicle}, status=200
@@ -301,26 +379,94 @@ def resolve_incident_endpoint(request):
 
 
 @csrf_exempt
-@auth_user
+@auth_user(roles=STAFF)
 def list_incidents(request):
-    """Admin/Dispatcher API: List all incidents"""
+    """
+    Admin/Dispatcher API: List all incidents. Pass the returned cursor back
+    as ?since= to get only incidents changed in the meantime; with a status
+    filter too, "removed" lists the changed ones that left that status.
+    """
+    err = check_request_method(request, "GET")
+    if err:
+        return JsonResponse({"message": str(err)}, status=400)
+
+    try:
+        try:
+            status, since = parse_listing_filters(request.GET)
+        except ValueError:
+            return JsonResponse({"message": "Invalid cursor"}, status=400)
+
+        cursor = get_sync_cursor()
+        extra = {"cursor": cursor}
+        if since is not None and status:
+            extra["removed"] = get_removed_incident_ids(status, since)
+
+        # the full history can be large, rows are written as they are read
+        return streaming_json_response(
+            request, "incidents", iter_all_incidents(status, since), extra
+        )
+
+    except Exception as e:
+        return JsonResponse({"message": str(e)}, status=500)
+
+
+@csrf_exempt
+@auth_user(roles=STAFF)
+def search_incidents_endpoint(request):
+    """
+    Admin/Dispatcher API: Search incidents one page at a time.
+
+    Filters: type, status, severity, from/to (ISO time_reported range),
+    bbox=min_lng,min_lat,max_lng,max_lat. sort is priority (default) or
+    recent. Pass next_cursor back as cursor for the following page.
+    """
     err = check_request_method(request, "GET")
     if err:
         return JsonResponse({"message": str(err)}, status=400)
 
     try:
-        user = get_user_by_user_id(request.user_id)
-        if user["role"] not in ["ADMIN", "DISPATCHER"]:
-            return JsonResponse({"message": "Unauthorized"}, status=403)
+        params = request.GET
+        filters = {}
+        for name, key in [
+            ("type", "incident_type"),
+            ("status", "status"),
+            ("severity", "severity"),
+        ]:
+            if params.get(name):
+                filters[key] = params[name].upper()
+
+        sort = params.get("sort", "priority")
+        if sort not in SEARCH_ORDERS:
+            return JsonResponse(
+                {"message": f"sort must be one of {', '.join(SEARCH_ORDERS)}"},
+                status=400,
+            )
 
-        status = request.GET.get("status", None)
-        if status:
-            status = status.upper()
+        try:
+            for name, key in [("from", "reported_from"), ("to", "reported_to")]:
+                if params.get(name):
+                    filters[key] = datetime.fromisoformat(params[name])
+            if params.get("bbox"):
+                filters["bbox"] = [float(v) for v in params["bbox"].split(",")]
+                if len(filters["bbox"]) != 4:
+                    raise ValueError()
+            limit = int(params.get("limit", 50))
+        except ValueError:
+            return JsonResponse(
+                {"message": "Invalid from, to, bbox or limit"}, status=400
+            )
+        limit = max(1, min(limit, 200))
 
-        incidents = get_all_incidents(status)
+        try:
+            incidents, next_cursor = search_incidents(
+                sort=sort, after=params.get("cursor") or None, limit=limit, **filters
+            )
+        except ValueError as e:
+            return JsonResponse({"message": str(e)}, status=400)
 
         return JsonResponse(
-            {"incidents": incidents, "count": len(incidents)}, status=200
+            {"incidents": incidents, "count": len(incidents), "next_cursor": next_cursor},
+            status=200,
         )
 
     except Exception as e:
@@ -328,7 +474,28 @@ def list_incidents(request):
 
 
 @csrf_exempt
-@auth_user
+@auth_user(roles=STAFF)
+def list_incident_backlog(request):
+    """Admin/Dispatcher API: List incidents waiting for a free vehicle"""
+    err = check_request_method(request, "GET")
+    if err:
+        return JsonResponse({"message": str(err)}, status=400)
+
+    try:
+        incident_type = request.GET.get("type", None)
+        if incident_type:
+            incident_type = incident_type.upper()
+
+        backlog = get_incident_backlog(incident_type)
+
+        return JsonResponse({"backlog": backlog, "count": len(backlog)}, status=200)
+
+    except Exception as e:
+        return JsonResponse({"message": str(e)}, status=500)
+
+
+@csrf_exempt
+@auth_user(roles=STAFF)
 def dispatch_incident(request):
     """Admin/Dispatcher API: Modify vehicle assignment for incident"""
     err = check_request_method(request, "POST")
@@ -336,10 +503,6 @@ def dispatch_incident(request):
         return JsonResponse({"message": str(err)}, status=400)
 
     try:
-        user = get_user_by_user_id(request.user_id)
-        if user["role"] not in ["ADMIN", "DISPATCHER"]:
-            return JsonResponse({"message": "Unauthorized"}, status=403)
-
         data = json.loads(request.body)
 
         required_fields = ["incident_id", "new_vehicle_id"]
@@ -366,7 +529,42 @@ def dispatch_incident(request):
 
 
 @csrf_exempt
-@auth_user
+@auth_user(roles=STAFF)
+def list_incident_candidates(request):
+    """Admin/Dispatcher API: Rank available vehicles for (re)assigning an incident"""
+    err = check_request_method(request, "GET")
+    if err:
+        return JsonResponse({"message": str(err)}, status=400)
+
+    try:
+        incident_id = request.GET.get("incident_id", None)
+        if incident_id is None:
+            return JsonResponse({"message": "Missing incident_id"}, status=400)
+
+        incident = get_incident_by_id(incident_id)
+        candidates = get_vehicle_candidates(
+            incident["type"],
+            incident["lat"],
+            incident["lng"],
+            int(request.GET.get("limit", settings.ROUTING_CANDIDATES)),
+        )
+
+        router = get_router()
+        if router is not None:
+            candidates = router.rank_vehicles(
+                incident["lng"], incident["lat"], candidates
+            )
+
+        return JsonResponse(
+            {"candidates": candidates, "count": len(candidates)}, status=200
+        )
+
+    except Exception as e:
+        return JsonResponse({"message": str(e)}, status=500)
+
+
+@csrf_exempt
+@auth_user(roles=STAFF)
 def get_incident_dispatches(request):
     """Get dispatch information for an incident"""
     err = check_request_method(request, "GET")
@@ -374,10 +572,6 @@ def get_incident_dispatches(request):
         return JsonResponse({"message": str(err)}, status=400)
 
     try:
-        user = get_user_by_user_id(request.user_id)
-        if user["role"] not in ["ADMIN", "DISPATCHER"]:
-            return JsonResponse({"message": "Unauthorized"}, status=403)
-
         data = json.loads(request.body)
         incident_id = data.get("incident_id", None)
 
@@ -393,32 +587,40 @@ def get_incident_dispatches(request):
 
 
 @csrf_exempt
-@auth_user
+@auth_user(roles=STAFF)
 def list_vehicles(request):
-    """Admin/Dispatcher API: List all vehicles"""
+    """
+    Admin/Dispatcher API: List all vehicles. With ?since= only vehicles
+    changed after that cursor, plus the ids deleted since then and, with a
+    status filter, the ids that left that status.
+    """
     err = check_request_method(request, "GET")
     if err:
         return JsonResponse({"message": str(err)}, status=400)
 
     try:
-        user = get_user_by_user_id(request.user_id)
-        if user["role"] not in ["ADMIN", "DISPATCHER"]:
-            return JsonResponse({"message": "Unauthorized"}, status=403)
-
-        status = request.GET.get("status", None)
-        if status:
-            status = status.upper()
-
-        vehicles = get_all_vehicles(status)
-
-        return JsonResponse({"vehicles": vehicles, "count": len(vehicles)}, status=200)
+        try:
+            status, since = parse_listing_filters(request.GET)
+        except ValueError:
+            return JsonResponse({"message": "Invalid cursor"}, status=400)
+
+        cursor = get_sync_cursor()
+        extra = {"cursor": cursor}
+        if since is not None:
+            extra["deleted"] = get_deleted_vehicle_ids(since)
+            if status:
+                extra["removed"] = get_removed_vehicle_ids(status, since)
+
+        return streaming_json_response(
+            request, "vehicles", iter_all_vehicles(status, since), extra
+        )
 
     except Exception as e:
         return JsonResponse({"message": str(e)}, status=500)
 
 
 @csrf_exempt
-@auth_user
+@auth_user(roles=ADMIN_ONLY)
 def create_vehicle_endpoint(request):
     """Admin API: Create new vehicle"""
     err = check_request_method(request, "POST")
@@ -426,10 +628,6 @@ def create_vehicle_endpoint(request):
         return JsonResponse({"message": str(err)}, status=400)
 
     try:
-        user = get_user_by_user_id(request.user_id)
-        if user["role"] != "ADMIN":
-            return JsonResponse({"message": "Unauthorized - Admin only"}, status=403)
-
         data = json.loads(request.body)
 
         required_fields = ["station_id", "capacity", "lat", "lng"]
@@ -455,7 +653,7 @@ def create_vehicle_endpoint(request):
 
 
 @csrf_exempt
-@auth_user
+@auth_user(roles=ADMIN_ONLY)
 def delete_vehicle_endpoint(request):
     """Admin API: Delete vehicle"""
     err = check_request_method(request, "DELETE")
@@ -463,9 +661,6 @@ def delete_vehicle_endpoint(request):
         return JsonResponse({"message": str(err)}, status=400)
 
     try:
-        user = get_user_by_user_id(request.user_id)
-        if user["role"] != "ADMIN":
-            return JsonResponse({"message": "Unauthorized - Admin only"}, status=403)
         data = json.loads(request.body)
 
         vehicle_id = data.get("vehicle_id", None)
@@ -484,7 +679,7 @@ def delete_vehicle_endpoint(request):
 
 
 @csrf_exempt
-@auth_user
+@auth_user(roles=STAFF)
 def list_stations(request):
     """Admin/Dispatcher API: List all stations"""
     err = check_request_method(request, "GET")
@@ -492,10 +687,6 @@ def list_stations(request):
         return JsonResponse({"message": str(err)}, status=400)
 
     try:
-        user = get_user_by_user_id(request.user_id)
-        if user["role"] not in ["ADMIN", "DISPATCHER"]:
-            return JsonResponse({"message": "Unauthorized"}, status=403)
-
         stations = get_all_stations()
 
         return JsonResponse({"stations": stations, "count": len(stations)}, status=200)
@@ -505,7 +696,7 @@ def list_stations(request):
 
 
 @csrf_exempt
-@auth_user
+@auth_user(roles=ADMIN_ONLY)
 def create_station_endpoint(request):
     """Admin API: Create new station"""
     err = check_request_method(request, "POST")
@@ -513,10 +704,6 @@ def create_station_endpoint(request):
         return JsonResponse({"message": str(err)}, status=400)
 
     try:
-        user = get_user_by_user_id(request.user_id)
-        if user["role"] != "ADMIN":
-            return JsonResponse({"message": "Unauthorized - Admin only"}, status=403)
-
         data = json.loads(request.body)
 
         required_fields = ["type", "zone", "lat", "lng"]
@@ -549,7 +736,7 @@ def create_station_endpoint(request):
 
 
 @csrf_exempt
-@auth_user
+@auth_user(roles=ADMIN_ONLY)
 def list_admins(request):
     """Admin API: List all admin/dispatcher users"""
     err = check_request_method(request, "GET")
@@ -557,10 +744,6 @@ def list_admins(request):
         return JsonResponse({"message": str(err)}, status=400)
 
     try:
-        user = get_user_by_user_id(request.user_id)
-        if user["role"] != "ADMIN":
-            return JsonResponse({"message": "Unauthorized - Admin only"}, status=403)
-
         admins = get_all_admin_users()
 
         return JsonResponse({"admins": admins, "count": len(admins)}, status=200)
@@ -570,18 +753,14 @@ def list_admins(request):
 
 
 @csrf_exempt
-@auth_user
-def create_admin_endpoint(request):
+@auth_user(roles=ADMIN_ONLY)
+async def create_admin_endpoint(request):
     """Admin API: Create new admin/dispatcher user"""
     err = check_request_method(request, "POST")
     if err:
         return JsonResponse({"message": str(err)}, status=400)
 
     try:
-        user = get_user_by_user_id(request.user_id)
-        if user["role"] != "ADMIN":
-            return JsonResponse({"message": "Unauthorized - Admin only"}, status=403)
-
         data = json.loads(request.body)
 
         required_fields = ["email", "password", "name"]
@@ -598,9 +777,9 @@ def create_admin_endpoint(request):
                 status=400,
             )
 
-        password_hash = hash_password(data["password"])
+        password_hash = await hash_password_async(data["password"])
 
-        admin = create_admin_user(
+        admin = await sync_to_async(create_admin_user)(
             email=data["email"],
             password_hash=password_hash,
             name=data["name"],
@@ -617,24 +796,140 @@ def create_admin_endpoint(request):
         return JsonResponse({"message": str(e)}, status=500)
 
 
+# ============= NOTIFICATIONS =============
+
+
+@csrf_exempt
+@auth_user
+def list_notifications(request):
+    """
+    Staff/Responder API: The caller's newest notifications and how many are
+    unread. ?limit= caps the list, 50 by default.
+    """
+    err = check_request_method(request, "GET")
+    if err:
+        return JsonResponse({"message": str(err)}, status=400)
+
+    try:
+        try:
+            limit = min(int(request.GET.get("limit", 50)), 200)
+        except ValueError:
+            return JsonResponse({"message": "Invalid limit"}, status=400)
+
+        notifications, unread = get_notifications(
+            request.user_id, request.user_role, limit
+        )
+        return JsonResponse(
+            {"notifications": notifications, "unread": unread}, status=200
+        )
+
+    except Exception as e:
+        return JsonResponse({"message": str(e)}, status=500)
+
+
+@csrf_exempt
+@auth_user
+def mark_notifications_seen_endpoint(request):
+    """Staff/Responder API: Mark notifications up to last_seen_id as seen"""
+    err = check_request_method(request, "POST")
+    if err:
+        return JsonResponse({"message": str(err)}, status=400)
+
+    try:
+        data = json.loads(request.body)
+        if "last_seen_id" not in data:
+            return JsonResponse({"message": "Missing last_seen_id"}, status=400)
+
+        mark_notifications_seen(
+            request.user_id, request.user_role, int(data["last_seen_id"])
+        )
+        return JsonResponse({"message": "Notifications marked as seen"}, status=200)
+
+    except Exception as e:
+        return JsonResponse({"message": str(e)}, status=500)
+
+
+@csrf_exempt
+@auth_user(roles=ADMIN_ONLY)
+def location_buffer_metrics(request):
+    """Admin API: Flush lag and coalescing of buffered GPS updates in this process"""
+    err = check_request_method(request, "GET")
+    if err:
+        return JsonResponse({"message": str(err)}, status=400)
+
+    try:
+        buffer = get_location_buffer()
+        if buffer is None:
+            return JsonResponse({"message": "Location buffering is disabled"}, status=404)
+
+        return JsonResponse({"metrics": buffer.metrics()}, status=200)
+
+    except Exception as e:
+        return JsonResponse({"message": str(e)}, status=500)
+
+
+@csrf_exempt
+@auth_user(roles=ADMIN_ONLY)
+def auth_cache_metrics(request):
+    """Admin API: Hit rates of the verified-token and user caches in this process"""
+    err = check_request_method(request, "GET")
+    if err:
+        return JsonResponse({"message": str(err)}, status=400)
+
+    try:
+        token_cache = get_token_cache()
+        user_cache = get_user_cache()
+        return JsonResponse(
+            {
+                "metrics": {
+                    "tokens": token_cache.metrics() if token_cache else None,
+                    "users": user_cache.metrics() if user_cache else None,
+                }
+            },
+            status=200,
+        )
+
+    except Exception as e:
+        return JsonResponse({"message": str(e)}, status=500)
+
+
+@csrf_exempt
+@auth_user(roles=ADMIN_ONLY)
+def db_pool_metrics(request):
+    """
+    Admin API: Size, checkout waits and recycling of the connection pools in
+    this process, calls and timings of its prepared statements, and the
+    lag and read counts of the replicas
+    """
+    err = check_request_method(request, "GET")
+    if err:
+        return JsonResponse({"message": str(err)}, status=400)
+
+    try:
+        return JsonResponse(
+            {
+                "metrics": {
+                    "sync": pool_metrics(),
+                    "async": async_pool_metrics(),
+                    "statements": statement_metrics(),
+                    "replicas": replica_metrics(),
+                }
+            },
+            status=200,
+        )
+
+    except Exception as e:
+        return JsonResponse({"message": str(e)}, status=500)
+
+
 def get_analytics(request):
-    """Get system analytics - placeholder"""
+    """Get system analytics, cached until an incident is resolved"""
     err = check_request_method(request, "GET")
     if err:
         return JsonResponse({"message": str(err)}, status=400)
 
     try:
-        # Placeholder analytics data
-        analytics = {}
-        analytics["average_response_time"] = get_average_response_time()
-        analytics["max_response_time"] = get_max_response_time()
-        analytics["min_response_time"] = get_min_response_time()
-        analytics["best_responder"] = get_best_responder()
-        analytics["worst_responder"] = get_worst_responder()
-        analytics["best_station"] = get_best_station()
-        analytics["worst_station"] = get_worst_station()
-        analytics["total_incidents_type"] = get_incidents_by_type_detailed()
-        analytics["active_vehicles_type"] = get_vehicle_count_by_type()
+        analytics = get_analytics_snapshot()
 
         return JsonResponse({"analytics": analytics}, status=200)
 
@@ -643,17 +938,102 @@ def get_analytics(request):
 
 
 @csrf_exempt
-@auth_user
+@auth_user(roles=ADMIN_ONLY)
+def get_analytics_range(request):
+    """
+    Admin API: Incident counts and response times over a time range, read
+    from the hourly rollups.
+
+    from/to are ISO datetimes (default: the last 24 hours), granularity is
+    hour (default), day, week or month, group_by is type (default), zone or
+    station, and type narrows to one incident type.
+    """
+    err = check_request_method(request, "GET")
+    if err:
+        return JsonResponse({"message": str(err)}, status=400)
+
+    try:
+        params = request.GET
+        try:
+            start, end = parse_time_range(params)
+        except ValueError:
+            return JsonResponse({"message": "Invalid from or to"}, status=400)
+
+        granularity = params.get("granularity", "hour")
+        group_by = params.get("group_by", "type")
+        incident_type = params["type"].upper() if params.get("type") else None
+        try:
+            buckets, totals = get_rollup_series(
+                start, end, granularity, group_by, incident_type
+            )
+        except ValueError as e:
+            return JsonResponse({"message": str(e)}, status=400)
+
+        return JsonResponse(
+            {
+                "from": start,
+                "to": end,
+                "granularity": granularity,
+                "group_by": group_by,
+                "buckets": buckets,
+                "totals": totals,
+            },
+            status=200,
+        )
+
+    except Exception as e:
+        return JsonResponse({"message": str(e)}, status=500)
+
+
+@csrf_exempt
+@auth_user(roles=ADMIN_ONLY)
+def get_response_percentiles_endpoint(request):
+    """
+    Admin API: p50/p90/p95/p99 response times over a time range, merged
+    from hourly sketches.
+
+    from/to are ISO datetimes (default: the last 24 hours), group_by is
+    type (default), zone, station or responder.
+    """
+    err = check_request_method(request, "GET")
+    if err:
+        return JsonResponse({"message": str(err)}, status=400)
+
+    try:
+        try:
+            start, end = parse_time_range(request.GET)
+        except ValueError:
+            return JsonResponse({"message": "Invalid from or to"}, status=400)
+
+        group_by = request.GET.get("group_by", "type")
+        try:
+            percentiles, overall = get_response_percentiles(start, end, group_by)
+        except ValueError as e:
+            return JsonResponse({"message": str(e)}, status=400)
+
+        return JsonResponse(
+            {
+                "from": start,
+                "to": end,
+                "group_by": group_by,
+                "percentiles": percentiles,
+                "overall": overall,
+            },
+            status=200,
+        )
+
+    except Exception as e:
+        return JsonResponse({"message": str(e)}, status=500)
+
+
+@csrf_exempt
+@auth_user(roles=("ADMIN", "RESPONDER"))
 def pendingToOnRoute(request):
     err = check_request_method(request, "POST")
     if err:
         return JsonResponse({"message": str(err)}, status=400)
 
     try:
-        user = get_user_by_user_id(request.user_id)
-        if user["role"] != "ADMIN" and user["role"] != "RESPONDER":
-            return JsonResponse({"message": "Unauthorized - Admin only"}, status=403)
-
         data = json.loads(request.body)
         if not data["vehicle_id"]:
             return JsonResponse({"message": "please entre incident_id"}, status=400)
@@ -666,20 +1046,16 @@ def pendingToOnRoute(request):
 
 
 @csrf_exempt
-@auth_user
+@auth_user(roles=ADMIN_ONLY)
 def ass_responder_to_vehicle(request):
     err = check_request_method(request, "POST")
     if err:
         return JsonResponse({"message": str(err)}, status=400)
 
     try:
-        user = get_user_by_user_id(request.user_id)
-        if user["role"] != "ADMIN":
-            return JsonResponse({"message": "Unauthorized - Admin only"}, status=403)
-
         data = json.loads(request.body)
         assign_responder_to_vehicle(data["responder_id"], data["vehicle_id"])
-        usr = get_user_by_user_id(data["responder_id"])
+        usr = get_cached_user(data["responder_id"])
         vechile = get_vehicle_by_id(data["vehicle_id"])
         return JsonResponse({"user": usr, "vechile": vechile}, status=200)
 
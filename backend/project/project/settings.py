@@ -53,6 +53,35 @@ INSTALLED_APPS = [
 
 CORS_ALLOW_ALL_ORIGINS = True
 
+ASGI_APPLICATION = 'project.asgi.application'
+
+# dashboards get change events through this layer; the in-memory layer only
+# reaches sockets served by the same process, set REDIS_URL (needs
+# channels_redis) when running more than one worker
+CHANNEL_LAYERS = {
+    'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'},
+}
+if os.getenv('REDIS_URL'):
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [os.getenv('REDIS_URL')]},
+        },
+    }
+
+# cached analytics live per process unless REDIS_URL (needs redis) makes a
+# resolution on one worker refresh them on every worker
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        },
+    }
+
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
@@ -145,4 +174,92 @@ JWT_ALGORITHM = "HS256"
 JWT_ACCESS_TOKEN_LIFETIME = datetime.timedelta(minutes=15)
 JWT_REFRESH_TOKEN_LIFETIME = datetime.timedelta(days=7)
 JWT_ISSUER = "emergency_dispatcher"  
-JWT_AUTH_HEADER = "AUTHORIZATION"
\ No newline at end of file
+JWT_AUTH_HEADER = "AUTHORIZATION"
+
+# Dispatch settings
+# hold incident reports this long and assign them as one batch, 0 dispatches each report on arrival
+DISPATCH_BATCH_WINDOW_MS = int(os.getenv('DISPATCH_BATCH_WINDOW_MS', '0'))
+
+# GeoJSON road extract used to rank candidate vehicles by travel time, unset ranks by straight-line distance
+ROAD_GRAPH_PATH = os.getenv('ROAD_GRAPH_PATH') or None
+# nearest straight-line candidates re-ranked by road travel time per incident
+ROUTING_CANDIDATES = int(os.getenv('ROUTING_CANDIDATES', '5'))
+# precomputed cell/station travel-time matrix, built with `manage.py build_travel_matrix`
+TRAVEL_MATRIX_PATH = os.getenv('TRAVEL_MATRIX_PATH') or None
+# buffer GPS pings and write the latest position per vehicle in bulk this often, 0 writes each ping immediately
+LOCATION_FLUSH_MS = int(os.getenv('LOCATION_FLUSH_MS', '500'))
+
+# Database connection pool
+# connections a worker process keeps open and shares between its threads;
+# Django still "closes" its connection after every request, which hands it
+# back to the pool (0 opens and tears down a connection per request instead)
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))
+# seconds a request waits for a free connection before failing
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '5'))
+# connections are reopened after this many seconds, well inside MySQL's wait_timeout
+DB_POOL_MAX_LIFETIME = int(os.getenv('DB_POOL_MAX_LIFETIME', '1800'))
+# a connection idle this many seconds is pinged before it is handed out again
+DB_POOL_CHECK_AFTER = int(os.getenv('DB_POOL_CHECK_AFTER', '30'))
+if DB_POOL_SIZE > 0:
+    DATABASES['default']['ENGINE'] = 'app.mysql_pool'
+# the hot repo lookups registered with statements.prepared() are prepared once
+# per pooled connection and then only executed; unpooled connections always
+# get the plain SQL
+PREPARED_STATEMENTS = os.getenv('PREPARED_STATEMENTS', 'True') == 'True'
+
+# Read replicas
+# comma-separated host[:port] of MySQL replicas of DB_HOST, with the same
+# database, user and password; listings, search and analytics read from them
+# and writes, locking procedures and the dispatch path stay on the primary.
+# The user needs REPLICATION CLIENT on the replicas, to read their lag
+DB_REPLICA_HOSTS = [host.strip() for host in os.getenv('DB_REPLICA_HOSTS', '').split(',') if host.strip()]
+DB_REPLICAS = []
+for index, replica in enumerate(DB_REPLICA_HOSTS):
+    replica_host, _, replica_port = replica.partition(':')
+    DATABASES[f'replica_{index}'] = {
+        **DATABASES['default'],
+        'HOST': replica_host,
+        'PORT': replica_port or '3306',
+        # a replica that is down costs a lag check this long, not the default 10s
+        'OPTIONS': {'connect_timeout': 2},
+        'TEST': {'MIRROR': 'default'},
+    }
+    DB_REPLICAS.append(f'replica_{index}')
+# seconds a replica may be behind and still serve reads, capped so the delta-sync
+# overlap (SYNC_CURSOR_OVERLAP_MS) still covers it
+DB_REPLICA_MAX_LAG = float(os.getenv('DB_REPLICA_MAX_LAG', '2'))
+# seconds between lag checks of each replica, a replica can fall this much further behind in between
+DB_REPLICA_CHECK_INTERVAL = float(os.getenv('DB_REPLICA_CHECK_INTERVAL', '1'))
+# seconds a user's reads stay on the primary after a request that writes; keep it
+# above DB_REPLICA_MAX_LAG + DB_REPLICA_CHECK_INTERVAL so they read their own writes
+DB_REPLICA_STICKY_SECONDS = int(os.getenv('DB_REPLICA_STICKY_SECONDS', '5'))
+
+# Async database access
+# serve report, location, resolve and the incident/vehicle listings from async
+# views on aiomysql (needs aiomysql and an ASGI server), with their own pool
+# per worker that follows the DB_POOL_* timeout, lifetime and health checks
+ASYNC_DB = os.getenv('ASYNC_DB', 'False') == 'True'
+ASYNC_DB_POOL_SIZE = int(os.getenv('ASYNC_DB_POOL_SIZE', '20'))
+
+# Delta sync
+# `since` cursors re-read this far back, to catch transactions that were still open when the cursor was taken;
+# a write in a transaction open longer than this is missed by delta syncs until the next full listing
+SYNC_CURSOR_OVERLAP_MS = int(os.getenv('SYNC_CURSOR_OVERLAP_MS', '5000'))
+
+# Analytics
+# seconds an admin analytics snapshot is served from the cache, resolving an incident drops it earlier
+ANALYTICS_CACHE_TTL = int(os.getenv('ANALYTICS_CACHE_TTL', '60'))
+
+# Auth
+# roles come from verified token claims; views that need the user row read it
+# from a per-process cache, USER_CACHE_TTL bounds how long another worker may
+# serve a changed password or role (0 disables the cache)
+USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', '30'))
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', '10000'))
+# verified bearer tokens kept per worker, so a polling dashboard's token is
+# checked once rather than on every request (0 disables)
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', '10000'))
+# bcrypt cost of new password hashes; a login with an older cost rehashes
+PASSWORD_HASH_ROUNDS = int(os.getenv('PASSWORD_HASH_ROUNDS', '12'))
+# hashes computed at once per process, so a login burst can't take every core
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', '2'))
@@ -1,6 +1,13 @@
 from channels.generic.websocket import AsyncWebsocketConsumer
+from channels.db import database_sync_to_async
+from collections import OrderedDict, deque
 import json
 
+from app.events import bind_server_loop, responder_group
+from app.location_buffer import check_position, get_location_buffer
+from app.repo import get_vehicle_id_by_responder, update_vehicle_locations_batch
+from .subscriptions import Subscription
+
 class ChatConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         # Accept the connection
@@ -33,5 +40,162 @@ class ChatConsumer(AsyncWebsocketConsumer):
             "message": message,
             "sender": sender_info
         }))
-    
-    
+
+
+class LocationUplinkConsumer(AsyncWebsocketConsumer):
+    """
+    Continuous GPS stream from a responder's device. Frames are
+    {"lat": .., "lng": ..} or {"positions": [{"lat": .., "lng": ..}, ...]}
+    and go to the vehicle the responder is assigned to. Nothing is sent back
+    unless a frame is rejected. Reassigning the responder moves the stream
+    to the new vehicle, losing the vehicle closes it.
+    """
+
+    async def connect(self):
+        user = self.scope["user"]
+        if user is None or user.get("role") != "RESPONDER":
+            await self.close()
+            return
+
+        bind_server_loop()
+        # joined before the lookup, so a reassignment in between still arrives
+        self.group = responder_group(user["user_id"])
+        await self.channel_layer.group_add(self.group, self.channel_name)
+        self.vehicle_id = await database_sync_to_async(get_vehicle_id_by_responder)(
+            user["user_id"]
+        )
+        if self.vehicle_id is None:
+            await self.close()
+            return
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        if getattr(self, "group", None):
+            await self.channel_layer.group_discard(self.group, self.channel_name)
+
+    async def responder_vehicle(self, event):
+        self.vehicle_id = event["vehicle_id"]
+        if self.vehicle_id is None:
+            await self.close()
+
+    async def receive(self, text_data):
+        try:
+            data = json.loads(text_data)
+            positions = data.get("positions", [data])
+            # only the newest fix in a frame matters
+            lat, lng = check_position(positions[-1]["lat"], positions[-1]["lng"])
+        except (ValueError, KeyError, IndexError, TypeError, AttributeError):
+            await self.send(text_data=json.dumps({"error": "invalid position frame"}))
+            return
+
+        buffer = get_location_buffer()
+        if buffer is not None:
+            buffer.submit(self.vehicle_id, lat, lng)
+        else:
+            await database_sync_to_async(update_vehicle_locations_batch)(
+                {self.vehicle_id: (lng, lat)}
+            )
+
+
+class DashboardConsumer(AsyncWebsocketConsumer):
+    """
+    Live feed of incident, vehicle and dispatch changes for admin and
+    dispatcher dashboards. Every message is {"event": .., "data": ..}.
+
+    A new connection gets every event. Clients narrow it with
+        {"action": "subscribe", "zone": "Smouha"}
+        {"action": "subscribe", "bbox": [min_lng, min_lat, max_lng, max_lat]}
+    and widen it again with the same frames using "unsubscribe". Dropping the
+    last zone or viewport goes back to the full feed.
+    """
+
+    async def connect(self):
+        user = self.scope["user"]
+        if user is None or user.get("role") not in ["ADMIN", "DISPATCHER"]:
+            await self.close()
+            return
+        bind_server_loop()
+        self.subscription = Subscription()
+        self.groups_joined = set()
+        # an event routed through a zone and a tile arrives twice
+        self.recent_events = deque(maxlen=256)
+        # a location flush arrives once per group with that group's subset,
+        # all under the flush's id: vehicle ids already sent, by flush
+        self.sent_positions = OrderedDict()
+        await self.join_groups()
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        for group in getattr(self, "groups_joined", ()):
+            await self.channel_layer.group_discard(group, self.channel_name)
+
+    async def receive(self, text_data):
+        try:
+            data = json.loads(text_data)
+            action = data["action"]
+            if action not in ("subscribe", "unsubscribe"):
+                raise ValueError(f"unknown action {action}")
+            if "zone" not in data and "bbox" not in data:
+                raise ValueError("zone or bbox is required")
+
+            if action == "subscribe":
+                if "zone" in data:
+                    self.subscription.add_zone(data["zone"])
+                if "bbox" in data:
+                    self.subscription.add_bbox(data["bbox"])
+            else:
+                if "zone" in data:
+                    self.subscription.remove_zone(data["zone"])
+                if "bbox" in data:
+                    self.subscription.remove_bbox(data["bbox"])
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            await self.send(text_data=json.dumps({"error": str(e)}))
+            return
+
+        await self.join_groups()
+        await self.send(
+            text_data=json.dumps(
+                {
+                    "subscribed": {
+                        "zones": sorted(self.subscription.zones),
+                        "bboxes": self.subscription.bboxes,
+                    }
+                }
+            )
+        )
+
+    async def join_groups(self):
+        wanted = self.subscription.groups()
+        for group in wanted - self.groups_joined:
+            await self.channel_layer.group_add(group, self.channel_name)
+        for group in self.groups_joined - wanted:
+            await self.channel_layer.group_discard(group, self.channel_name)
+        self.groups_joined = wanted
+
+    async def dashboard_event(self, event):
+        if event["event"] == "vehicle.locations":
+            event = self.unsent_positions(event)
+            if event is None:
+                return
+        elif event["event_id"] in self.recent_events:
+            return
+        else:
+            self.recent_events.append(event["event_id"])
+
+        data = self.subscription.filter(event)
+        if data is None:
+            return
+        await self.send(text_data=json.dumps({"event": event["event"], "data": data}))
+
+    def unsent_positions(self, event):
+        """The location event without positions an earlier group already delivered"""
+        sent = self.sent_positions.get(event["event_id"])
+        if sent is None:
+            sent = self.sent_positions[event["event_id"]] = set()
+            if len(self.sent_positions) > 16:
+                self.sent_positions.popitem(last=False)
+        positions = [p for p in event["data"]["positions"] if p["vehicle_id"] not in sent]
+        if not positions:
+            return None
+        sent.update(p["vehicle_id"] for p in positions)
+        return {**event, "data": {"positions": positions}}
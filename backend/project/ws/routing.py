@@ -1,6 +1,8 @@
 from django.urls import re_path
-from .consumer import ChatConsumer
+from .consumer import ChatConsumer, DashboardConsumer, LocationUplinkConsumer
 
 websocket_urlpatterns = [
     re_path(r"ws/chat/$", ChatConsumer.as_asgi()),
+    re_path(r"ws/vehicles/location/$", LocationUplinkConsumer.as_asgi()),
+    re_path(r"ws/dashboard/$", DashboardConsumer.as_asgi()),
 ]
@@ -0,0 +1,89 @@
+from app.events import (
+    DASHBOARD_GROUP,
+    SCOPED_BROADCAST_GROUP,
+    tile_group,
+    tiles_for_bbox,
+    zone_group,
+)
+
+
+class Subscription:
+    """
+    What one dashboard connection wants to see: station zones and map
+    viewports. An empty subscription means the full feed.
+    """
+
+    def __init__(self):
+        self.zones = set()
+        self.bboxes = []
+
+    def __bool__(self):
+        return bool(self.zones or self.bboxes)
+
+    def add_zone(self, zone):
+        self.zones.add(str(zone))
+
+    def remove_zone(self, zone):
+        self.zones.discard(str(zone))
+
+    def add_bbox(self, bbox):
+        bbox = parse_bbox(bbox)
+        # rejects oversized viewports before anything is joined
+        tiles_for_bbox(*bbox)
+        if bbox not in self.bboxes:
+            self.bboxes.append(bbox)
+
+    def remove_bbox(self, bbox):
+        bbox = parse_bbox(bbox)
+        if bbox in self.bboxes:
+            self.bboxes.remove(bbox)
+
+    def groups(self):
+        """Channel-layer groups this connection should be a member of"""
+        if not self:
+            return {DASHBOARD_GROUP}
+        groups = {SCOPED_BROADCAST_GROUP}
+        groups.update(zone_group(zone) for zone in self.zones)
+        for bbox in self.bboxes:
+            groups.update(tile_group(tile) for tile in tiles_for_bbox(*bbox))
+        return groups
+
+    def matches(self, zones, point):
+        if any(zone in self.zones for zone in zones or ()):
+            return True
+        if point is None:
+            return False
+        lng, lat = point
+        return any(
+            min_lng <= lng <= max_lng and min_lat <= lat <= max_lat
+            for min_lng, min_lat, max_lng, max_lat in self.bboxes
+        )
+
+    def filter(self, message):
+        """
+        The part of a group message this connection should get, None when
+        nothing matches. Tile groups are coarser than a viewport, so points
+        are checked against the exact boxes here.
+        """
+        data = message["data"]
+        if not self:
+            return data
+        if message["event"] == "vehicle.locations":
+            positions = [
+                p
+                for p in data["positions"]
+                if self.matches([p.get("zone")], (p["lng"], p["lat"]))
+            ]
+            return {"positions": positions} if positions else None
+        if not message["zones"] and message["point"] is None:
+            # e.g. vehicle.deleted, nothing to scope it by
+            return data
+        return data if self.matches(message["zones"], message["point"]) else None
+
+
+def parse_bbox(bbox):
+    """[min_lng, min_lat, max_lng, max_lat] as a tuple of floats"""
+    min_lng, min_lat, max_lng, max_lat = (float(v) for v in bbox)
+    if min_lng > max_lng or min_lat > max_lat:
+        raise ValueError("bbox must be [min_lng, min_lat, max_lng, max_lat]")
+    return min_lng, min_lat, max_lng, max_lat
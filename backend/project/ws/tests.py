@@ -2,8 +2,11 @@ from django.test import TransactionTestCase
 from channels.testing import WebsocketCommunicator
 from unittest.mock import patch, MagicMock
 from project.asgi import application
-from app.jwt_utils import generate_access_token
+from app.jwt_utils import generate_access_token, generate_refresh_token
+from app.events import publish_responder_vehicle, send_event, send_locations
+from asgiref.sync import sync_to_async
 import json
+import threading
 
 class WebSocketAuthTests(TransactionTestCase):
     def setUp(self):
@@ -46,3 +49,229 @@ class WebSocketAuthTests(TransactionTestCase):
         
         connected, subprotocol = await communicator.connect()
         self.assertFalse(connected)
+
+    @patch('ws.ws_jwt_middleware.get_user_by_user_id')
+    async def test_connect_refresh_token_rejected(self, mock_get_user):
+        mock_get_user.return_value = self.user
+
+        token = generate_refresh_token(self.user)
+        communicator = WebsocketCommunicator(application, f"ws/chat/?token={token}")
+        connected, subprotocol = await communicator.connect()
+        self.assertFalse(connected)
+        mock_get_user.assert_not_called()
+
+
+class LocationUplinkTests(TransactionTestCase):
+    def setUp(self):
+        self.responder = {
+            "user_id": 7,
+            "role": "RESPONDER",
+            "email": "responder@example.com",
+            "name": "Responder"
+        }
+
+    @patch('ws.consumer.get_location_buffer')
+    @patch('ws.consumer.get_vehicle_id_by_responder')
+    @patch('ws.ws_jwt_middleware.get_user_by_user_id')
+    async def test_positions_go_to_buffer(self, mock_get_user, mock_vehicle, mock_buffer):
+        mock_get_user.return_value = self.responder
+        mock_vehicle.return_value = 3
+        buffer = MagicMock()
+        mock_buffer.return_value = buffer
+
+        token = generate_access_token(self.responder)
+        communicator = WebsocketCommunicator(application, f"ws/vehicles/location/?token={token}")
+        connected, subprotocol = await communicator.connect()
+        self.assertTrue(connected)
+
+        await communicator.send_json_to({"lat": 31.2, "lng": 29.9})
+        await communicator.send_json_to({"positions": [{"lat": 31.3, "lng": 29.8}, {"lat": 31.4, "lng": 29.7}]})
+        self.assertTrue(await communicator.receive_nothing())
+
+        buffer.submit.assert_any_call(3, 31.2, 29.9)
+        buffer.submit.assert_called_with(3, 31.4, 29.7)
+
+        await communicator.disconnect()
+
+    @patch('ws.consumer.get_location_buffer')
+    @patch('ws.consumer.get_vehicle_id_by_responder')
+    @patch('ws.ws_jwt_middleware.get_user_by_user_id')
+    async def test_rejects_position_off_the_globe(self, mock_get_user, mock_vehicle, mock_buffer):
+        mock_get_user.return_value = self.responder
+        mock_vehicle.return_value = 3
+        buffer = MagicMock()
+        mock_buffer.return_value = buffer
+
+        token = generate_access_token(self.responder)
+        communicator = WebsocketCommunicator(application, f"ws/vehicles/location/?token={token}")
+        connected, subprotocol = await communicator.connect()
+        self.assertTrue(connected)
+
+        await communicator.send_json_to({"lat": 31.2, "lng": 190})
+        self.assertEqual(await communicator.receive_json_from(), {"error": "invalid position frame"})
+        buffer.submit.assert_not_called()
+
+        await communicator.disconnect()
+
+    @patch('ws.consumer.get_location_buffer')
+    @patch('ws.consumer.get_vehicle_id_by_responder')
+    @patch('ws.ws_jwt_middleware.get_user_by_user_id')
+    async def test_follows_responder_reassignment(self, mock_get_user, mock_vehicle, mock_buffer):
+        mock_get_user.return_value = self.responder
+        mock_vehicle.return_value = 3
+        buffer = MagicMock()
+        mock_buffer.return_value = buffer
+
+        token = generate_access_token(self.responder)
+        communicator = WebsocketCommunicator(application, f"ws/vehicles/location/?token={token}")
+        connected, subprotocol = await communicator.connect()
+        self.assertTrue(connected)
+
+        await sync_to_async(publish_responder_vehicle)(7, 9)
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.send_json_to({"lat": 31.2, "lng": 29.9})
+        self.assertTrue(await communicator.receive_nothing())
+        buffer.submit.assert_called_once_with(9, 31.2, 29.9)
+
+        # the vehicle went to another responder
+        await sync_to_async(publish_responder_vehicle)(7, None)
+        self.assertEqual((await communicator.receive_output())["type"], "websocket.close")
+
+    @patch('ws.consumer.get_vehicle_id_by_responder')
+    @patch('ws.ws_jwt_middleware.get_user_by_user_id')
+    async def test_rejects_non_responder(self, mock_get_user, mock_vehicle):
+        admin = {**self.responder, "role": "ADMIN"}
+        mock_get_user.return_value = admin
+
+        token = generate_access_token(admin)
+        communicator = WebsocketCommunicator(application, f"ws/vehicles/location/?token={token}")
+        connected, subprotocol = await communicator.connect()
+        self.assertFalse(connected)
+
+
+class DashboardFeedTests(TransactionTestCase):
+    def setUp(self):
+        self.dispatcher = {
+            "user_id": 2,
+            "role": "DISPATCHER",
+            "email": "dispatcher@example.com",
+            "name": "Dispatcher"
+        }
+
+    @patch('ws.ws_jwt_middleware.get_user_by_user_id')
+    async def test_receives_published_events(self, mock_get_user):
+        mock_get_user.return_value = self.dispatcher
+
+        token = generate_access_token(self.dispatcher)
+        communicator = WebsocketCommunicator(application, f"ws/dashboard/?token={token}")
+        connected, subprotocol = await communicator.connect()
+        self.assertTrue(connected)
+
+        await sync_to_async(send_event)("incident.created", {"incident_id": 5, "status": "REPORTED"})
+        response = await communicator.receive_json_from()
+
+        self.assertEqual(response["event"], "incident.created")
+        self.assertEqual(response["data"], {"incident_id": 5, "status": "REPORTED"})
+
+        await communicator.disconnect()
+
+    @patch('ws.ws_jwt_middleware.get_user_by_user_id')
+    async def test_receives_events_from_background_threads(self, mock_get_user):
+        # the location buffer and the dispatch engine publish from threads of their own
+        mock_get_user.return_value = self.dispatcher
+
+        token = generate_access_token(self.dispatcher)
+        communicator = WebsocketCommunicator(application, f"ws/dashboard/?token={token}")
+        connected, subprotocol = await communicator.connect()
+        self.assertTrue(connected)
+
+        worker = threading.Thread(target=send_event, args=("vehicle.updated", {"vehicle_id": 4}))
+        worker.start()
+        worker.join()
+        response = await communicator.receive_json_from()
+        self.assertEqual(response["data"], {"vehicle_id": 4})
+
+        await communicator.disconnect()
+
+    @patch('ws.ws_jwt_middleware.get_user_by_user_id')
+    async def test_rejects_responder(self, mock_get_user):
+        responder = {**self.dispatcher, "role": "RESPONDER"}
+        mock_get_user.return_value = responder
+
+        token = generate_access_token(responder)
+        communicator = WebsocketCommunicator(application, f"ws/dashboard/?token={token}")
+        connected, subprotocol = await communicator.connect()
+        self.assertFalse(connected)
+
+    @patch('ws.ws_jwt_middleware.get_user_by_user_id')
+    async def test_zone_subscription_filters_events(self, mock_get_user):
+        mock_get_user.return_value = self.dispatcher
+
+        token = generate_access_token(self.dispatcher)
+        communicator = WebsocketCommunicator(application, f"ws/dashboard/?token={token}")
+        connected, subprotocol = await communicator.connect()
+        self.assertTrue(connected)
+
+        await communicator.send_json_to({"action": "subscribe", "zone": "Smouha"})
+        response = await communicator.receive_json_from()
+        self.assertEqual(response["subscribed"]["zones"], ["Smouha"])
+
+        await sync_to_async(send_event)("incident.created", {"incident_id": 6}, ["Raml"], (29.9, 31.2))
+        await sync_to_async(send_event)("incident.created", {"incident_id": 7}, ["Smouha"], (29.95, 31.21))
+        response = await communicator.receive_json_from()
+        self.assertEqual(response["data"], {"incident_id": 7})
+        self.assertTrue(await communicator.receive_nothing())
+
+        await communicator.disconnect()
+
+    @patch('ws.ws_jwt_middleware.get_user_by_user_id')
+    async def test_viewport_subscription_filters_events(self, mock_get_user):
+        mock_get_user.return_value = self.dispatcher
+
+        token = generate_access_token(self.dispatcher)
+        communicator = WebsocketCommunicator(application, f"ws/dashboard/?token={token}")
+        connected, subprotocol = await communicator.connect()
+        self.assertTrue(connected)
+
+        await communicator.send_json_to({"action": "subscribe", "bbox": [29.90, 31.19, 29.96, 31.23]})
+        await communicator.receive_json_from()
+
+        # in a tile the viewport overlaps, but outside the box itself
+        await sync_to_async(send_event)("vehicle.updated", {"vehicle_id": 1}, [], (29.99, 31.20))
+        await sync_to_async(send_event)("vehicle.updated", {"vehicle_id": 2}, [], (29.93, 31.20))
+        response = await communicator.receive_json_from()
+        self.assertEqual(response["data"], {"vehicle_id": 2})
+
+        await communicator.send_json_to({"action": "subscribe", "bbox": [0, 0, 50, 50]})
+        response = await communicator.receive_json_from()
+        self.assertIn("error", response)
+
+        await communicator.disconnect()
+
+    @patch('ws.ws_jwt_middleware.get_user_by_user_id')
+    async def test_location_flush_arrives_once_per_vehicle(self, mock_get_user):
+        mock_get_user.return_value = self.dispatcher
+
+        token = generate_access_token(self.dispatcher)
+        communicator = WebsocketCommunicator(application, f"ws/dashboard/?token={token}")
+        connected, subprotocol = await communicator.connect()
+        self.assertTrue(connected)
+
+        await communicator.send_json_to({"action": "subscribe", "zone": "Smouha"})
+        await communicator.receive_json_from()
+        await communicator.send_json_to({"action": "subscribe", "bbox": [29.90, 31.19, 29.96, 31.23]})
+        await communicator.receive_json_from()
+
+        # the zone group carries vehicle 1, the tile group vehicles 1 and 2
+        await sync_to_async(send_locations)([
+            {"vehicle_id": 1, "lng": 29.93, "lat": 31.20, "zone": "Smouha"},
+            {"vehicle_id": 2, "lng": 29.94, "lat": 31.21, "zone": "Raml"},
+        ])
+        received = []
+        for _ in range(2):
+            response = await communicator.receive_json_from()
+            received += [p["vehicle_id"] for p in response["data"]["positions"]]
+        self.assertEqual(sorted(received), [1, 2])
+        self.assertTrue(await communicator.receive_nothing())
+
+        await communicator.disconnect()
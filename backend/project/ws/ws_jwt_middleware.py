@@ -1,13 +1,11 @@
+from channels.db import database_sync_to_async
 from channels.middleware import BaseMiddleware
-from django.db import close_old_connections
 
 from app.jwt_utils import decode_token, get_user_id
 from app.repo import get_user_by_user_id
-from asgiref.sync import sync_to_async
 
 class JWTAuthMiddleware(BaseMiddleware):
     async def __call__(self, scope, receive, send):
-        close_old_connections()
         scope["user"] = None
 
         # Query string: ?token=xxxx
@@ -22,10 +20,14 @@ class JWTAuthMiddleware(BaseMiddleware):
 
         try:
             payload = decode_token(token)
+            # a refresh token only buys a new access token
+            if payload is None or payload.get("type") != "access":
+                return await super().__call__(scope, receive, send)
             user_id = get_user_id(payload)
 
-            # wrap get_user_by_user_id in sync_to_async
-            user = await sync_to_async(get_user_by_user_id)(user_id)
+            # closes the connection around the lookup, which hands it back to
+            # the pool rather than pinning one for the life of the process
+            user = await database_sync_to_async(get_user_by_user_id)(user_id)
 
             if user:
                 scope["user"] = user
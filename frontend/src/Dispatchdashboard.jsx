@@ -1,7 +1,8 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { MapPin, Truck, AlertCircle, CheckCircle, Clock, Radio, Building2, Users } from 'lucide-react';
 
 const API_BASE_URL = 'http://localhost:8000';
+const WS_BASE_URL = 'ws://localhost:8000';
 
 const DispatchDashboard = () => {
   const [incidents, setIncidents] = useState([]);
@@ -13,15 +14,79 @@ const DispatchDashboard = () => {
   const [token, setToken] = useState(localStorage.getItem('access_token'));
   const [showDispatchModal, setShowDispatchModal] = useState(false);
   const [selectedDispatch, setSelectedDispatch] = useState(null);
+  // delta-sync cursors, a reconnect only loads what changed while offline
+  const incidentCursor = useRef(null);
+  const vehicleCursor = useRef(null);
 
+  // Load everything once per connection, then apply change events pushed
+  // over the dashboard socket instead of polling
   useEffect(() => {
-    if (token) {
-      fetchData();
-      const interval = setInterval(fetchData, 5000);
-      return () => clearInterval(interval);
-    }
+    if (!token) return;
+
+    let socket;
+    let retryTimer;
+    let closed = false;
+    incidentCursor.current = null;
+    vehicleCursor.current = null;
+
+    const connect = () => {
+      socket = new WebSocket(`${WS_BASE_URL}/ws/dashboard/?token=${token}`);
+      socket.onopen = () => fetchData();
+      socket.onmessage = (message) => {
+        const { event, data } = JSON.parse(message.data);
+        applyEvent(event, data);
+      };
+      socket.onclose = () => {
+        if (!closed) retryTimer = setTimeout(connect, 3000);
+      };
+    };
+
+    connect();
+    return () => {
+      closed = true;
+      clearTimeout(retryTimer);
+      socket.close();
+    };
   }, [token, filter]);
 
+  const upsert = (items, key, item) => {
+    const index = items.findIndex((existing) => existing[key] === item[key]);
+    if (index === -1) return [...items, item];
+    const next = [...items];
+    next[index] = { ...next[index], ...item };
+    return next;
+  };
+
+  const applyEvent = (event, data) => {
+    switch (event) {
+      case 'incident.created':
+      case 'incident.updated':
+        setIncidents((current) => {
+          if (filter !== 'all' && data.status !== filter) {
+            return current.filter((incident) => incident.incident_id !== data.incident_id);
+          }
+          return upsert(current, 'incident_id', data);
+        });
+        break;
+      case 'vehicle.updated':
+        setVehicles((current) => upsert(current, 'vehicle_id', data));
+        break;
+      case 'vehicle.deleted':
+        setVehicles((current) => current.filter((vehicle) => vehicle.vehicle_id !== data.vehicle_id));
+        break;
+      case 'vehicle.locations':
+        setVehicles((current) => {
+          const positions = new Map(data.positions.map((p) => [p.vehicle_id, p]));
+          return current.map((vehicle) =>
+            positions.has(vehicle.vehicle_id) ? { ...vehicle, ...positions.get(vehicle.vehicle_id) } : vehicle
+          );
+        });
+        break;
+      default:
+        break;
+    }
+  };
+
   const fetchData = () => {
     fetchIncidents();
     fetchVehicles();
@@ -30,15 +95,29 @@ const DispatchDashboard = () => {
 
   const fetchIncidents = async () => {
     try {
-      const url = filter === 'all' 
-        ? `${API_BASE_URL}/admin/incidents/`
-        : `${API_BASE_URL}/admin/incidents/?status=${filter}`;
-      
-      const response = await fetch(url, {
+      // a delta is unfiltered so incidents that left the filter get dropped
+      const params = new URLSearchParams();
+      if (incidentCursor.current) params.set('since', incidentCursor.current);
+      else if (filter !== 'all') params.set('status', filter);
+
+      const response = await fetch(`${API_BASE_URL}/admin/incidents/?${params}`, {
         headers: { 'Authorization': `Bearer ${token}` }
       });
       const data = await response.json();
-      setIncidents(data.incidents || []);
+      if (incidentCursor.current) {
+        setIncidents((current) =>
+          (data.incidents || []).reduce(
+            (items, incident) =>
+              filter !== 'all' && incident.status !== filter
+                ? items.filter((existing) => existing.incident_id !== incident.incident_id)
+                : upsert(items, 'incident_id', incident),
+            current
+          )
+        );
+      } else {
+        setIncidents(data.incidents || []);
+      }
+      incidentCursor.current = data.cursor || null;
     } catch (error) {
       console.error('Error fetching incidents:', error);
     }
@@ -46,11 +125,25 @@ const DispatchDashboard = () => {
 
   const fetchVehicles = async () => {
     try {
-      const response = await fetch(`${API_BASE_URL}/admin/vehicles/`, {
+      const url = vehicleCursor.current
+        ? `${API_BASE_URL}/admin/vehicles/?since=${vehicleCursor.current}`
+        : `${API_BASE_URL}/admin/vehicles/`;
+      const response = await fetch(url, {
         headers: { 'Authorization': `Bearer ${token}` }
       });
       const data = await response.json();
-      setVehicles(data.vehicles || []);
+      if (vehicleCursor.current) {
+        const deleted = new Set(data.deleted || []);
+        setVehicles((current) =>
+          (data.vehicles || []).reduce(
+            (items, vehicle) => upsert(items, 'vehicle_id', vehicle),
+            current.filter((vehicle) => !deleted.has(vehicle.vehicle_id))
+          )
+        );
+      } else {
+        setVehicles(data.vehicles || []);
+      }
+      vehicleCursor.current = data.cursor || null;
     } catch (error) {
       console.error('Error fetching vehicles:', error);
     }